@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from functools import partial
+import hashlib
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 import os
 from pathlib import Path
@@ -8,6 +9,9 @@ import threading
 
 import pytest
 
+import tika.tika
+from stub_server import serve
+
 GITHUB_PAGES_REMOTE_FIXTURE_BASE_URL = (
     "https://chrismattmann.github.io/tika-python/_static/test-files"
 )
@@ -37,3 +41,33 @@ def remote_fixture_base_url():
         thread.start()
         yield f"http://127.0.0.1:{httpd.server_port}"
         httpd.shutdown()
+
+
+@pytest.fixture
+def tika_stub_server():
+    with serve() as httpd:
+        yield httpd
+
+
+@pytest.fixture
+def client_only(monkeypatch):
+    """talk to the given endpoint without checking for (or starting) a local server"""
+    monkeypatch.setattr(tika.tika, "TikaClientOnly", True)
+
+
+@pytest.fixture
+def fake_server_jar(tmp_path, monkeypatch):
+    """a local tika-server.jar for fake_java to "run", with logs going to tmp_path"""
+    jar = tmp_path / "tika-server.jar"
+    jar.write_bytes(b"not really a jar")
+    (tmp_path / "tika-server.jar.md5").write_text(hashlib.md5(jar.read_bytes()).hexdigest())
+    monkeypatch.setattr(tika.tika, "TikaJarPath", str(tmp_path))
+    monkeypatch.setattr(tika.tika, "TikaServerLogFilePath", str(tmp_path))
+    monkeypatch.setattr(tika.tika, "TikaStartupTimeout", 10)
+    return jar
+
+
+@pytest.fixture
+def fake_java():
+    """an executable standing in for java, serving the stub server on the --port it is given"""
+    return str(Path(__file__).parent / "fake_java.py")
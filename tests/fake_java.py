@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: Apache-2.0
+"""Stands in for ``java -cp tika-server.jar TikaServerCli``: serves the stub server on --port."""
+
+import os
+import sys
+
+from stub_server import StubTikaServer
+
+
+def main(argv):
+    if "--port" not in argv:
+        return
+    port = int(argv[argv.index("--port") + 1])
+    httpd = StubTikaServer(port=port)
+    if not os.getenv("FAKE_JAVA_QUIET"):
+        print("INFO  Started Apache Tika server at http://localhost:%d/" % port, flush=True)
+    httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
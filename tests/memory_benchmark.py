@@ -16,12 +16,16 @@
 # To run:
 # python tika/tests/memory_benchmark.py
 import gzip
+import mmap
 import os
+import tempfile
 import zlib
 
-from memory_profiler import profile
+from memory_profiler import memory_usage, profile
 
 import tika.parser
+import tika.tika
+from stub_server import serve
 
 
 @profile
@@ -60,8 +64,38 @@ def test_parser_gzip():
     with open(file, 'rb') as file_obj:
         response = tika.parser.from_buffer(gzip.compress(file_obj.read()), headers={'Accept-Encoding': 'gzip, deflate'})
 
+
+def upload_peak_rss(sizes_mb=(16, 64, 256, 1024)):
+    """peak RSS (MiB) while uploading files of growing size; it should stay flat"""
+    tika.tika.TikaClientOnly = True
+    with serve() as httpd, tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes_mb:
+            path = os.path.join(tmp, '%d.bin' % size_mb)
+            with open(path, 'wb') as f:
+                f.truncate(size_mb * 1024 * 1024)
+
+            def upload_path():
+                tika.parser.from_file(path, httpd.url)
+
+            def upload_file_object():
+                with open(path, 'rb') as file_obj:
+                    tika.parser.from_buffer(file_obj, httpd.url)
+
+            # RSS of this one includes the pages of the mapping itself: file cache the kernel
+            # can drop at any time, not memory held by the client
+            def upload_mmap():
+                with open(path, 'rb') as file_obj, mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    tika.parser.from_buffer(mapped, httpd.url)
+
+            for upload in (upload_path, upload_file_object, upload_mmap):
+                peak = memory_usage((upload, (), {}), max_usage=True)
+                print('%-20s %6d MiB file: peak RSS %.1f MiB' % (upload.__name__, size_mb, peak))
+            os.unlink(path)
+
+
 if __name__ == '__main__':
     test_parser_buffer()
     test_parser_binary()
     test_parser_zlib()
     test_parser_gzip()
+    upload_peak_rss()
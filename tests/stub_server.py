@@ -0,0 +1,151 @@
+# SPDX-License-Identifier: Apache-2.0
+"""A tiny stand-in for tika-server, so client behaviour can be tested offline."""
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import tarfile
+import threading
+import time
+
+RMETA = (
+    200,
+    "application/json",
+    json.dumps([{"Content-Type": "text/plain", "X-TIKA:content": "Good evening, Dave"}]).encode("utf-8"),
+)
+
+# request bodies up to this size are kept for routes to look at
+MAX_KEPT_BODY = 1024 * 1024
+
+DEFAULT_ROUTES = {
+    "/rmeta": RMETA,
+    "/rmeta/text": RMETA,
+    "/detect/stream": (200, "text/plain", b"text/plain"),
+    "/language/stream": (200, "text/plain", b"en"),
+    "/language/string": (200, "text/plain", b"en"),
+    "/version": (200, "text/plain", b"Apache Tika 3.3.2"),
+}
+
+
+def synthetic_rmeta(count, content_lines=10):
+    """an /rmeta response for a mailbox of ``count`` messages"""
+    return json.dumps([{
+        "Content-Type": "message/rfc822",
+        "dc:title": f"Message {i}",
+        "Message-To": ["dave@example.com", "hal@example.com"],
+        "X-TIKA:embedded_depth": str(1 if i else 0),
+        "X-TIKA:content": f"Good evening, Dave. This is message {i}.\n" * content_lines,
+    } for i in range(count)])
+
+
+def tar_response(members):
+    """an /unpack/all response holding ``members``, a dict of name to bytes"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return (200, "application/x-tar", buffer.getvalue())
+
+
+def delayed(route, latency):
+    """``route`` answering after ``latency`` seconds, like a server busy parsing"""
+    def respond(handler):
+        time.sleep(latency)
+        return route(handler) if callable(route) else route
+    return respond
+
+
+class StubTikaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        """read the request body, keeping it in ``self.body`` unless it is larger than MAX_KEPT_BODY"""
+        kept = []
+        size = 0
+
+        def keep(data):
+            nonlocal size
+            size += len(data)
+            if size <= MAX_KEPT_BODY:
+                kept.append(data)
+
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                chunk_size = int(self.rfile.readline().split(b";")[0], 16)
+                if chunk_size == 0:
+                    self.rfile.readline()
+                    break
+                while chunk_size:
+                    data = self.rfile.read(min(chunk_size, 65536))
+                    keep(data)
+                    chunk_size -= len(data)
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length") or 0)
+            while remaining:
+                data = self.rfile.read(min(remaining, 65536))
+                keep(data)
+                remaining -= len(data)
+        self.body = b"".join(kept) if size <= MAX_KEPT_BODY else None
+        return size
+
+    def _respond(self):
+        size = self._read_body()
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes_received += size
+        route = self.server.routes.get(self.path.split("?")[0])
+        if route is None:
+            status, content_type, body = 404, "text/plain", b"not found"
+        elif callable(route):
+            status, content_type, body = route(self)
+        else:
+            status, content_type, body = route
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_PUT = do_POST = _respond
+
+
+class StubTikaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, routes=None, port=0):
+        super().__init__(("127.0.0.1", port), StubTikaHandler)
+        self.routes = dict(DEFAULT_ROUTES)
+        self.routes.update(routes or {})
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.bytes_received = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+@contextmanager
+def serve(routes=None, port=0):
+    """Run a :class:`StubTikaServer` on ``port``, or a free local port, for the duration of the block."""
+    with StubTikaServer(routes, port) as httpd:
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield httpd
+        finally:
+            httpd.shutdown()
@@ -0,0 +1,118 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+import tika.tika
+from stub_server import delayed, serve
+from tika.resilience import CLOSED, Counters
+from tika.tika import CircuitOpenError
+
+aio = pytest.importorskip("tika.aio")
+pytest.importorskip("httpx")
+
+pytestmark = pytest.mark.usefixtures("client_only")
+
+
+def run(coro_fn, url, **kwargs):
+    async def main():
+        async with aio.Client(url, **kwargs) as client:
+            return await coro_fn(client)
+
+    return asyncio.run(main())
+
+
+def test_parse_file(tika_stub_server, test_file_path):
+    parsed = run(lambda client: client.parse(str(test_file_path)), tika_stub_server.url)
+    assert parsed["status"] == 200
+    assert parsed["content"] == "Good evening, Dave"
+    assert parsed["metadata"]["Content-Type"] == "text/plain"
+    assert tika_stub_server.bytes_received == test_file_path.stat().st_size
+
+
+def test_detect_and_language(tika_stub_server):
+    async def calls(client):
+        return await asyncio.gather(client.detect_buffer("Good evening"), client.language_buffer("Good evening"))
+
+    assert run(calls, tika_stub_server.url) == ["text/plain", "en"]
+
+
+def test_concurrency_is_bounded():
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_detect(handler):
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.05)
+        with lock:
+            in_flight.pop()
+        return 200, "text/plain", b"text/plain"
+
+    async def calls(client):
+        return await asyncio.gather(*[client.detect_buffer(b"x") for _ in range(12)])
+
+    with serve({"/detect/stream": slow_detect}) as httpd:
+        results = run(calls, httpd.url, concurrency=4)
+    assert results == ["text/plain"] * 12
+    assert max(peak) == 4
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    monkeypatch.setattr(tika.tika, "_circuitBreakers", {})
+    monkeypatch.setattr(tika.tika, "TikaCounters", Counters())
+    return tika.tika.TikaCounters
+
+
+def test_circuit_breaker_and_counters_are_shared(counters, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaBreakerThreshold", 2)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        endpoint = "http://127.0.0.1:%d" % sock.getsockname()[1]
+
+    async def calls(client):
+        for _ in range(2):
+            with pytest.raises(aio.httpx.ConnectError):
+                await client.detect_buffer(b"x")
+        with pytest.raises(CircuitOpenError):
+            await client.detect_buffer(b"x")
+
+    run(calls, endpoint)
+    assert counters["requests"] == 2
+    assert counters["connectionErrors"] == 2
+    assert counters["circuitOpened"] == 1
+    assert counters["circuitRefused"] == 1
+
+
+def test_timeout_depends_on_service(counters, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaServiceTimeouts", {"/detect": 0.2})
+    routes = {"/detect/stream": delayed((200, "text/plain", b"text/plain"), 0.5),
+              "/language/string": delayed((200, "text/plain", b"en"), 0.5)}
+    with serve(routes) as httpd:
+        with pytest.raises(aio.httpx.ReadTimeout):
+            run(lambda client: client.detect_buffer(b"x"), httpd.url)
+        assert run(lambda client: client.language_buffer(b"x"), httpd.url) == "en"
+    assert counters["timeouts"] == 1
+    assert tika.tika.getCircuitBreaker(httpd.url).state == CLOSED
+
+
+def test_server_check_expires(tika_stub_server, monkeypatch):
+    checks = []
+    monkeypatch.setattr(tika.tika, "TikaClientOnly", False)
+    monkeypatch.setattr(tika.tika, "TikaServerCheckTTL", 0)
+    monkeypatch.setattr(tika.tika, "checkTikaServerCached", lambda scheme, host, port: checks.append(port) or
+                        "%s://%s:%s" % (scheme, host, port))
+
+    async def calls(client):
+        for _ in range(2):
+            await client.detect_buffer(b"x")
+
+    run(calls, tika_stub_server.url)
+    assert len(checks) == 2
@@ -19,10 +19,15 @@ import zlib
 from http import HTTPStatus
 from pathlib import Path
 
+import requests
+
 import tika.parser
+import tika.tika
+from stub_server import synthetic_rmeta
 
 TEST_FILE_PATH = Path(__file__).parent / "files" / "rwservlet.pdf"
 HEADERS = {"Accept-Encoding": "gzip, deflate"}
+UNPOOLED_VERBS = {"get": requests.get, "put": requests.put, "post": requests.post}
 
 
 def test_local_binary(benchmark):
@@ -73,6 +78,35 @@ def test_parser_buffer_gzip_input_and_gzip_output(benchmark):
     assert response["status"] == HTTPStatus.OK
 
 
+def test_stub_call_pooled(benchmark, tika_stub_server):
+    """per-request latency over a pooled keep-alive session"""
+    session = tika.tika.createSession()
+    status, _ = benchmark(stub_detect, tika_stub_server.url, session=session)
+    assert status == HTTPStatus.OK
+
+
+def test_stub_call_unpooled(benchmark, tika_stub_server):
+    """per-request latency with a new connection for every call"""
+    status, _ = benchmark(stub_detect, tika_stub_server.url, httpVerbs=UNPOOLED_VERBS)
+    assert status == HTTPStatus.OK
+
+
+def test_rmeta_merge_10k(benchmark):
+    """merge of an /rmeta response with 10k embedded documents"""
+    parsed = benchmark(tika.parser._parse, (HTTPStatus.OK, synthetic_rmeta(10000)))
+    assert len(parsed["metadata"]["dc:title"]) == 10000
+
+
+def test_rmeta_per_document_10k(benchmark):
+    """per-document decoding of an /rmeta response with 10k embedded documents"""
+    documents = benchmark(tika.parser._parse, (HTTPStatus.OK, synthetic_rmeta(10000)), per_document=True)
+    assert len(documents) == 10000
+
+
+def stub_detect(url, **kwargs):
+    return tika.tika.callServer("put", url, "/detect/stream", b"Good evening, Dave", {"Accept": "text/plain"}, **kwargs)
+
+
 def tika_from_buffer_zlib(file, headers=None):
     with open(file, "rb") as file_obj:
         return tika.parser.from_buffer(zlib.compress(file_obj.read()), headers=headers)
@@ -0,0 +1,124 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import pytest
+
+from stub_server import serve
+import tika.tika
+from tika import detector, parser
+from tika.cache import MemoryCache, SQLiteCache, cacheKey, contentDigest, dispositionName, renameResource
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(tika.tika, "TikaResultCache", cache)
+    return cache
+
+
+def test_content_digest_does_not_consume_files(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_bytes(b"Good evening, Dave")
+    with open(path, "rb") as f:
+        f.read(5)
+        assert contentDigest(f) == contentDigest(b"evening, Dave")
+        assert f.tell() == 5
+    assert contentDigest("Bäume") == contentDigest("Bäume".encode("utf-8"))
+    assert contentDigest(iter([b"chunk"])) is None
+
+
+def test_cache_key_depends_on_request():
+    digest = contentDigest(b"x")
+    key = cacheKey(digest, "/rmeta/text", {"Accept": "application/json"})
+    assert key == cacheKey(digest, "/rmeta/text", {"accept": "application/json", "Content-Length": "1"})
+    assert key != cacheKey(digest, "/rmeta/xml", {"Accept": "application/json"})
+    assert key != cacheKey(digest, "/rmeta/text", {"Accept": "application/json", "X-Tika-OCRLanguage": "fra"})
+    assert key != cacheKey(digest, "/rmeta/text", {"Accept": "application/json"}, tikaVersion="3.0.0")
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(maxBytes=300)
+    cache.set("a", (200, "x" * 100))
+    cache.set("b", (200, "x" * 100))
+    cache.get("a")
+    cache.set("c", (200, "x" * 100))
+    assert cache.get("b") is None
+    assert cache.get("a") == (200, "x" * 100)
+    assert cache.size <= 300
+    assert cache.stats() == {"hits": 2, "misses": 1, "hitRate": 2 / 3}
+
+
+def test_sqlite_cache_persists(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "results.db"))
+    cache.set("text", (200, "Bäume"))
+    cache.set("raw", (200, b"\x00\x01"))
+    cache.close()
+
+    cache = SQLiteCache(str(tmp_path / "results.db"))
+    assert cache.get("text") == (200, "Bäume")
+    assert cache.get("raw") == (200, b"\x00\x01")
+    assert len(cache) == 2
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_duplicate_documents_are_answered_from_cache(tika_stub_server, client_only, memory_cache, test_file_path):
+    first = parser.from_file(str(test_file_path), tika_stub_server.url)
+    second = parser.from_file(str(test_file_path), tika_stub_server.url)
+    assert first == second
+    assert tika_stub_server.requests == 1
+    assert memory_cache.stats()["hits"] == 1
+
+    assert detector.from_buffer(b"Good evening", serverEndpoint=tika_stub_server.url) == "text/plain"
+    assert detector.from_buffer(b"Good evening", serverEndpoint=tika_stub_server.url) == "text/plain"
+    assert tika_stub_server.requests == 2
+
+
+def test_failures_and_streams_are_not_cached(client_only, memory_cache):
+    with serve({"/detect/stream": (500, "text/plain", b"boom")}) as httpd:
+        for _ in range(2):
+            detector.from_buffer(b"Good evening", serverEndpoint=httpd.url)
+        detector.from_buffer(iter([b"Good evening"]), serverEndpoint=httpd.url)
+        assert httpd.requests == 3
+    assert len(memory_cache) == 0
+
+
+def test_identical_files_under_other_names_are_answered_from_cache(client_only, memory_cache, tmp_path):
+    def rmeta(handler):
+        name = dispositionName(handler.headers)
+        embedded = {"resourceName": "inner.png", "X-TIKA:content": ""}
+        return 200, "application/json", json.dumps([
+            {"resourceName": name, "Content-Type": "image/png", "X-TIKA:content": ""}, embedded]).encode("utf-8")
+
+    paths = [tmp_path / "logo.png", tmp_path / "LOGO.PNG", tmp_path / "logo.gif"]
+    for path in paths:
+        path.write_bytes(b"\x89PNG\r\n\x1a\n")
+    with serve({"/rmeta/text": rmeta}) as httpd:
+        parsed = [parser.from_file(str(path), httpd.url, per_document=True) for path in paths]
+        assert httpd.requests == 2
+    assert memory_cache.stats()["hits"] == 1
+    assert [documents[0]["metadata"]["resourceName"] for documents in parsed] == ["logo.png", "LOGO.PNG", "logo.gif"]
+    assert parsed[1][1]["metadata"]["resourceName"] == "inner.png"
+
+
+def test_cache_key_ignores_case_of_file_name_only():
+    digest = contentDigest(b"x")
+    key = cacheKey(digest, "/detect/stream", {"Content-Disposition": "attachment; filename=archive.tar.gz"})
+    assert key == cacheKey(digest, "/detect/stream", {"Content-Disposition": 'attachment; filename="ARCHIVE.TAR.GZ"'})
+    assert key != cacheKey(digest, "/detect/stream", {"Content-Disposition": "attachment; filename=other.gz"})
+    assert key != cacheKey(digest, "/detect/stream", {"Content-Disposition": "attachment; filename=Makefile"})
+
+
+def test_renamed_result_keeps_the_cached_text():
+    response = '[ {"X-TIKA:content" : "a\\"b", "resourceName" : "logo.png"}, {"resourceName" : "logo.png"} ]'
+    status, renamed = renameResource((200, response), {"Content-Disposition": "attachment; filename=LOGO.PNG"})
+    assert renamed == response.replace('"logo.png"', '"LOGO.PNG"', 1)
+
+
+def test_cache_key_uses_headers_from_request_options(client_only, memory_cache):
+    with serve({"/detect/stream": (200, "text/plain", b"text/plain")}) as httpd:
+        for name in ("a.txt", "b.txt"):
+            detector.from_buffer(b"Good evening", serverEndpoint=httpd.url,
+                                 requestOptions={"headers": {"Content-Disposition": "attachment; filename=" + name}})
+        assert httpd.requests == 2
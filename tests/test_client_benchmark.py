@@ -0,0 +1,166 @@
+# SPDX-License-Identifier: Apache-2.0
+"""
+Client-side overhead of every entry point, measured offline against the stub server
+with canned responses, so regressions in header handling, JSON and tar decoding,
+memory use and connection handling show up without a JVM in the loop.
+
+Results, including the peak memory of each entry point, can be saved for comparison:
+
+    pytest tests/test_client_benchmark.py --benchmark-json=client-benchmark.json
+    pytest tests/test_client_benchmark.py --benchmark-compare --benchmark-compare-fail=mean:10%
+
+TIKA_BENCH_LATENCY sets the time the stub server takes to answer each call, in seconds.
+"""
+import os
+import tracemalloc
+
+import pytest
+
+import tika.tika
+from stub_server import delayed, serve, synthetic_rmeta, tar_response
+from tika import detector, language, parser, unpack
+from tika.magic import MagicClassifier
+
+LATENCY = float(os.getenv("TIKA_BENCH_LATENCY", 0))
+# embedded documents in /rmeta responses and attachments in /unpack responses
+SIZES = {"small": 1, "large": 1000}
+ATTACHMENT_SIZE = 16 * 1024
+DOCUMENT = b"Good evening, Dave. " * 50
+CONCURRENCY = (1, 4, 16)
+LARGE_FILE_SIZE = 4 * 1024 * 1024
+BATCH = 64
+
+
+def canned_routes(count):
+    members = {f"attachment{i}.bin": bytes(ATTACHMENT_SIZE) for i in range(count)}
+    members["__METADATA__"] = b'"Content-Type","message/rfc822"\n'
+    members["__TEXT__"] = b"Good evening, Dave.\n" * count
+    rmeta = (200, "application/json", synthetic_rmeta(count).encode("utf-8"))
+    routes = {
+        "/rmeta/text": rmeta,
+        "/unpack/all": tar_response(members),
+        "/detect/stream": (200, "text/plain", b"message/rfc822"),
+        "/language/string": (200, "text/plain", b"en"),
+    }
+    return {path: delayed(route, LATENCY) for path, route in routes.items()} if LATENCY else routes
+
+
+@pytest.fixture(params=sorted(SIZES))
+def canned_server(request, client_only, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    with serve(canned_routes(SIZES[request.param])) as httpd:
+        httpd.count = SIZES[request.param]
+        yield httpd
+
+
+def measure(benchmark, fn, *args, **kwargs):
+    """benchmark ``fn``, recording the peak memory of one more call in the results"""
+    result = benchmark(fn, *args, **kwargs)
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        benchmark.extra_info["peak_kib"] = tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def test_parser_from_buffer(benchmark, canned_server):
+    parsed = measure(benchmark, parser.from_buffer, DOCUMENT, canned_server.url)
+    assert parsed["content"].count("Good evening") == canned_server.count * 10
+
+
+def test_parser_from_buffer_per_document(benchmark, canned_server):
+    documents = measure(benchmark, parser.from_buffer, DOCUMENT, canned_server.url, per_document=True)
+    assert len(documents) == canned_server.count
+
+
+def test_parser_from_buffer_streamed(benchmark, canned_server):
+    def parse():
+        return sum(1 for _ in parser.from_buffer(DOCUMENT, canned_server.url, stream=True))
+    assert measure(benchmark, parse) == canned_server.count
+
+
+def test_unpack_from_buffer(benchmark, canned_server):
+    parsed = measure(benchmark, unpack.from_buffer, DOCUMENT, canned_server.url)
+    assert len(parsed["attachments"]) == canned_server.count
+
+
+def test_unpack_to_output_dir(benchmark, canned_server, tmp_path):
+    parsed = measure(benchmark, unpack.from_buffer, DOCUMENT, canned_server.url, outputDir=str(tmp_path))
+    assert len(parsed["attachments"]) == canned_server.count
+
+
+def test_detector_from_buffer(benchmark, canned_server):
+    assert measure(benchmark, detector.from_buffer, DOCUMENT, serverEndpoint=canned_server.url) == "message/rfc822"
+
+
+@pytest.mark.parametrize("prefix", [0, 64 * 1024], ids=["full", "prefix"])
+def test_detector_from_files_prefix(benchmark, client_only, monkeypatch, tmp_path, prefix):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    paths = []
+    for i in range(BATCH // 4):
+        path = tmp_path / f"doc{i}.bin"
+        path.write_bytes(os.urandom(LARGE_FILE_SIZE))
+        paths.append(str(path))
+
+    def detect_all():
+        return [error for _, _, error in detector.from_files(paths, serverEndpoint=httpd.url, prefix=prefix)]
+
+    with serve(canned_routes(1)) as httpd:
+        errors = benchmark(detect_all)
+        benchmark.extra_info["bytes_sent_per_file"] = httpd.bytes_received // httpd.requests
+    assert errors == [None] * len(paths)
+
+
+# mostly obvious types, as in a typical document store, and some only the server can tell apart
+DETECT_MIX = [b"%PDF-1.7\n" + DOCUMENT] * 4 + [b"\x89PNG\r\n\x1a\n" + DOCUMENT] * 2 + [DOCUMENT] * 2 + \
+             [b"PK\x03\x04" + DOCUMENT, b"<html>" + DOCUMENT]
+
+
+@pytest.mark.parametrize("local", [False, True], ids=["server", "local"])
+def test_detector_local_classifier(benchmark, client_only, monkeypatch, local):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    classifier = MagicClassifier() if local else False
+
+    def detect_all():
+        return [detector.from_buffer(buffer, serverEndpoint=httpd.url, classifier=classifier) for buffer in DETECT_MIX]
+
+    # a server a few milliseconds away, so the round trips saved show
+    with serve({"/detect/stream": delayed((200, "text/plain", b"text/html"), LATENCY or 0.002)}) as httpd:
+        mimes = benchmark(detect_all)
+    counts = classifier.counts.snapshot() if local else {}
+    benchmark.extra_info["local_share"] = counts.get("local", 0) / max(sum(counts.values()), 1)
+    assert mimes.count("text/html") == (2 if local else len(DETECT_MIX))
+
+
+def test_language_from_buffer(benchmark, canned_server):
+    assert measure(benchmark, language.from_buffer, DOCUMENT.decode(), serverEndpoint=canned_server.url) == "en"
+
+
+@pytest.mark.parametrize("sample", [0, 16 * 1024], ids=["full", "sample"])
+def test_language_from_buffer_sampled(benchmark, client_only, monkeypatch, sample):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    text = DOCUMENT.decode() * (LARGE_FILE_SIZE // len(DOCUMENT))
+    with serve(canned_routes(1)) as httpd:
+        assert measure(benchmark, language.from_buffer, text, serverEndpoint=httpd.url, sample=sample) == "en"
+
+
+@pytest.mark.parametrize("workers", CONCURRENCY)
+def test_parser_from_files_concurrency(benchmark, client_only, monkeypatch, tmp_path, workers):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    paths = []
+    for i in range(BATCH):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_bytes(DOCUMENT)
+        paths.append(str(path))
+
+    def parse_all():
+        return [error for _, _, error in parser.from_files(paths, httpd.url, workers=workers)]
+
+    # a server busy for a few milliseconds per call, so concurrency has something to overlap
+    rmeta = (200, "application/json", synthetic_rmeta(1).encode("utf-8"))
+    with serve({"/rmeta/text": delayed(rmeta, LATENCY or 0.005)}) as httpd:
+        benchmark.extra_info["documents"] = BATCH
+        errors = benchmark(parse_all)
+    assert errors == [None] * BATCH
@@ -1,5 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import tika.tika
+from stub_server import serve
 from tika import detector
 
 
@@ -14,3 +16,65 @@ def test_local_path(test_file_path):
 
 def test_local_buffer():
     assert detector.from_buffer("Good evening, David. How are you?") == "text/plain"
+
+
+def test_from_files(tika_stub_server, client_only, test_file_path):
+    results = list(detector.from_files([str(test_file_path)] * 4, serverEndpoint=tika_stub_server.url, workers=2))
+    assert [(mime, error) for _, mime, error in results] == [("text/plain", None)] * 4
+
+
+def capture_detect(seen):
+    def respond(handler):
+        seen.append((handler.headers["Content-Disposition"], handler.body))
+        return 200, "text/plain", b"application/pdf"
+    return {"/detect/stream": respond}
+
+
+def test_prefix_sends_leading_bytes_and_name(client_only, monkeypatch, tmp_path):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    path = tmp_path / "large.pdf"
+    path.write_bytes(b"%PDF-1.4\n" + bytes(1024 * 1024))
+    seen = []
+    with serve(capture_detect(seen)) as httpd:
+        assert detector.from_file(str(path), serverEndpoint=httpd.url, prefix=4096) == "application/pdf"
+        with open(path, "rb") as file_obj:
+            file_obj.seek(1)
+            detector.from_file(file_obj, serverEndpoint=httpd.url, prefix=4096)
+            assert file_obj.tell() == 1
+        monkeypatch.setattr(tika.tika, "TikaDetectPrefix", 16)
+        detector.from_file(str(path), serverEndpoint=httpd.url)
+        assert httpd.bytes_received == 4096 * 2 + 16
+    assert seen[0] == ("attachment; filename=large.pdf", path.read_bytes()[:4096])
+    assert seen[1][1] == path.read_bytes()[1:4097]
+    assert seen[2][1] == b"%PDF-1.4\n" + bytes(7)
+
+
+def test_prefix_of_url_is_requested_as_a_range(client_only, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    ranges, seen = [], []
+
+    def download(handler):
+        ranges.append(handler.headers["Range"])
+        # a server ignoring the range
+        return 200, "application/pdf", b"%PDF-1.4\n" + bytes(64 * 1024)
+
+    routes = capture_detect(seen)
+    routes["/files/report.pdf"] = download
+    with serve(routes) as httpd:
+        detector.from_file(httpd.url + "/files/report.pdf", serverEndpoint=httpd.url, prefix=1024)
+    assert ranges == ["bytes=0-1023"]
+    assert seen == [("attachment; filename=files-report.pdf", b"%PDF-1.4\n" + bytes(1015))]
+
+
+def test_from_files_with_prefix(client_only, monkeypatch, tmp_path):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    paths = []
+    for i in range(20):
+        path = tmp_path / f"doc{i}.pdf"
+        path.write_bytes(bytes(64 * 1024))
+        paths.append(str(path))
+    with serve() as httpd:
+        results = list(detector.from_files(iter(paths), serverEndpoint=httpd.url, workers=4, prefix=512))
+        assert httpd.bytes_received == 20 * 512
+    assert sorted(path for path, _, _ in results) == sorted(paths)
+    assert {(mime, error) for _, mime, error in results} == {("text/plain", None)}
@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: Apache-2.0
+
+from contextlib import ExitStack
+import socket
+import time
+
+import pytest
+import requests
+
+import tika.tika
+from stub_server import serve
+from tika import detector
+from tika.endpoints import EndpointPool
+
+pytestmark = pytest.mark.usefixtures("client_only")
+
+
+def unused_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+@pytest.fixture
+def stub_servers():
+    with ExitStack() as stack:
+        yield [stack.enter_context(serve()) for _ in range(3)]
+
+
+def test_round_robin():
+    pool = EndpointPool(["http://a", "http://b", "http://c"])
+    picked = []
+    for _ in range(6):
+        endpoint = pool.acquire()
+        picked.append(endpoint.url)
+        pool.release(endpoint)
+    assert picked == ["http://a", "http://b", "http://c"] * 2
+
+
+def test_least_outstanding():
+    pool = EndpointPool(["http://a", "http://b"], strategy="least-outstanding")
+    busy = pool.acquire()
+    assert [pool.acquire().url for _ in range(2)] == ["http://b", "http://a"]
+    assert busy.outstanding == 2
+
+
+def test_failing_endpoint_is_ejected_with_backoff():
+    pool = EndpointPool(["http://a", "http://b"], ejectTime=10)
+    a = pool.acquire()
+    pool.release(a, failed=True)
+    assert not a.isAvailable()
+    assert {pool.acquire().url for _ in range(4)} == {"http://b"}
+
+    a.ejectedUntil = 0
+    pool.release(pool.acquire(exclude=[pool.endpoints[1]]), failed=True)
+    assert a.ejections == 2
+    assert a.ejectedUntil - time.monotonic() > 10
+
+
+def test_all_ejected_still_returns_an_endpoint():
+    pool = EndpointPool(["http://a"])
+    pool.release(pool.acquire(), failed=True)
+    assert pool.acquire().url == "http://a"
+
+
+def test_calls_spread_over_servers(stub_servers):
+    pool = EndpointPool([httpd.url for httpd in stub_servers])
+    for _ in range(9):
+        assert detector.from_buffer("Good evening", serverEndpoint=pool) == "text/plain"
+    assert [httpd.requests for httpd in stub_servers] == [3, 3, 3]
+
+
+def test_dead_server_is_retried_elsewhere_and_ejected(stub_servers):
+    dead = unused_url()
+    pool = EndpointPool([dead] + [httpd.url for httpd in stub_servers[:1]], ejectTime=60)
+    for _ in range(4):
+        assert detector.from_buffer("Good evening", serverEndpoint=pool) == "text/plain"
+    assert stub_servers[0].requests == 4
+    assert not pool.stats()[dead]["available"]
+
+
+def test_unavailable_status_is_retried_elsewhere(stub_servers):
+    with serve({"/detect/stream": (503, "text/plain", b"restarting")}) as restarting:
+        pool = EndpointPool([restarting.url, stub_servers[0].url])
+        assert detector.from_buffer("Good evening", serverEndpoint=pool) == "text/plain"
+        assert restarting.requests == 1
+
+
+def test_post_is_sent_once(stub_servers):
+    with serve({"/async": (502, "text/plain", b"bad gateway")}) as proxy:
+        pool = EndpointPool([proxy.url, stub_servers[0].url])
+        status, _ = tika.tika.callServer("post", pool, "/async", "[]", {})
+        assert status == 502
+        assert proxy.requests == 1
+        assert stub_servers[0].requests == 0
+
+
+def test_post_goes_on_when_no_server_was_reached(stub_servers):
+    pool = EndpointPool([unused_url(), stub_servers[0].url])
+    status, _ = tika.tika.callServer("post", pool, "/detect/stream", "Good evening", {})
+    assert status == 200
+    assert stub_servers[0].requests == 1
+
+
+def test_single_use_body_is_not_retried():
+    pool = EndpointPool([unused_url(), unused_url()])
+    with pytest.raises(requests.ConnectionError):
+        tika.tika.callServer("put", pool, "/detect/stream", iter([b"Good evening"]), {})
+    assert sum(endpoint.requests for endpoint in pool.endpoints) == 1
+
+
+def test_endpoint_list(stub_servers):
+    urls = [httpd.url for httpd in stub_servers]
+    for _ in range(3):
+        detector.from_buffer("Good evening", serverEndpoint=urls)
+    assert tika.tika.getEndpointPool(urls) is tika.tika.getEndpointPool(list(urls))
+    assert [httpd.requests for httpd in stub_servers] == [1, 1, 1]
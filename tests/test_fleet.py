@@ -0,0 +1,77 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import socket
+import sys
+
+import pytest
+
+import tika.tika
+from tika import detector
+from tika.fleet import ServerFleet
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="fake java is a POSIX script")
+
+
+def free_ports(count):
+    """first of ``count`` consecutive ports nothing is bound to, not even a client connection"""
+    while True:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            base = sock.getsockname()[1]
+        if base + count >= 65536:
+            continue
+        sockets = []
+        try:
+            for port in range(base, base + count):
+                sockets.append(socket.socket())
+                sockets[-1].bind(("127.0.0.1", port))
+            return base
+        except OSError:
+            pass
+        finally:
+            for sock in sockets:
+                sock.close()
+
+
+@pytest.fixture
+def fleet(fake_server_jar, fake_java):
+    fleet = ServerFleet(size=3, basePort=free_ports(3), serverHost="127.0.0.1", javaPath=fake_java)
+    fleet.start()
+    yield fleet
+    fleet.stop()
+
+
+def test_fleet_serves_calls(fleet):
+    assert all(fleet.checkHealth().values())
+    for _ in range(6):
+        assert detector.from_buffer("Good evening", serverEndpoint=fleet.pool) == "text/plain"
+    assert [stats["requests"] for stats in fleet.pool.stats().values()] == [2, 2, 2]
+
+
+def test_dead_server_is_restarted(fleet):
+    port = fleet.ports[1]
+    tika.tika.stopServer(fleet.processes[port])
+    assert not fleet.isHealthy(port)
+
+    assert fleet.restartUnhealthy() == [port]
+    assert fleet.isHealthy(port)
+    assert detector.from_buffer("Good evening", serverEndpoint=fleet.endpoints[1]) == "text/plain"
+
+
+def test_stop_shuts_every_server_down(fake_server_jar, fake_java):
+    fleet = ServerFleet(size=2, basePort=free_ports(2), serverHost="127.0.0.1", javaPath=fake_java)
+    fleet.start()
+    processes = list(fleet.processes.values())
+    fleet.stop()
+    assert all(process.poll() is not None for process in processes)
+    assert not any(fleet.checkHealth().values())
+    assert not set(fleet.endpoints) & tika.tika.ManagedEndpoints
+
+
+def test_kill_server_stops_fleet_processes(fake_server_jar, fake_java):
+    fleet = ServerFleet(size=2, basePort=free_ports(2), serverHost="127.0.0.1", javaPath=fake_java)
+    fleet.start()
+    processes = list(fleet.processes.values())
+    tika.tika.killServer()
+    assert all(process.poll() is not None for process in processes)
+    fleet.stop()
@@ -1,6 +1,11 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import pytest
+
+import tika.tika
+from stub_server import serve
 from tika import language
+from tika.language import SAMPLE_CHUNKS, sampleText
 
 
 def test_local_binary(test_file_path):
@@ -14,3 +19,87 @@ def test_local_path(test_file_path):
 
 def test_local_buffer():
     assert language.from_buffer("Good evening, David. How are you?") == "en"
+
+
+def test_from_files(tika_stub_server, client_only, test_file_path):
+    results = list(language.from_files([str(test_file_path)] * 4, serverEndpoint=tika_stub_server.url, workers=2))
+    assert [(lang, error) for _, lang, error in results] == [("en", None)] * 4
+
+
+@pytest.fixture
+def language_server(client_only, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    bodies = []
+
+    def respond(handler):
+        bodies.append(handler.body.decode("utf-8"))
+        return 200, "text/plain", b"en"
+
+    with serve({"/language/string": respond, "/language/stream": respond}) as httpd:
+        httpd.bodies = bodies
+        yield httpd
+
+
+TEXT = " ".join(f"word{i}" for i in range(100000))
+
+
+def test_sample_text():
+    sample = sampleText(TEXT, 4096)
+    pieces = sample.split("\n")
+    assert len(pieces) == SAMPLE_CHUNKS
+    assert pieces[0].startswith("word0 ") and pieces[-1].endswith(" word99999")
+    # no half words
+    assert all(word in TEXT.split() for piece in pieces for word in piece.split(" "))
+    assert len(sample) <= 4096 + SAMPLE_CHUNKS
+    assert sampleText("Good evening", 4096) == "Good evening"
+    # fewer characters than pieces
+    assert sampleText("Good evening", 4).split("\n") == ["G", "d", "e", "g"]
+
+
+def test_file_is_sampled(language_server, tmp_path):
+    path = tmp_path / "dump.txt"
+    path.write_text(TEXT + " Grüße", encoding="utf-8")
+    assert language.from_file(str(path), serverEndpoint=language_server.url, sample=2048) == "en"
+    with open(path, "rb") as file_obj:
+        language.from_file(file_obj, serverEndpoint=language_server.url, sample=2048)
+        assert file_obj.tell() == 0
+    assert language_server.bodies[0] == language_server.bodies[1]
+    assert language_server.bodies[0].endswith(" Grüße")
+    assert language_server.bytes_received <= 2 * (2048 + SAMPLE_CHUNKS)
+
+
+def test_file_object_is_sampled_from_its_position(language_server, tmp_path):
+    path = tmp_path / "dump.txt"
+    path.write_bytes(b"\x00" * 100000 + TEXT.encode("utf-8"))
+    with open(path, "rb") as file_obj:
+        file_obj.seek(100000)
+        language.from_file(file_obj, serverEndpoint=language_server.url, sample=2048)
+        assert file_obj.tell() == 100000
+    assert language_server.bodies[0].startswith("word0 ")
+
+
+def test_buffer_is_sampled(language_server, monkeypatch):
+    language.from_buffer(TEXT, serverEndpoint=language_server.url, sample=1024)
+    monkeypatch.setattr(tika.tika, "TikaLanguageSample", 512)
+    language.from_buffer(TEXT.encode("utf-8"), serverEndpoint=language_server.url)
+    language.from_buffer(TEXT, serverEndpoint=language_server.url, sample=0)
+    assert len(language_server.bodies[0]) <= 1024 + SAMPLE_CHUNKS
+    assert len(language_server.bodies[1]) <= 512 + SAMPLE_CHUNKS
+    assert language_server.bodies[2] == TEXT
+
+
+def test_from_parsed(language_server):
+    parsed = {"metadata": {}, "content": "\n\nGood evening, Dave.\n"}
+    assert language.from_parsed(parsed, serverEndpoint=language_server.url) == "en"
+    language.from_parsed([parsed, {"metadata": {}, "content": None}, parsed], serverEndpoint=language_server.url)
+    assert language_server.bodies == ["Good evening, Dave.", "Good evening, Dave.\n\nGood evening, Dave."]
+
+
+def test_from_buffers(language_server):
+    strings = [f"Good evening, Dave {i}" for i in range(200)]
+    results = list(language.from_buffers(iter(strings), serverEndpoint=language_server.url, workers=8))
+    assert sorted(string for string, _, _ in results) == sorted(strings)
+    assert {(lang, error) for _, lang, error in results} == {("en", None)}
+    assert sorted(language_server.bodies) == sorted(strings)
+    ordered = language.from_buffers(strings[:20], serverEndpoint=language_server.url, workers=8, ordered=True)
+    assert [string for string, _, _ in ordered] == strings[:20]
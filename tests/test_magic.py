@@ -0,0 +1,87 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import io
+import json
+
+import pytest
+
+import tika.magic
+import tika.tika
+from stub_server import serve
+from tika import detector
+from tika.magic import MagicClassifier
+
+PDF = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n" + bytes(100)
+ZIP = b"PK\x03\x04\x14\x00\x06\x00" + bytes(100)
+TEXT = "Good evening, David. How are you?\n".encode("utf-8") * 10
+
+
+@pytest.fixture
+def fresh_classifier(client_only, monkeypatch):
+    monkeypatch.setattr(tika.magic, "_classifier", None)
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+
+
+@pytest.mark.parametrize("head, filename, expected", [
+    (PDF, None, "application/pdf"),
+    (PDF, "report.PDF", "application/pdf"),
+    (PDF, "scan", "application/pdf"),
+    (PDF, "drawing.ai", None),
+    (b"\x89PNG\r\n\x1a\n" + bytes(20), None, "image/png"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "photo.webp", "image/webp"),
+    (bytes(257) + b"ustar\x0000", "backup.tar", "application/x-tar"),
+    (ZIP, "archive.zip", "application/zip"),
+    (ZIP, None, None),
+    (ZIP, "letter.docx", None),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + bytes(100), None, None),
+    (TEXT, None, "text/plain"),
+    (TEXT, "notes.txt", "text/plain"),
+    (TEXT, "table.csv", None),
+    ("Grüße aus Köln\n".encode("utf-8")[:4], None, "text/plain"),
+    (b"<?xml version='1.0'?><svg/>", None, None),
+    (b"From dave@example.com Mon Jan  1\n", None, None),
+    (b"Subject: hello\n\nGood evening", None, None),
+    (b"#!/bin/sh\necho", None, None),
+    ("Grüße".encode("latin-1"), None, None),
+    (b"Good\x00evening", None, None),
+    (b"", None, None),
+])
+def test_classify(head, filename, expected):
+    assert MagicClassifier().classify(head, filename) == expected
+
+
+def test_signatures_follow_the_server_mime_types():
+    classifier = MagicClassifier({
+        "application/pdf": {"supertype": "application/octet-stream", "alias": []},
+        "image/x-png": {"alias": ["image/png"]},
+    })
+    assert classifier.classify(PDF) == "application/pdf"
+    assert classifier.classify(b"\x89PNG\r\n\x1a\n") == "image/x-png"
+    assert classifier.classify(b"GIF89a") is None
+    assert classifier.classify(TEXT) is None
+    assert classifier.counts.snapshot() == {"local": 2, "fallback": 2}
+
+
+def test_detector_falls_back_to_server(fresh_classifier, monkeypatch, tmp_path):
+    mimeTypes = {"application/pdf": {}, "text/plain": {}, "application/zip": {}}
+    routes = {
+        "/mime-types": (200, "application/json", json.dumps(mimeTypes).encode("utf-8")),
+        "/detect/stream": (200, "text/plain", b"application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    }
+    pdf = tmp_path / "report.pdf"
+    pdf.write_bytes(PDF)
+    with serve(routes) as httpd:
+        assert detector.from_buffer(TEXT, serverEndpoint=httpd.url, classifier=True) == "text/plain"
+        assert detector.from_file(str(pdf), serverEndpoint=httpd.url, classifier=True) == "application/pdf"
+        # a ZIP may be many things, so the server is asked, with the whole buffer
+        docx = io.BytesIO(ZIP)
+        assert detector.from_buffer(docx, serverEndpoint=httpd.url, classifier=True).endswith(".document")
+        assert httpd.requests == 2
+        assert httpd.bytes_received == len(ZIP)
+
+        monkeypatch.setattr(tika.tika, "TikaLocalDetect", True)
+        results = list(detector.from_files([str(pdf)] * 3, serverEndpoint=httpd.url))
+        assert [mime for _, mime, _ in results] == ["application/pdf"] * 3
+        assert detector.from_buffer(iter([PDF]), serverEndpoint=httpd.url).endswith(".document")
+        assert httpd.requests == 3
+    assert tika.magic.getClassifier().counts.snapshot() == {"local": 5, "fallback": 1}
@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import requests
+
+import tika.tika
+from stub_server import serve
+from tika import detector, metrics, parser
+from tika.cache import MemoryCache
+from tika.metrics import ClientMetrics
+from tika.resilience import Counters
+
+
+@pytest.fixture
+def client_metrics(monkeypatch):
+    registry = ClientMetrics()
+    monkeypatch.setattr(tika.tika, "TikaMetrics", registry)
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    return registry
+
+
+@pytest.fixture
+def spans():
+    recorded = []
+    metrics.addSpanHook(recorded.append)
+    yield recorded
+    metrics.removeSpanHook(recorded.append)
+
+
+def test_calls_are_recorded_per_service(tika_stub_server, client_only, client_metrics, test_file_path):
+    calls = []
+    metrics.addCallHook(calls.append)
+    try:
+        parser.from_file(str(test_file_path), tika_stub_server.url)
+        detector.from_buffer(b"Good evening", serverEndpoint=tika_stub_server.url)
+    finally:
+        metrics.removeCallHook(calls.append)
+
+    snapshot = client_metrics.snapshot()
+    assert sorted(snapshot) == ["/detect/stream", "/rmeta/text"]
+    rmeta = snapshot["/rmeta/text"]
+    assert rmeta["requests"] == 1
+    assert rmeta["statuses"] == {200: 1}
+    assert rmeta["bytesSent"] == test_file_path.stat().st_size
+    assert rmeta["bytesReceived"] == len(tika_stub_server.routes["/rmeta/text"][2])
+    assert rmeta["latency"]["count"] == 1
+    assert rmeta["latency"]["buckets"][float("inf")] == 1
+    assert snapshot["/detect/stream"]["bytesSent"] == len(b"Good evening")
+
+    assert [(call.service, call.status, call.endpoint) for call in calls] == [
+        ("/rmeta/text", 200, tika_stub_server.url), ("/detect/stream", 200, tika_stub_server.url)]
+    assert calls[0].serverSeconds <= calls[0].seconds
+
+
+def test_spans_tell_where_time_goes(tika_stub_server, client_only, client_metrics, spans, test_file_path):
+    parser.from_file(str(test_file_path), tika_stub_server.url)
+    assert [span.name for span in spans] == ["open", "request", "response", "decode"]
+    assert spans[0].attributes["path"] == str(test_file_path)
+    assert spans[1].attributes["service"] == "/rmeta/text"
+    assert all(span.duration >= 0 for span in spans)
+
+
+def test_retries_errors_and_cache_hits(client_only, client_metrics, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaCounters", Counters())
+    monkeypatch.setattr(tika.tika, "_circuitBreakers", {})
+    monkeypatch.setattr(tika.tika, "TikaRetries", 1)
+    monkeypatch.setattr(tika.tika, "TikaRetryBackoff", 0.01)
+    answers = [(503, "text/plain", b"busy")] + [(200, "text/plain", b"text/plain")] * 2
+    with serve({"/detect/stream": lambda handler: answers.pop(0)}) as httpd:
+        detector.from_buffer(b"Good evening", serverEndpoint=httpd.url)
+        monkeypatch.setattr(tika.tika, "TikaResultCache", MemoryCache())
+        for _ in range(2):
+            detector.from_buffer(b"cached", serverEndpoint=httpd.url)
+
+    with pytest.raises(requests.ConnectionError):
+        detector.from_buffer(b"Good evening", serverEndpoint=httpd.url)
+
+    detect = client_metrics.snapshot()["/detect/stream"]
+    assert detect["requests"] == 4
+    assert detect["retries"] == 2
+    assert detect["cacheHits"] == 1
+    assert detect["errors"] == 1
+    assert detect["statuses"] == {200: 3}
+
+
+def test_prometheus_exposition(tika_stub_server, client_only, client_metrics):
+    detector.from_buffer(b"Good evening", serverEndpoint=tika_stub_server.url)
+    text = client_metrics.prometheus()
+    assert '# TYPE tika_client_requests_total counter' in text
+    assert 'tika_client_requests_total{service="detect"} 1' in text
+    assert 'tika_client_responses_total{service="detect",status="200"} 1' in text
+    assert 'tika_client_latency_seconds_bucket{service="detect",le="+Inf"} 1' in text
+    assert 'tika_client_latency_seconds_count{service="detect"} 1' in text
+
+
+def test_prometheus_labels_are_service_names(client_metrics):
+    for service in ("/meta/Content-Type", "/meta/dc:title", '/odd"service\\\n'):
+        call = metrics.CallRecord("put", service)
+        call.status = 200
+        call.finish()
+        client_metrics.record(call)
+    text = client_metrics.prometheus()
+    assert 'tika_client_requests_total{service="meta"} 2' in text
+    assert 'tika_client_latency_seconds_count{service="meta"} 2' in text
+    assert 'tika_client_requests_total{service="odd\\"service\\\\\\n"} 1' in text
+    assert "/meta" not in text
+
+
+def test_failing_hooks_do_not_fail_calls(tika_stub_server, client_only, client_metrics, test_file_path, caplog):
+    def failing(record):
+        raise RuntimeError("hook is broken")
+
+    metrics.addCallHook(failing)
+    metrics.addSpanHook(failing)
+    try:
+        assert parser.from_file(str(test_file_path), tika_stub_server.url)["content"]
+    finally:
+        metrics.removeCallHook(failing)
+        metrics.removeSpanHook(failing)
+    assert client_metrics.snapshot()["/rmeta/text"]["requests"] == 1
+    assert "Tika metrics hook" in caplog.text
+
+
+def test_parse_timings(tika_stub_server, client_only, client_metrics, test_file_path):
+    parsed = parser.from_file(str(test_file_path), tika_stub_server.url, timings=True)
+    timings = parsed["timings"]
+    assert sorted(timings) == ["decode", "open", "request", "response", "total"]
+    assert timings["total"] >= timings["request"] + timings["decode"]
+    assert "timings" not in parser.from_file(str(test_file_path), tika_stub_server.url)
+
+    documents = parser.from_buffer(b"Good evening", tika_stub_server.url, per_document=True, timings=True)
+    assert "open" not in documents[0]["timings"]
+    with pytest.raises(tika.tika.TikaException):
+        parser.from_file(str(test_file_path), tika_stub_server.url, stream=True, timings=True)
+
+
+def test_profile_summarizes_phases():
+    profile = metrics.Profile()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        profile.add({"request": seconds, "total": seconds + 0.1})
+    summary = profile.summary()
+    assert summary["request"]["count"] == 4
+    assert summary["request"]["p50"] == 0.2
+    assert summary["request"]["max"] == 0.4
+    assert summary["request"]["total"] == pytest.approx(1.0)
+    table = profile.table().splitlines()
+    assert [line.split()[0] for line in table] == ["phase", "request", "total"]
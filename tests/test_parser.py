@@ -1,8 +1,14 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from http import HTTPStatus
+import json
+import tracemalloc
 
+import pytest
+
+from stub_server import serve
 from tika import parser
+from tika.tika import TikaException
 
 
 def test_remote_pdf(remote_fixture_base_url):
@@ -39,3 +45,79 @@ def test_local_buffer():
 def test_local_path(test_file_path):
     """parse file path"""
     assert parser.from_file(str(test_file_path))
+
+
+def test_from_files(tika_stub_server, client_only, test_file_path, tmp_path):
+    paths = [str(test_file_path)] * 5 + [str(tmp_path / "missing.pdf")]
+    results = list(parser.from_files(paths, tika_stub_server.url, workers=3, ordered=True))
+    assert [path for path, _, _ in results] == paths
+    assert all(parsed["content"] == "Good evening, Dave" for _, parsed, _ in results[:5])
+    assert isinstance(results[5][2], FileNotFoundError)
+
+
+def test_json_array_decoded_across_any_chunk_boundary():
+    documents = [{"Content-Type": "text/plain", "X-TIKA:content": "Bäume ☃"}, {"n": [1, 2.5, None]}]
+    data = json.dumps(documents).encode("utf-8")
+    for split in range(len(data)):
+        assert list(parser._iterJsonArray([data[:split], data[split:]])) == documents
+    assert list(parser._iterJsonArray(data[i:i + 1] for i in range(len(data)))) == documents
+    assert list(parser._iterJsonArray([b" [ ] "])) == []
+
+
+def test_json_array_truncated():
+    with pytest.raises(ValueError):
+        list(parser._iterJsonArray([b'[{"a": 1}, {"b"']))
+
+
+def test_stream_yields_embedded_documents(client_only):
+    documents = [{"Content-Type": "application/zip", "X-TIKA:content": "archive"},
+                 {"Content-Type": "text/plain", "X-TIKA:content": "Good evening, Dave"},
+                 {"Content-Type": "image/png"}]
+    with serve({"/rmeta/text": (200, "application/json", json.dumps(documents).encode("utf-8"))}) as httpd:
+        parsed = list(parser.from_buffer(b"PK", httpd.url, stream=True))
+    assert [p["content"] for p in parsed] == ["archive", "Good evening, Dave", None]
+    assert [p["metadata"]["Content-Type"] for p in parsed] == ["application/zip", "text/plain", "image/png"]
+    assert all(p["status"] == 200 for p in parsed)
+
+
+def test_stream_memory_is_bounded_by_largest_document(client_only):
+    documents = [{"Content-Type": "text/plain", "X-TIKA:content": "%d " % i + "x" * 10000} for i in range(2000)]
+    body = json.dumps(documents).encode("utf-8")
+    del documents
+    with serve({"/rmeta/text": (200, "application/json", body)}) as httpd:
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in parser.from_buffer(b"PK", httpd.url, stream=True))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    assert count == 2000
+    assert peak < len(body) / 4
+
+
+def test_stream_from_file(tika_stub_server, client_only, test_file_path):
+    parsed = list(parser.from_file(str(test_file_path), tika_stub_server.url, stream=True))
+    assert [p["content"] for p in parsed] == ["Good evening, Dave"]
+
+
+def test_stream_only_for_all_service():
+    with pytest.raises(TikaException):
+        parser.from_file("whatever.pdf", service="meta", stream=True)
+
+
+def test_parse_merges_embedded_documents():
+    documents = [{"Content-Type": "message/rfc822", "Message-To": ["a", "b"], "X-TIKA:content": "one "},
+                 {"Content-Type": "text/plain", "Message-To": "c", "dc:title": "two", "X-TIKA:content": "two"},
+                 {"Content-Type": "image/png"}]
+    parsed = parser._parse((200, json.dumps(documents)))
+    assert parsed["content"] == "one two"
+    assert parsed["metadata"] == {"Content-Type": ["message/rfc822", "text/plain", "image/png"],
+                                  "Message-To": ["a", "b", "c"], "dc:title": "two"}
+
+
+def test_parse_per_document():
+    documents = [{"Content-Type": "message/rfc822", "X-TIKA:content": "one"}, {"Content-Type": "image/png"}]
+    parsed = parser._parse((200, json.dumps(documents)), per_document=True)
+    assert parsed == [{"status": 200, "metadata": {"Content-Type": "message/rfc822"}, "content": "one"},
+                      {"status": 200, "metadata": {"Content-Type": "image/png"}, "content": None}]
+    assert parser._parse((200, ""), per_document=True) == []
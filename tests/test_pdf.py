@@ -1,8 +1,37 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import json
+
+from stub_server import serve
 from tika import pdf
 
 
 def test_local_path(test_file_path):
     text_pages = pdf.text_from_pdf_pages(str(test_file_path))
     assert isinstance(text_pages, list)
+
+
+XHTML = (
+    '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>doc</title></head><body>'
+    '<div class="page"><p>First page,</p>\n<p>two lines &amp; an entity</p>\n</div>'
+    '<div class="page"><p>Second page</p><div class="annotation"><p>note</p></div></div>'
+    '<div class="page"></div>'
+    '</body></html>'
+)
+
+
+def test_pages_from_a_single_request(client_only, tmp_path):
+    rmeta = json.dumps([{"Content-Type": "application/pdf", "X-TIKA:content": XHTML}]).encode("utf-8")
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4")
+    with serve({"/rmeta/xml": (200, "application/json", rmeta)}) as httpd:
+        pages = pdf.text_from_pdf_pages(str(tmp_path / "doc.pdf"), httpd.url)
+        assert httpd.requests == 1
+    assert pages == ["First page,\ntwo lines & an entity", "Second page\nnote", ""]
+
+
+def test_pages_are_yielded_lazily():
+    page_parser = pdf._PageTextParser()
+    page_parser.feed('<body><div class="page"><p>one</p></div><div class="pa')
+    assert page_parser.popPages() == ["one"]
+    page_parser.feed('ge"><p>two</p></div>')
+    assert page_parser.popPages() == ["two"]
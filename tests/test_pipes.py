@@ -0,0 +1,138 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+
+import pytest
+
+import tika.tika
+from stub_server import serve
+from tika import pipes
+from tika.resilience import Counters
+from tika.tika import TikaException
+
+
+def async_route(fetch_base, emit_dir, throttled=0):
+    """an /async endpoint with a file system fetcher and emitter, answering ``throttled`` times that it is busy"""
+    calls = []
+
+    def route(handler):
+        calls.append(handler.body)
+        if len(calls) <= throttled:
+            return 503, "application/json", b'{"status": "throttled"}'
+        tuples = json.loads(handler.body)
+        for entry in tuples:
+            size = os.stat(os.path.join(fetch_base, entry["fetchKey"])).st_size
+            target = os.path.join(emit_dir, entry["emitKey"] + ".json")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "w") as f:
+                json.dump([{"Content-Type": "application/pdf", "Content-Length": str(size),
+                            "X-TIKA:content": "parsed " + entry["fetchKey"]}], f)
+        return 200, "application/json", json.dumps({"status": "ok", "added": len(tuples)}).encode()
+
+    route.calls = calls
+    return route
+
+
+def make_corpus(path, size, count=3):
+    path.mkdir()
+    for i in range(count):
+        with open(path / f"doc{i}.pdf", "wb") as f:
+            f.truncate(size)
+    return sorted(str(path / name) for name in os.listdir(path))
+
+
+def test_from_paths(client_only, tmp_path):
+    paths = make_corpus(tmp_path / "corpus", 100)
+    emit_dir = tmp_path / "parsed"
+    with serve({"/async": async_route(str(tmp_path / "corpus"), str(emit_dir))}) as httpd:
+        results = list(pipes.from_paths(paths, str(tmp_path / "corpus"), str(emit_dir), httpd.url, batchSize=2))
+        assert httpd.requests == 2
+    assert sorted(path for path, _, _ in results) == paths
+    assert all(error is None for _, _, error in results)
+    assert {parsed["content"] for _, parsed, _ in results} == {"parsed doc0.pdf", "parsed doc1.pdf", "parsed doc2.pdf"}
+
+
+def test_bandwidth_does_not_depend_on_document_size(client_only, tmp_path):
+    received = []
+    for size in (1024, 256 * 1024 * 1024):
+        corpus = tmp_path / f"corpus{size}"
+        paths = make_corpus(corpus, size)
+        emit_dir = tmp_path / f"parsed{size}"
+        with serve({"/async": async_route(str(corpus), str(emit_dir))}) as httpd:
+            results = list(pipes.from_paths(paths, str(corpus), str(emit_dir), httpd.url))
+            received.append(httpd.bytes_received)
+        assert [parsed["metadata"]["Content-Length"] for _, parsed, _ in results] == [str(size)] * 3
+    assert received[0] == received[1] < 2048
+
+
+def test_submit_waits_while_throttled(client_only, tmp_path):
+    make_corpus(tmp_path / "corpus", 10, count=1)
+    route = async_route(str(tmp_path / "corpus"), str(tmp_path / "parsed"), throttled=2)
+    with serve({"/async": route}) as httpd:
+        submitted = pipes.submit([pipes.fetch_emit_tuple("doc0.pdf")], httpd.url, throttleWait=0.01)
+    assert len(route.calls) == 3
+    assert [entry["emitKey"] for entry in submitted] == ["doc0.pdf"]
+    assert (tmp_path / "parsed" / "doc0.pdf.json").exists()
+
+
+def test_throttling_does_not_open_the_circuit(client_only, tmp_path, monkeypatch):
+    monkeypatch.setattr(tika.tika, "_circuitBreakers", {})
+    monkeypatch.setattr(tika.tika, "TikaCounters", Counters())
+    throttled = tika.tika.TikaBreakerThreshold + 3
+    make_corpus(tmp_path / "corpus", 10, count=1)
+    route = async_route(str(tmp_path / "corpus"), str(tmp_path / "parsed"), throttled=throttled)
+    with serve({"/async": route}) as httpd:
+        pipes.submit([pipes.fetch_emit_tuple("doc0.pdf")], httpd.url, throttleWait=0.001, maxThrottleWait=0.001)
+        assert tika.tika.getCircuitBreaker(httpd.url).allow()
+    assert len(route.calls) == throttled + 1
+    assert tika.tika.TikaCounters["throttled"] == throttled
+    assert tika.tika.TikaCounters["unavailable"] == 0
+
+
+def test_missing_results_time_out(client_only, tmp_path):
+    paths = make_corpus(tmp_path / "corpus", 10, count=1)
+    with serve({"/async": (200, "application/json", b'{"status": "ok"}')}) as httpd:
+        results = list(pipes.from_paths(paths, str(tmp_path / "corpus"), str(tmp_path / "parsed"), httpd.url,
+                                        timeout=0.2))
+    assert [(path, parsed) for path, parsed, _ in results] == [(paths[0], None)]
+    assert isinstance(results[0][2], TikaException)
+
+
+def test_paths_must_be_below_fetch_base(tmp_path):
+    with pytest.raises(TikaException):
+        list(pipes.from_paths([str(tmp_path / "elsewhere.pdf")], str(tmp_path / "corpus"), str(tmp_path)))
+
+
+def test_names_starting_with_dots_are_below_fetch_base(client_only, tmp_path):
+    corpus = tmp_path / "corpus"
+    (corpus / "sub").mkdir(parents=True)
+    paths = [str(corpus / "..notes.txt"), str(corpus / "sub" / "..more.txt")]
+    for path in paths:
+        open(path, "wb").close()
+    with serve({"/async": async_route(str(corpus), str(tmp_path / "parsed"))}) as httpd:
+        results = list(pipes.from_paths(paths, str(corpus), str(tmp_path / "parsed"), httpd.url))
+    assert sorted((path, error) for path, _, error in results) == sorted((path, None) for path in paths)
+
+
+def test_collect_lists_the_emit_dir_once_per_poll(tmp_path, monkeypatch):
+    keys = [f"doc{i}.pdf" for i in range(500)]
+    for key in keys[:-1]:
+        (tmp_path / (key + ".json")).write_text('[{"X-TIKA:content": "parsed"}]')
+    opened = []
+    monkeypatch.setattr(pipes, "open", lambda path, *args, **kwargs: opened.append(path) or open(path, *args, **kwargs),
+                        raising=False)
+    with pytest.raises(TikaException):
+        list(pipes.collect(str(tmp_path), keys, timeout=0.05, pollInterval=0.01))
+    # only results that are there are read, and each of them once
+    assert len(opened) == len(keys) - 1
+
+
+def test_truncated_result_is_an_error(tmp_path):
+    (tmp_path / "doc0.pdf.json").write_text('[{"X-TIKA:content": "parsed"}]')
+    (tmp_path / "doc1.pdf.json").write_text('[{"X-TIKA:content": "pars')
+    results = dict((key, (parsed, error)) for key, parsed, error in
+                   pipes.collect(str(tmp_path), ["doc0.pdf", "doc1.pdf"], pollInterval=0.01))
+    assert results["doc0.pdf"][0]["content"] == "parsed"
+    assert results["doc1.pdf"][0] is None
+    assert isinstance(results["doc1.pdf"][1], TikaException)
@@ -0,0 +1,107 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import socket
+import time
+
+import pytest
+import requests
+
+from stub_server import serve
+import tika.tika
+from tika import detector, parser
+from tika.resilience import CLOSED, OPEN, CircuitBreaker, Counters
+from tika.tika import CircuitOpenError, requestTimeout
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    """fresh counters and circuit breakers, so earlier calls don't leak into a test"""
+    monkeypatch.setattr(tika.tika, "_circuitBreakers", {})
+    monkeypatch.setattr(tika.tika, "TikaCounters", Counters())
+    monkeypatch.setattr(tika.tika, "TikaRetryBackoff", 0.01)
+    return tika.tika.TikaCounters
+
+
+def dead_endpoint():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "http://127.0.0.1:%d" % sock.getsockname()[1]
+
+
+def test_request_timeout_depends_on_service_and_size(monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaTimeout", 60)
+    monkeypatch.setattr(tika.tika, "TikaConnectTimeout", 10)
+    monkeypatch.setattr(tika.tika, "TikaTimeoutPerMB", 2)
+    monkeypatch.setattr(tika.tika, "TikaServiceTimeouts", tika.tika.parseServiceTimeouts("detect=5, /rmeta/text=100"))
+    assert requestTimeout("/detect/stream") == (5, 5)
+    assert requestTimeout("/rmeta/text", 3 * 1024 * 1024) == (10, 106)
+    assert requestTimeout("/tika", None) == (10, 60)
+
+
+def test_slow_documents_are_not_retried(client_only, counters):
+    def slow(handler):
+        time.sleep(0.5)
+        return 200, "text/plain", b"text/plain"
+
+    with serve({"/detect/stream": slow}) as httpd:
+        with pytest.raises(requests.ReadTimeout):
+            detector.from_buffer(b"Good evening", serverEndpoint=httpd.url, requestOptions={"timeout": 0.1})
+        assert httpd.requests == 1
+    assert counters["timeouts"] == 1
+    assert counters["retries"] == 0
+
+
+def test_unavailable_server_is_retried_with_backoff(client_only, counters, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaRetries", 2)
+    answers = [(503, "text/plain", b"restarting")] * 2 + [(200, "text/plain", b"text/plain")]
+
+    with serve({"/detect/stream": lambda handler: answers.pop(0)}) as httpd:
+        assert detector.from_buffer(b"Good evening", serverEndpoint=httpd.url) == "text/plain"
+        assert httpd.requests == 3
+    assert counters.snapshot() == {"requests": 3, "unavailable": 2, "retries": 2}
+
+
+@pytest.mark.parametrize("status", [502, 504])
+def test_post_is_not_retried_with_backoff(client_only, counters, monkeypatch, status):
+    monkeypatch.setattr(tika.tika, "TikaRetries", 2)
+    with serve({"/async": (status, "text/plain", b"gateway")}) as httpd:
+        assert tika.tika.callServer("post", httpd.url, "/async", "[]", {})[0] == status
+        assert httpd.requests == 1
+        # unless the caller knows sending it again is harmless
+        assert tika.tika.callServer("post", httpd.url, "/async", "[]", {}, retry=True)[0] == status
+        assert httpd.requests == 4
+    assert counters["retries"] == 2
+
+
+def test_circuit_opens_and_fails_fast(client_only, counters, monkeypatch, test_file_path):
+    monkeypatch.setattr(tika.tika, "TikaBreakerThreshold", 2)
+    monkeypatch.setattr(tika.tika, "TikaBreakerReset", 0.3)
+    endpoint = dead_endpoint()
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            parser.from_file(str(test_file_path), endpoint)
+    with pytest.raises(CircuitOpenError):
+        parser.from_file(str(test_file_path), endpoint)
+    assert counters["connectionErrors"] == 2
+    assert counters["circuitOpened"] == 1
+    assert counters["circuitRefused"] == 1
+
+    # once the reset timeout is over, a successful probe closes the circuit
+    time.sleep(0.3)
+    port = int(endpoint.rsplit(":", 1)[1])
+    with serve(port=port) as httpd:
+        assert parser.from_file(str(test_file_path), endpoint)["content"] == "Good evening, Dave"
+        assert httpd.requests == 1
+    assert tika.tika.getCircuitBreaker(endpoint).state == CLOSED
+
+
+def test_failed_probe_reopens_circuit(monkeypatch):
+    breaker = CircuitBreaker(failureThreshold=1, resetTimeout=0.05)
+    assert breaker.recordFailure()
+    assert not breaker.allow()
+    time.sleep(0.05)
+    assert breaker.allow()
+    assert not breaker.allow()  # one probe at a time
+    assert breaker.recordFailure()
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
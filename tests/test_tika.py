@@ -13,8 +13,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+import mmap
+import os
+import socket
+import sys
+import time
+import tracemalloc
+
+import pytest
+import requests
+
 import tika.tika
 from tika import parser
+from tika.manifest import ParseManifest
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
 
 
 def test_kill_server(test_file_path):
@@ -22,3 +40,225 @@ def test_kill_server(test_file_path):
     with open(test_file_path, "rb") as file_obj:
         tika.parser.from_file(file_obj)
     assert tika.tika.killServer() is None
+
+
+def test_session_reuses_connections(tika_stub_server, client_only):
+    session = tika.tika.createSession()
+    for _ in range(5):
+        status, _ = tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", b"Good evening, Dave",
+                                         {"Accept": "text/plain"}, session=session)
+        assert status == 200
+    assert tika_stub_server.connections == 1
+
+
+def test_session_without_keep_alive(tika_stub_server, client_only):
+    session = tika.tika.createSession(keepAlive=False)
+    for _ in range(3):
+        tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", b"Good evening, Dave",
+                             {"Accept": "text/plain"}, session=session)
+    assert tika_stub_server.connections == 3
+
+
+def test_server_check_is_cached(tika_stub_server, monkeypatch):
+    tika.tika.resetServerState()
+    checks = []
+    real_check = tika.tika.checkTikaServer
+    monkeypatch.setattr(tika.tika, "checkTikaServer", lambda *args: checks.append(args) or real_check(*args))
+    for _ in range(3):
+        tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", b"Good evening, Dave",
+                             {"Accept": "text/plain"})
+    assert len(checks) == 1
+
+
+def test_server_check_repeated_after_connection_error(tika_stub_server, monkeypatch):
+    tika.tika.resetServerState()
+    checks = []
+    monkeypatch.setattr(tika.tika, "checkTikaServer", lambda *args: checks.append(args) or tika_stub_server.url)
+    tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", b"", {"Accept": "text/plain"})
+
+    def refuse(url, data=None, **kwargs):
+        raise requests.ConnectionError("refused")
+
+    with pytest.raises(requests.ConnectionError):
+        tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", b"", {"Accept": "text/plain"},
+                             httpVerbs={"put": refuse})
+    tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", b"", {"Accept": "text/plain"})
+    assert len(checks) == 2
+
+
+def test_run_batch_reports_errors_without_aborting():
+    def fail_on_odd(n):
+        if n % 2:
+            raise ValueError(n)
+        return n * 10
+
+    results = list(tika.tika.runBatch(fail_on_odd, range(20), workers=4, ordered=True))
+    assert [item for item, _, _ in results] == list(range(20))
+    assert [result for item, result, _ in results if item % 2 == 0] == [n * 10 for n in range(0, 20, 2)]
+    assert all(isinstance(error, ValueError) for item, _, error in results if item % 2)
+
+
+def test_run_batch_yields_in_completion_order():
+    results = tika.tika.runBatch(lambda delay: time.sleep(delay) or delay, [0.3, 0.0], workers=2)
+    assert [item for item, _, _ in results] == [0.0, 0.3]
+
+
+def test_parse_and_save_directory(tika_stub_server, client_only, tmp_path):
+    corpus = tmp_path / "corpus"
+    (corpus / "nested").mkdir(parents=True)
+    for i in range(6):
+        (corpus / ("nested" if i % 2 else "") / f"doc{i}.txt").write_text(f"document {i}")
+    out = tmp_path / "out"
+    out.mkdir()
+
+    meta_paths = tika.tika.parseAndSave("all", str(corpus), str(out), tika_stub_server.url, workers=3)
+
+    assert sorted(meta_paths) == sorted(str(out / f"doc{i}.txt_meta.json") for i in range(6))
+    assert (out / "doc0.txt_meta.json").read_text().startswith('[{"Content-Type"')
+
+
+def test_parse_and_save_skips_failures(tika_stub_server, client_only, tmp_path):
+    (tmp_path / "doc.txt").write_text("document")
+    meta_paths = tika.tika.parseAndSave("all", [str(tmp_path / "doc.txt"), str(tmp_path / "missing.txt")],
+                                        serverEndpoint=tika_stub_server.url)
+    assert meta_paths == [str(tmp_path / "doc.txt") + "_meta.json"]
+    assert (tmp_path / "doc.txt_meta.json").exists()
+
+
+def test_parse_and_save_incremental(tika_stub_server, client_only, tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (corpus / name).write_text(name)
+    out = tmp_path / "out"
+    out.mkdir()
+    manifest = str(tmp_path / "manifest.json")
+
+    def run():
+        return sorted(os.path.basename(path) for path in tika.tika.parseAndSave(
+            "all", str(corpus), str(out), tika_stub_server.url, manifestPath=manifest))
+
+    assert run() == ["a.txt_meta.json", "b.txt_meta.json", "c.txt_meta.json"]
+    assert run() == []
+    assert tika_stub_server.requests == 3
+
+    (corpus / "a.txt").write_text("changed")
+    (corpus / "d.txt").write_text("new")
+    os.utime(corpus / "b.txt")  # touched, same content
+    (corpus / "c.txt").unlink()
+    assert run() == ["a.txt_meta.json", "d.txt_meta.json"]
+    assert not (out / "c.txt_meta.json").exists()
+    assert sorted(os.listdir(out)) == ["a.txt_meta.json", "b.txt_meta.json", "d.txt_meta.json"]
+
+    (out / "d.txt_meta.json").unlink()
+    assert run() == ["d.txt_meta.json"]
+
+
+def test_parse_and_save_removes_output_of_deleted_root(tika_stub_server, client_only, tmp_path):
+    for directory in ("x", "y"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "doc.txt").write_text(directory)
+    (tmp_path / "gone.txt").write_text("gone")
+    out = tmp_path / "out"
+    out.mkdir()
+    manifest = str(tmp_path / "manifest.json")
+    roots = [str(tmp_path / "x"), str(tmp_path / "y" / "doc.txt"), str(tmp_path / "gone.txt")]
+
+    tika.tika.parseAndSave("text", roots, str(out), tika_stub_server.url, manifestPath=manifest)
+    assert sorted(os.listdir(out)) == ["doc.txt_meta.json", "gone.txt_meta.json"]
+
+    (tmp_path / "gone.txt").unlink()
+    (tmp_path / "x" / "doc.txt").unlink()
+    tika.tika.parseAndSave("text", roots, str(out), tika_stub_server.url, manifestPath=manifest)
+    # y/doc.txt still owns the output it shared with x/doc.txt
+    assert sorted(os.listdir(out)) == ["doc.txt_meta.json"]
+    assert len(ParseManifest(manifest)) == 1
+
+
+def test_parse_profile(tika_stub_server, client_only, tmp_path, capsys):
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text(name)
+    port = tika_stub_server.url.rsplit(":", 1)[1]
+    metaPaths = tika.tika.main(["tika.py", "--server", "127.0.0.1", "--port", port, "-o", str(tmp_path),
+                                "--profile", "parse", "all", str(tmp_path / "a.txt"), str(tmp_path / "b.txt")])
+    assert len(metaPaths) == 2
+    table = capsys.readouterr().err.splitlines()
+    rows = {line.split()[0]: line.split()[1] for line in table[1:]}
+    assert rows == {"open": "2", "request": "2", "response": "2", "write": "2", "total": "2"}
+
+
+def test_iter_paths_is_lazy(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    paths = tika.tika.iterPaths(str(tmp_path))
+    assert next(paths) == str(tmp_path / "a.txt")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fake java is a POSIX script")
+def test_start_server_polls_for_readiness(fake_server_jar, fake_java, monkeypatch):
+    monkeypatch.setenv("FAKE_JAVA_QUIET", "1")
+    monkeypatch.setattr(tika.tika, "TikaStartupSleep", 5)
+    port = free_port()
+    try:
+        assert tika.tika.startServer(str(fake_server_jar), fake_java, "", "127.0.0.1", port)
+        assert tika.tika.TikaServerReadyTime < 5
+        assert tika.tika.TikaServerProcess.readyAfter == tika.tika.TikaServerReadyTime
+    finally:
+        tika.tika.killServer()
+
+
+def test_start_server_fails_fast_when_server_exits(fake_server_jar, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaStartupTimeout", 60)
+    start = time.monotonic()
+    assert not tika.tika.startServer(str(fake_server_jar), sys.executable, "-c 'import sys; sys.exit(1)'",
+                                     "127.0.0.1", free_port())
+    assert time.monotonic() - start < 10
+
+
+def test_call_server_streams_generators(tika_stub_server, client_only):
+    chunks = (b"x" * 1000 for _ in range(100))
+    status, _ = tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", chunks, {"Accept": "text/plain"})
+    assert status == 200
+    assert tika_stub_server.bytes_received == 100000
+
+
+def test_call_server_streams_mmap(tika_stub_server, client_only, tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"x" * 300000)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        status, response = tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", mapped,
+                                                {"Accept": "text/plain"})
+    assert (status, response) == (200, "text/plain")
+    assert tika_stub_server.bytes_received == 300000
+
+
+def test_windows_uploads_files_in_chunks(tika_stub_server, client_only, tmp_path, monkeypatch):
+    monkeypatch.setattr(tika.tika, "Windows", True)
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"x" * 300000)
+    reads = []
+
+    class RecordingFile(io.FileIO):
+        def read(self, size=-1):
+            reads.append(size)
+            return super().read(size)
+
+    with RecordingFile(path) as f:
+        status, _ = tika.tika.callServer("put", tika_stub_server.url, "/detect/stream", f, {"Accept": "text/plain"})
+    assert status == 200
+    assert tika_stub_server.bytes_received == 300000
+    assert reads and all(0 < size <= tika.tika.TikaUploadChunkSize for size in reads)
+
+
+def test_upload_memory_does_not_grow_with_file_size(tika_stub_server, client_only, tmp_path):
+    path = tmp_path / "sparse.bin"
+    with open(path, "wb") as f:
+        f.truncate(64 * 1024 * 1024)
+    tracemalloc.start()
+    try:
+        parsed = parser.from_file(str(path), tika_stub_server.url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert parsed["status"] == 200
+    assert tika_stub_server.bytes_received == 64 * 1024 * 1024
+    assert peak < 8 * 1024 * 1024
@@ -1,6 +1,13 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import tarfile
+import tracemalloc
+
+import pytest
+
+from stub_server import serve, tar_response
 from tika import unpack
+from tika.tika import TikaException
 
 # Test data
 TEXT_UTF8 = "Hello, world!! 😎 👽"
@@ -35,3 +42,107 @@ def test_from_buffer_with_headers():
     assert parsed is not None
     assert parsed["metadata"] is not None
     assert parsed["metadata"]["Content-Length"] == "5"
+
+
+UNPACKED = {
+    "logo.png": b"\x89PNG" + b"\x00" * 1000,
+    "attachments/report.pdf": b"%PDF-1.4",
+    "__METADATA__": b'"Content-Type","message/rfc822"\n"Message-To","a","b"\n',
+    "__TEXT__": TEXT_UTF8.encode("utf8"),
+}
+
+
+def test_attachments_written_to_output_dir(client_only, tmp_path):
+    with serve({"/unpack/all": tar_response(UNPACKED)}) as httpd:
+        parsed = unpack.from_buffer(b"mail", httpd.url, outputDir=str(tmp_path / "out"))
+    assert parsed["content"] == TEXT_UTF8
+    assert parsed["metadata"] == {"Content-Type": "message/rfc822", "Message-To": ["a", "b"]}
+    assert parsed["attachments"] == {"logo.png": 1004, "attachments/report.pdf": 8}
+    assert (tmp_path / "out" / "attachments" / "report.pdf").read_bytes() == b"%PDF-1.4"
+
+
+def test_iter_attachments(client_only, tmp_path):
+    (tmp_path / "mail.eml").write_bytes(b"mail")
+    with serve({"/unpack/all": tar_response(UNPACKED)}) as httpd:
+        attachments = {name: f.read() for name, f in unpack.iter_attachments(str(tmp_path / "mail.eml"), httpd.url)}
+    assert attachments == {"logo.png": UNPACKED["logo.png"], "attachments/report.pdf": b"%PDF-1.4"}
+
+
+def test_attachments_cannot_escape_output_dir(client_only, tmp_path):
+    with serve({"/unpack/all": tar_response({"../evil.sh": b"rm -rf /"})}) as httpd:
+        with pytest.raises(TikaException):
+            unpack.from_buffer(b"mail", httpd.url, outputDir=str(tmp_path / "out"))
+    assert not (tmp_path / "evil.sh").exists()
+
+
+def test_streaming_unpack_memory_is_constant(client_only, tmp_path):
+    response = tar_response({f"attachment{i}.bin": bytes(16 * 1024 * 1024) for i in range(3)})
+    with serve({"/unpack/all": response}) as httpd:
+        tracemalloc.start()
+        try:
+            parsed = unpack.from_buffer(b"mail", httpd.url, outputDir=str(tmp_path))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    assert sum(parsed["attachments"].values()) == 48 * 1024 * 1024
+    assert peak < 4 * 1024 * 1024
+
+
+def test_streamed_metadata_is_decoded_like_buffered(client_only, tmp_path, monkeypatch):
+    # the archive encoding tarfile assumes, which is the file system encoding by default
+    monkeypatch.setattr(tarfile.TarFile, "encoding", "latin-1")
+    members = dict(UNPACKED, __METADATA__='"dc:title","Bäume"\n'.encode("latin-1"),
+                   __TEXT__=b"Good evening,\r\nDave.\r\n")
+    with serve({"/unpack/all": tar_response(members)}) as httpd:
+        buffered = unpack.from_buffer(b"mail", httpd.url)
+        streamed = unpack.from_buffer(b"mail", httpd.url, outputDir=str(tmp_path))
+        with unpack.from_buffer(b"mail", httpd.url, lazy=True) as lazy:
+            assert lazy["metadata"] == buffered["metadata"]
+            assert lazy["content"] == buffered["content"]
+    assert streamed["metadata"] == buffered["metadata"] == {"dc:title": "Bäume"}
+    assert streamed["content"] == buffered["content"] == "Good evening,\nDave.\n"
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_streamed_unpack_of_empty_error_response(client_only, tmp_path, lazy):
+    with serve({"/unpack/all": (500, "text/plain", b"")}) as httpd:
+        with pytest.raises(TikaException):
+            unpack.from_buffer(b"mail", httpd.url, outputDir=str(tmp_path), lazy=lazy)
+
+
+def test_lazy_attachments(client_only):
+    with serve({"/unpack/all": tar_response(UNPACKED)}) as httpd:
+        parsed = unpack.from_buffer(b"mail", httpd.url, lazy=True)
+    with parsed:
+        assert parsed["content"] == TEXT_UTF8
+        assert parsed["metadata"]["Message-To"] == ["a", "b"]
+        attachments = parsed["attachments"]
+        assert sorted(attachments) == ["attachments/report.pdf", "logo.png"]
+        assert attachments.size("logo.png") == 1004
+        assert attachments["attachments/report.pdf"] == b"%PDF-1.4"
+        with attachments.view("logo.png") as view:
+            assert view[:4] == b"\x89PNG"
+        assert dict(attachments) == {"logo.png": UNPACKED["logo.png"], "attachments/report.pdf": b"%PDF-1.4"}
+
+
+@pytest.mark.parametrize("status", [200, 204])
+def test_lazy_unpack_of_empty_response(client_only, status):
+    with serve({"/unpack/all": (status, "application/x-tar", b"")}) as httpd:
+        with unpack.from_buffer(b"mail", httpd.url, lazy=True) as parsed:
+            assert isinstance(parsed, unpack.UnpackResult)
+            assert parsed == {"content": "", "metadata": {}, "attachments": parsed["attachments"]}
+            assert len(parsed["attachments"]) == 0
+            assert "logo.png" not in parsed["attachments"]
+
+
+def test_lazy_unpack_does_not_read_attachments(client_only):
+    response = tar_response({f"attachment{i}.bin": bytes(16 * 1024 * 1024) for i in range(3)})
+    with serve({"/unpack/all": response}) as httpd:
+        tracemalloc.start()
+        try:
+            with unpack.from_buffer(b"mail", httpd.url, lazy=True) as parsed:
+                assert len(parsed["attachments"]) == 3
+                _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    assert peak < 4 * 1024 * 1024
@@ -0,0 +1,151 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+import tika.tika
+from stub_server import serve
+from tika import detector
+from tika.endpoints import EndpointPool
+from tika.watchdog import ServerWatchdog, processRss
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="fake java is a POSIX script")
+
+
+@pytest.fixture
+def server(fake_server_jar, fake_java, monkeypatch):
+    """a server auto-started by the first call, with fake_java standing in for java"""
+    monkeypatch.setattr(tika.tika, "TikaJava", fake_java)
+    monkeypatch.setattr(tika.tika, "TikaClientOnly", False)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    endpoint = "http://127.0.0.1:%d" % port
+    assert detector.from_buffer("Good evening", serverEndpoint=endpoint) == "text/plain"
+    yield endpoint
+    tika.tika.killServer()
+
+
+def watchdog_for(endpoint, **kwargs):
+    port = int(endpoint.rsplit(":", 1)[1])
+    return ServerWatchdog(port, "127.0.0.1", **kwargs)
+
+
+def test_crashed_server_is_restarted(server):
+    watchdog = watchdog_for(server)
+    assert watchdog.check() is None
+    crashed = tika.tika.TikaServerProcess
+    os.killpg(crashed.pid, 9)
+    crashed.wait()
+
+    assert watchdog.check() == "exited"
+    assert watchdog.recycle("exited")
+    assert tika.tika.TikaServerProcess is not crashed
+    assert os.path.exists(crashed.logPath + ".1")
+    assert detector.from_buffer("Good evening", serverEndpoint=server) == "text/plain"
+
+
+def test_server_is_recycled_after_documents(server):
+    watchdog = watchdog_for(server, maxDocuments=3)
+    for _ in range(2):
+        detector.from_buffer("Good evening", serverEndpoint=server)
+    assert watchdog.check() is None
+    detector.from_buffer("Good evening", serverEndpoint=server)
+    assert watchdog.check() == "documents"
+    assert watchdog.recycle("documents")
+    assert watchdog.documents() == 0
+    assert watchdog.restarts == {"documents": 1}
+
+
+def test_recycling_drains_calls_in_flight(server):
+    watchdog = watchdog_for(server)
+    pool = tika.tika.getEndpointPool(server)
+    inFlight = pool.acquire()
+    threading.Timer(0.5, pool.release, [inFlight]).start()
+
+    results = []
+    recycling = threading.Thread(target=lambda: results.append(watchdog.recycle("memory")))
+    start = time.monotonic()
+    recycling.start()
+    time.sleep(0.1)
+    # a call made meanwhile waits for the new server instead of failing
+    assert detector.from_buffer("Good evening", serverEndpoint=server) == "text/plain"
+    recycling.join()
+    assert results == [True]
+    assert time.monotonic() - start >= 0.5
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs psutil or /proc")
+def test_memory_and_latency_thresholds(server):
+    assert processRss(tika.tika.TikaServerProcess) > 1024 * 1024
+    assert watchdog_for(server, maxRss=1024).check() == "memory"
+
+    watchdog = watchdog_for(server, maxLatency=1e-6, slowChecks=2)
+    assert watchdog.check() is None
+    assert watchdog.check() == "latency"
+
+
+def test_watchdog_starts_with_server(fake_server_jar, fake_java, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaWatchdogInterval", 0.1)
+    monkeypatch.setattr(tika.tika, "TikaJava", fake_java)
+    monkeypatch.setattr(tika.tika, "TikaClientOnly", False)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    endpoint = "http://127.0.0.1:%d" % port
+    try:
+        detector.from_buffer("Good evening", serverEndpoint=endpoint)
+        crashed = tika.tika.TikaServerProcess
+        os.killpg(crashed.pid, 9)
+        crashed.wait()
+        deadline = time.monotonic() + 10
+        while tika.tika.TikaWatchdog.restarts.get("exited") != 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert tika.tika.TikaWatchdog.restarts == {"exited": 1}
+        assert detector.from_buffer("Good evening", serverEndpoint=endpoint) == "text/plain"
+    finally:
+        tika.tika.killServer()
+    assert tika.tika.TikaWatchdog is None
+
+
+def test_held_back_calls_give_up(client_only, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    with serve() as httpd:
+        watchdog = watchdog_for(httpd.url)
+        tika.tika.pauseEndpoint(httpd.url, timeout=0.2)
+        try:
+            start = time.monotonic()
+            with pytest.raises(tika.tika.TikaException):
+                detector.from_buffer("Good evening", serverEndpoint=httpd.url)
+            assert 0.2 <= time.monotonic() - start < 5
+
+            # without a bound of its own, the pause lasts at most the read timeout of the call
+            tika.tika.pauseEndpoint(httpd.url)
+            with pytest.raises(tika.tika.TikaException):
+                detector.from_buffer("Good evening", serverEndpoint=httpd.url, requestOptions={"timeout": 0.2})
+        finally:
+            tika.tika.resumeEndpoint(httpd.url)
+        assert detector.from_buffer("Good evening", serverEndpoint=httpd.url) == "text/plain"
+        assert httpd.requests == 1
+        # calls held back while paused never reached the server
+        assert watchdog.documents() == 1
+
+
+def test_calls_through_any_pool_are_watched(client_only, monkeypatch):
+    monkeypatch.setattr(tika.tika, "TikaResultCache", None)
+    with serve() as httpd:
+        pool = EndpointPool([httpd.url])
+        watchdog = watchdog_for(httpd.url, drainTimeout=0.2)
+        for _ in range(3):
+            detector.from_buffer("Good evening", serverEndpoint=pool)
+        assert watchdog.documents() == 3
+
+        inFlight = pool.acquire()
+        assert not watchdog.drain()
+        pool.release(inFlight)
+        assert watchdog.drain()
@@ -0,0 +1,283 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Asyncio client for Tika Server. Requires ``httpx`` (``pip install tika[async]``).
+
+**Example usage**::
+
+    import asyncio
+    from tika import aio
+
+    async def main(paths):
+        async with aio.Client(concurrency=32) as client:
+            return await asyncio.gather(*[client.parse(path) for path in paths])
+
+    results = asyncio.run(main(['/path/to/file1', '/path/to/file2']))
+
+Results have the same shape as the ones returned by the blocking
+``parser``, ``detector``, ``language`` and ``unpack`` modules.
+'''
+
+import asyncio
+import mmap
+import os
+import time
+from urllib.parse import urlparse
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from . import parser, tika, unpack
+from .metrics import CallRecord
+from .tika import CircuitOpenError, ServerEndpoint, TikaFilesPath, getRemoteFile, make_content_disposition_header
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Client:
+    '''
+    Asynchronous Tika client sharing one pooled ``httpx.AsyncClient`` between all calls.
+    At most ``concurrency`` requests are in flight at the same time; further calls wait their turn.
+    '''
+
+    def __init__(self, serverEndpoint=ServerEndpoint, concurrency=None, timeout=None, requestOptions={}):
+        '''
+        :param serverEndpoint: Tika server end point, list of end points or ``EndpointPool`` (optional)
+        :param concurrency: maximum number of requests in flight; defaults to TIKA_POOL_MAXSIZE
+        :param timeout: request timeout in seconds; defaults to the one of the service and request size,
+                        see ``tika.tika.requestTimeout``
+        :param requestOptions: extra keyword arguments for ``httpx.AsyncClient``
+        '''
+        if httpx is None:
+            raise ImportError('tika.aio requires httpx; install it with "pip install tika[async]"')
+        concurrency = concurrency or tika.TikaPoolMaxSize
+        self.serverEndpoint = serverEndpoint
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._timeout = requestOptions.get('timeout', timeout)
+        clientOptions = {
+            'verify': False,
+            'limits': httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        }
+        clientOptions.update(requestOptions)
+        clientOptions['timeout'] = self._timeout
+        self._client = httpx.AsyncClient(**clientOptions)
+        self._pool = tika.getEndpointPool(serverEndpoint)
+        self._checkedEndpoints = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _checkEndpoint(self, url):
+        if tika.TikaClientOnly:
+            return url
+        checked = self._checkedEndpoints.get(url)
+        if checked is None or checked[1] <= time.monotonic():
+            parsedUrl = urlparse(url)
+            checked = (await asyncio.to_thread(
+                tika.checkTikaServerCached, parsedUrl.scheme, parsedUrl.hostname, parsedUrl.port),
+                time.monotonic() + tika.TikaServerCheckTTL)
+            self._checkedEndpoints[url] = checked
+        return checked[0]
+
+    def _acquire(self):
+        # like tika.tika.callServer, skips servers whose circuit breaker is open
+        refused = set()
+        for _ in range(len(self._pool)):
+            endpoint = self._pool.acquire(exclude=refused)
+            breaker = tika.getCircuitBreaker(endpoint.url)
+            if breaker.allow():
+                return endpoint, breaker
+            self._pool.release(endpoint)
+            tika.TikaCounters.incr('circuitRefused')
+            refused.add(endpoint)
+        raise CircuitOpenError('Tika server %s is failing; not calling it for another %.1fs'
+                               % (endpoint.url, breaker.retryAfter()))
+
+    async def callServer(self, verb, service, data, headers, rawResponse=False):
+        '''
+        Asynchronous counterpart of ``tika.tika.callServer``, sharing its circuit breakers, counters
+        and metrics, but never retrying.
+        :param verb: ``'get'``, ``'put'`` or ``'post'``
+        :param service: service path, e.g. ``'/rmeta/text'``
+        :param data: ``str``, ``bytes``, binary file object, ``mmap`` or async iterator of ``bytes``
+        :param headers: request headers
+        :param rawResponse: return the body as ``bytes`` instead of ``str``
+        :return: tuple having (status, response)
+        '''
+        call = CallRecord(verb, service)
+        try:
+            return await self._callServer(call, verb, service, data, headers, rawResponse)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.finish()
+            if tika.TikaMetrics is not None:
+                tika.TikaMetrics.record(call)
+
+    async def _callServer(self, call, verb, service, data, headers, rawResponse):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        call.bytesSent = tika._bodySize(data) if not hasattr(data, '__aiter__') else None
+        if tika._is_file_object(data) or isinstance(data, mmap.mmap):
+            data = _aiterFile(data)
+        timeout = self._timeout
+        if timeout is None:
+            connectTimeout, readTimeout = tika.requestTimeout(service, call.bytesSent)
+            timeout = httpx.Timeout(readTimeout, connect=connectTimeout)
+        async with self._semaphore:
+            endpoint, breaker = self._acquire()
+            call.endpoint = endpoint.url
+            tika.TikaCounters.incr('requests')
+            failed = answered = False
+            try:
+                serverEndpoint = await self._checkEndpoint(endpoint.url)
+                resp = await self._client.request(verb.upper(), serverEndpoint + service, content=data,
+                                                  headers=headers, timeout=timeout)
+                failed = resp.status_code in tika.UnavailableStatuses
+                answered = True
+            except (httpx.ConnectTimeout, httpx.NetworkError):
+                failed = True
+                tika.TikaCounters.incr('connectionErrors')
+                tika._recordFailure(breaker, endpoint.url)
+                checked = self._checkedEndpoints.pop(endpoint.url, None)
+                if checked:
+                    tika.resetServerState(checked[0])
+                raise
+            except httpx.TimeoutException:
+                # the server is up but stuck on this document
+                tika.TikaCounters.incr('timeouts')
+                raise
+            finally:
+                self._pool.release(endpoint, failed=failed, answered=answered)
+        if failed:
+            tika.TikaCounters.incr('unavailable')
+            tika._recordFailure(breaker, endpoint.url)
+        else:
+            breaker.recordSuccess()
+        if resp.status_code != 200:
+            tika.log.warning('Tika server returned status: %d', resp.status_code)
+        call.status = resp.status_code
+        call.serverSeconds = resp.elapsed.total_seconds()
+        resp.encoding = 'utf-8'
+        call.bytesReceived = len(resp.content)
+        if rawResponse:
+            return (resp.status_code, resp.content)
+        return (resp.status_code, resp.text)
+
+    async def _callWithFile(self, urlOrPath, service, headers, rawResponse=False):
+        path, fileType = await asyncio.to_thread(getRemoteFile, urlOrPath, TikaFilesPath)
+        headers = dict(headers)
+        headers['Content-Disposition'] = make_content_disposition_header(path)
+        try:
+            if tika._is_file_object(urlOrPath):
+                return await self.callServer('put', service, urlOrPath, headers, rawResponse)
+            f = await asyncio.to_thread(open, path, 'rb')
+            try:
+                return await self.callServer('put', service, f, headers, rawResponse)
+            finally:
+                f.close()
+        finally:
+            if fileType == 'remote':
+                await asyncio.to_thread(os.unlink, path)
+
+    async def parse(self, filename, service='all', xmlContent=False, headers=None):
+        '''
+        Parses a file for metadata and content, like ``parser.from_file``.
+        :param filename: path or URL of the file, or a binary file object
+        :param service: ``'all'``, ``'meta'`` or ``'text'``
+        :param xmlContent: request XHTML instead of plain text content
+        :param headers: additional request headers (optional)
+        :return: dictionary having 'metadata' and 'content' keys
+        '''
+        services = {'meta': '/meta', 'text': '/tika', 'all': '/rmeta/xml' if xmlContent else '/rmeta/text'}
+        path = services.get(service, services['all'])
+        requestHeaders = dict(headers or {})
+        requestHeaders['Accept'] = 'text/plain' if path == '/tika' else 'application/json'
+        return parser._parse(await self._callWithFile(filename, path, requestHeaders), service)
+
+    async def parse_buffer(self, string, xmlContent=False, headers=None):
+        '''
+        Parses the content of a buffer, like ``parser.from_buffer``.
+        :param string: ``str``, ``bytes``, binary file object or ``mmap``
+        :return: dictionary having 'metadata' and 'content' keys
+        '''
+        requestHeaders = dict(headers or {})
+        requestHeaders['Accept'] = 'application/json'
+        service = '/rmeta/xml' if xmlContent else '/rmeta/text'
+        return parser._parse(await self.callServer('put', service, string, requestHeaders))
+
+    async def detect(self, filename):
+        '''
+        Detects the MIME type of a file, like ``detector.from_file``.
+        '''
+        status, response = await self._callWithFile(filename, '/detect/stream', {'Accept': 'text/plain'})
+        return response
+
+    async def detect_buffer(self, string):
+        '''
+        Detects the MIME type of buffered content, like ``detector.from_buffer``.
+        '''
+        status, response = await self.callServer('put', '/detect/stream', string, {'Accept': 'text/plain'})
+        return response
+
+    async def language(self, filename):
+        '''
+        Detects the language of a file, like ``language.from_file``.
+        '''
+        status, response = await self._callWithFile(filename, '/language/stream', {'Accept': 'text/plain'})
+        return response
+
+    async def language_buffer(self, string):
+        '''
+        Detects the language of buffered text, like ``language.from_buffer``.
+        '''
+        status, response = await self.callServer('put', '/language/string', string, {'Accept': 'text/plain'})
+        return response
+
+    async def unpack(self, filename):
+        '''
+        Extracts content, metadata and attachments of a file, like ``unpack.from_file``.
+        '''
+        return unpack._parse(await self._callWithFile(filename, '/unpack/all', {'Accept': 'application/x-tar'},
+                                                      rawResponse=True))
+
+    async def unpack_buffer(self, string):
+        '''
+        Extracts content, metadata and attachments of buffered content, like ``unpack.from_buffer``.
+        '''
+        return unpack._parse(await self.callServer('put', '/unpack/all', string, {'Accept': 'application/x-tar'},
+                                                   rawResponse=True))
+
+
+async def _aiterFile(f, chunkSize=CHUNK_SIZE):
+    '''
+    Reads a blocking file object in a worker thread, one chunk at a time.
+    '''
+    while True:
+        chunk = await asyncio.to_thread(f.read, chunkSize)
+        if not chunk:
+            break
+        yield chunk
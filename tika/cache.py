@@ -0,0 +1,282 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Content-addressed cache of Tika server results, so documents seen before are not
+sent to the server again.
+
+**Example usage**::
+
+    import tika.tika
+    from tika import parser
+    from tika.cache import MemoryCache
+
+    tika.tika.TikaResultCache = MemoryCache(maxBytes=256 * 1024 * 1024)
+    parsed = parser.from_file('/path/to/logo.png')    # parsed by the server
+    parsed = parser.from_file('/backup/logo.png')    # same bytes and name: answered from the cache
+    print(tika.tika.TikaResultCache.stats())
+
+Results are keyed by a SHA-256 of the document together with the service, the
+request headers, the Tika config file and the Tika version, and only successful
+(status 200) results are kept. The file name sent along is part of the key without
+its case, since Tika matches whole names such as ``Makefile`` or ``*.tar.gz``; a result
+answered from the cache carries the name of the file asked about as its ``resourceName``. Setting ``TIKA_CACHE`` to ``memory`` or to the path
+of a SQLite database file enables the cache for the whole process.
+'''
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote
+
+CHUNK_SIZE = 1024 * 1024
+
+# headers that do not change what the server answers
+IGNORED_HEADERS = ('content-length', 'user-agent', 'accept-encoding', 'connection')
+
+DISPOSITION_NAME = re.compile(r'''filename\*\s*=\s*[\w-]*'[\w-]*'([^;]+)|filename\s*=\s*("[^"]*"|[^;]+)''', re.I)
+RESOURCE_NAME = re.compile(r'("resourceName"\s*:\s*)("(?:[^"\\]|\\.)*")')
+
+
+def contentDigest(data, chunkSize=CHUNK_SIZE):
+    '''
+    :param data: ``str``, ``bytes``, ``mmap``, ``memoryview`` or seekable binary file object
+    :return: hex SHA-256 of the content, or ``None`` if it cannot be read without consuming it
+    '''
+    digest = hashlib.sha256()
+    if isinstance(data, str):
+        digest.update(data.encode('utf-8'))
+    elif isinstance(data, (bytes, bytearray, memoryview, mmap.mmap)):
+        digest.update(data)
+    elif isinstance(data, io.IOBase) and data.seekable():
+        position = data.tell()
+        try:
+            for chunk in iter(lambda: data.read(chunkSize), b''):
+                digest.update(chunk)
+        finally:
+            data.seek(position)
+    else:
+        return None
+    return digest.hexdigest()
+
+
+def dispositionName(headers):
+    '''
+    :return: file name sent in the ``Content-Disposition`` header, or ``None``
+    '''
+    for k, v in (headers or {}).items():
+        if str(k).lower() == 'content-disposition':
+            match = DISPOSITION_NAME.search(str(v))
+            if match:
+                return unquote(match.group(1)) if match.group(1) else match.group(2).strip().strip('"')
+    return None
+
+
+def _relevantHeader(name, value):
+    if name == 'content-disposition':
+        # Tika matches whole names (Makefile, *.tar.gz, *.pdf.p7m), so only the case is ignored
+        return (dispositionName({name: value}) or '').lower()
+    return str(value)
+
+
+def cacheKey(digest, service, headers=None, config_path=None, tikaVersion=None, rawResponse=False):
+    '''
+    :return: key of a result in a :class:`ResultCache`
+    '''
+    relevantHeaders = sorted((str(k).lower(), _relevantHeader(str(k).lower(), v)) for k, v in (headers or {}).items()
+                             if str(k).lower() not in IGNORED_HEADERS)
+    configDigest = None
+    if config_path and os.path.isfile(config_path):
+        with open(config_path, 'rb') as f:
+            configDigest = hashlib.sha256(f.read()).hexdigest()
+    key = [digest, service, relevantHeaders, config_path, configDigest, tikaVersion, bool(rawResponse)]
+    return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+
+def renameResource(result, headers):
+    '''
+    Sets the ``resourceName`` of the document in a cached ``/rmeta`` or ``/meta`` result to the
+    file name sent in ``headers``, as the server would have answered for that name.
+    :param result: ``(status, response)`` tuple
+    :return: ``(status, response)`` tuple
+    '''
+    status, response = result
+    name = dispositionName(headers)
+    if name is None or not isinstance(response, str) or '"resourceName"' not in response:
+        return result
+    try:
+        parsed = json.loads(response)
+    except ValueError:
+        return result
+    # embedded documents of /rmeta keep their own names
+    document = parsed[0] if isinstance(parsed, list) and parsed else parsed
+    if not isinstance(document, dict) or document.get('resourceName') in (None, name):
+        return result
+    # the document's own field comes first; rewrite only its value so the rest of the text is as sent
+    for match in RESOURCE_NAME.finditer(response):
+        if json.loads(match.group(2)) == document['resourceName']:
+            renamed = json.dumps(name, ensure_ascii=False)
+            return (status, response[:match.start(2)] + renamed + response[match.end(2):])
+    return result
+
+
+class ResultCache:
+    '''
+    Base class of the cache backends, counting hits and misses.
+    Backends implement ``_get``, ``_set`` and ``_clear``; values are ``(status, response)`` tuples.
+    '''
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._statsLock = threading.Lock()
+
+    def get(self, key):
+        '''
+        :return: the cached ``(status, response)`` tuple, or ``None``
+        '''
+        value = self._get(key)
+        with self._statsLock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._set(key, value)
+
+    def clear(self):
+        '''
+        Drops every cached result and resets the counters.
+        '''
+        self._clear()
+        with self._statsLock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        '''
+        :return: ``dict`` having hits, misses and hitRate
+        '''
+        with self._statsLock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hitRate': self.hits / lookups if lookups else 0.0}
+
+
+class MemoryCache(ResultCache):
+    '''
+    In-process LRU cache holding at most ``maxBytes`` of responses.
+    '''
+
+    def __init__(self, maxBytes=128 * 1024 * 1024):
+        super().__init__()
+        self.maxBytes = maxBytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _set(self, key, value):
+        size = len(key) + len(value[1] or '')
+        if size > self.maxBytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self.size -= previous[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.maxBytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class SQLiteCache(ResultCache):
+    '''
+    Cache kept in a SQLite database file, so results survive the process and can be
+    shared by the processes of one machine.
+    '''
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS results '
+                         '(key TEXT PRIMARY KEY, status INTEGER, response BLOB, text INTEGER)')
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def _get(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT status, response, text FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        status, response, text = row
+        return (status, response.decode('utf-8') if text else bytes(response))
+
+    def _set(self, key, value):
+        status, response = value
+        text = isinstance(response, str)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                             (key, status, response.encode('utf-8') if text else response, text))
+
+    def _clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM results')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def fromEnv(value):
+    '''
+    :param value: ``memory`` or the path of a SQLite database file, e.g. the value of ``TIKA_CACHE``
+    :return: the matching :class:`ResultCache`, or ``None`` if ``value`` is empty
+    '''
+    if not value:
+        return None
+    if value.lower() == 'memory':
+        return MemoryCache(int(os.getenv('TIKA_CACHE_SIZE', 128 * 1024 * 1024)))
+    return SQLiteCache(value)
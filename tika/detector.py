@@ -14,24 +14,73 @@
 # limitations under the License.
 #
 
-from .tika import ServerEndpoint, callServer, detectType1
+from urllib.parse import urlparse
 
+from .magic import HEAD_SIZE, bufferHead, resolveClassifier
+from .tika import ServerEndpoint, _is_file_object, callServer, detectType1, readPrefix, runBatch
 
-def from_file(filename, config_path=None, requestOptions={}):
+
+def _canPeek(filename):
+    # leading bytes can be read locally and again for the server
+    if _is_file_object(filename):
+        return filename.seekable()
+    return urlparse(filename).scheme not in ('http', 'https')
+
+def from_file(filename, config_path=None, requestOptions={}, serverEndpoint=ServerEndpoint, prefix=None,
+              classifier=None):
     '''
     Detects MIME type of specified file
     :param filename: file whose type needs to be detected
+    :param serverEndpoint: Tika server end point (optional)
+    :param prefix: send only this many leading bytes and the file name, e.g. ``65536``;
+                   defaults to TIKA_DETECT_PREFIX, ``0`` sends the whole file
+    :param classifier: answer obvious types of local files without calling the server:
+                       a :class:`tika.magic.MagicClassifier`, ``True`` for the shared one, ``False``
+                       for none; defaults to TIKA_LOCAL_DETECT
     :return: MIME type
     '''
-    jsonOutput = detectType1('type', filename, config_path=config_path, requestOptions=requestOptions)
+    classifier = resolveClassifier(classifier, serverEndpoint, requestOptions)
+    if classifier is not None and _canPeek(filename):
+        name, head = readPrefix(filename, HEAD_SIZE)
+        mime = classifier.classify(head, name)
+        if mime:
+            return mime
+    jsonOutput = detectType1('type', filename, serverEndpoint, config_path=config_path, requestOptions=requestOptions,
+                             prefix=prefix)
     return jsonOutput[1]
 
-def from_buffer(string, config_path=None, requestOptions={}):
+def from_files(filenames, config_path=None, requestOptions={}, serverEndpoint=ServerEndpoint, workers=None, ordered=False,
+               prefix=None, classifier=None):
+    '''
+    Detects MIME types of many files concurrently
+    :param filenames: iterable of paths, URLs or binary file objects; consumed lazily, so it
+                      may be a generator over millions of files
+    :param workers: number of requests in flight at once; defaults to TIKA_POOL_MAXSIZE
+    :param ordered: yield results in input order instead of completion order
+    :param prefix: send only this many leading bytes of each file, see :func:`from_file`
+    :param classifier: answer obvious types locally, see :func:`from_file`
+    :return: iterator of (filename, MIME type, error) tuples
+    '''
+    classifier = resolveClassifier(classifier, serverEndpoint, requestOptions)
+    return runBatch(lambda filename: from_file(filename, config_path, requestOptions, serverEndpoint, prefix,
+                                               classifier or False),
+                    filenames, workers, ordered)
+
+def from_buffer(string, config_path=None, requestOptions={}, serverEndpoint=ServerEndpoint, classifier=None):
     '''
     Detects MIME type of the buffered content
-    :param string: buffered content whose type needs to be detected
+    :param string: buffered content whose type needs to be detected; a binary file object,
+                   ``mmap`` or iterator of ``bytes`` is streamed to the server
+    :param serverEndpoint: Tika server end point (optional)
+    :param classifier: answer obvious types without calling the server, see :func:`from_file`
     :return:
     '''
-    status, response = callServer('put', ServerEndpoint, '/detect/stream', string,
+    classifier = resolveClassifier(classifier, serverEndpoint, requestOptions)
+    head = bufferHead(string) if classifier is not None else None
+    if head is not None:
+        mime = classifier.classify(head)
+        if mime:
+            return mime
+    status, response = callServer('put', serverEndpoint, '/detect/stream', string,
                                   {'Accept': 'text/plain'}, False, config_path=config_path, requestOptions=requestOptions)
     return response
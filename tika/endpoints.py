@@ -0,0 +1,199 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Client-side load balancing over several Tika servers.
+
+**Example usage**::
+
+    from tika import parser
+    from tika.endpoints import EndpointPool
+
+    servers = EndpointPool(['http://tika1:9998', 'http://tika2:9998'], strategy='least-outstanding')
+    parsed = parser.from_file('/path/to/file', servers)
+
+A plain list of endpoint URLs, or the ``TIKA_SERVER_ENDPOINTS`` environment
+variable, can be used instead of building the pool by hand.
+'''
+
+import threading
+import time
+import weakref
+
+ROUND_ROBIN = 'round-robin'
+LEAST_OUTSTANDING = 'least-outstanding'
+
+# every pool in use, whoever built it, so a server can be paused or watched whichever pool calls go through
+_pools = weakref.WeakSet()
+_poolsLock = threading.Lock()
+
+
+def livePools():
+    '''
+    :return: ``list`` of every :class:`EndpointPool` still in use
+    '''
+    with _poolsLock:
+        return list(_pools)
+
+
+class Endpoint:
+    '''
+    State kept for one server of an :class:`EndpointPool`.
+    '''
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.requests = 0
+        # calls the server answered, unlike requests also counting ones refused before being sent
+        self.answered = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejectedUntil = 0.0
+
+    def isAvailable(self, now=None):
+        return self.ejectedUntil <= (time.monotonic() if now is None else now)
+
+    def __repr__(self):
+        return 'Endpoint(%r, outstanding=%d, failures=%d)' % (self.url, self.outstanding, self.failures)
+
+
+class EndpointPool:
+    '''
+    A set of Tika server endpoints that calls are spread over.
+
+    Failures are detected passively from the calls themselves: after ``maxFailures``
+    consecutive failures a server is ejected for ``ejectTime`` seconds, doubling on
+    every further ejection up to ``maxEjectTime``. A successful call resets the backoff.
+    When every server is ejected, the one due back soonest is used anyway.
+    '''
+
+    def __init__(self, endpoints, strategy=ROUND_ROBIN, maxFailures=1, ejectTime=1.0, maxEjectTime=60.0):
+        '''
+        :param endpoints: list of endpoint URLs, e.g. ``['http://localhost:9998', 'http://localhost:9999']``
+        :param strategy: ``'round-robin'`` or ``'least-outstanding'``
+        :param maxFailures: consecutive failures after which a server is ejected
+        :param ejectTime: seconds a server stays ejected the first time
+        :param maxEjectTime: upper bound for the ejection backoff, in seconds
+        '''
+        if isinstance(endpoints, str):
+            endpoints = [endpoints]
+        if not endpoints:
+            raise ValueError('EndpointPool needs at least one endpoint')
+        if strategy not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            raise ValueError('strategy must be one of %s, %s' % (ROUND_ROBIN, LEAST_OUTSTANDING))
+        self.endpoints = [Endpoint(url) for url in endpoints]
+        self.strategy = strategy
+        self.maxFailures = maxFailures
+        self.ejectTime = ejectTime
+        self.maxEjectTime = maxEjectTime
+        self._next = 0
+        self._lock = threading.Lock()
+        with _poolsLock:
+            _pools.add(self)
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def __repr__(self):
+        return 'EndpointPool(%r, strategy=%r)' % ([e.url for e in self.endpoints], self.strategy)
+
+    def acquire(self, exclude=()):
+        '''
+        Picks the server for the next call and counts the call as outstanding on it.
+        :param exclude: endpoints to avoid if any other one is available, e.g. ones that just failed
+        :return: :class:`Endpoint`; hand it back with :meth:`release` once the call is done
+        '''
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e.isAvailable(now) and e not in exclude]
+            if not candidates:
+                candidates = [e for e in self.endpoints if e.isAvailable(now)]
+            if not candidates:
+                candidates = [min(self.endpoints, key=lambda e: e.ejectedUntil)]
+
+            # rotate the starting point so ties are spread evenly
+            start = self._next % len(self.endpoints)
+            self._next += 1
+            ordered = sorted(candidates, key=lambda e: (self.endpoints.index(e) - start) % len(self.endpoints))
+            if self.strategy == LEAST_OUTSTANDING:
+                endpoint = min(ordered, key=lambda e: e.outstanding)
+            else:
+                endpoint = ordered[0]
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint, failed=False, answered=False):
+        '''
+        Records the outcome of a call made on an endpoint returned by :meth:`acquire`.
+        :param endpoint: the endpoint the call was made on
+        :param failed: ``True`` if the server could not be reached or reported itself unavailable
+        :param answered: ``True`` if the server sent a response
+        '''
+        with self._lock:
+            endpoint.outstanding -= 1
+            if answered:
+                endpoint.answered += 1
+            if not failed:
+                endpoint.failures = 0
+                endpoint.ejections = 0
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self.maxFailures:
+                backoff = min(self.ejectTime * 2 ** endpoint.ejections, self.maxEjectTime)
+                endpoint.ejectedUntil = time.monotonic() + backoff
+                endpoint.ejections += 1
+                endpoint.failures = 0
+
+    def find(self, url):
+        '''
+        :return: the :class:`Endpoint` of this pool with the given URL
+        '''
+        for endpoint in self.endpoints:
+            if endpoint.url == url.rstrip('/'):
+                return endpoint
+        raise KeyError(url)
+
+    def eject(self, url, seconds=float('inf')):
+        '''
+        Takes a server out of rotation, e.g. while it is being restarted.
+        :param url: endpoint URL
+        :param seconds: how long the server stays out; until :meth:`readmit` by default
+        '''
+        with self._lock:
+            self.find(url).ejectedUntil = time.monotonic() + seconds
+
+    def readmit(self, url):
+        '''
+        Puts a server back into rotation and forgets its past failures.
+        :param url: endpoint URL
+        '''
+        with self._lock:
+            endpoint = self.find(url)
+            endpoint.ejectedUntil = 0.0
+            endpoint.failures = 0
+            endpoint.ejections = 0
+
+    def stats(self):
+        '''
+        :return: ``dict`` of endpoint URL to its outstanding, total and failure counts
+        '''
+        with self._lock:
+            now = time.monotonic()
+            return {e.url: {'outstanding': e.outstanding, 'requests': e.requests,
+                            'ejections': e.ejections, 'available': e.isAvailable(now)}
+                    for e in self.endpoints}
@@ -0,0 +1,178 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Runs several local Tika servers on consecutive ports, so parse load and
+garbage collection pauses are spread over more than one JVM.
+
+**Example usage**::
+
+    from tika import parser
+    from tika.fleet import ServerFleet
+
+    with ServerFleet(size=4, basePort=9998) as fleet:
+        for path, parsed, error in parser.from_files(paths, fleet.pool, workers=16):
+            ...
+'''
+
+import threading
+
+from . import tika
+from .endpoints import LEAST_OUTSTANDING, EndpointPool
+from .tika import TikaException, log
+
+
+class ServerFleet:
+    '''
+    Starts, health-checks, restarts and stops ``size`` Tika server processes listening on
+    ``basePort``, ``basePort + 1``, ... Calls are spread over them through :attr:`pool`.
+    '''
+
+    def __init__(self, size=2, basePort=int(tika.Port), serverHost=tika.ServerHost, tikaServerJar=tika.TikaServerJar,
+                 javaPath=tika.TikaJava, javaArgs=tika.TikaJavaArgs, classpath=None, config_path=None,
+                 strategy=LEAST_OUTSTANDING):
+        '''
+        :param size: number of server processes
+        :param basePort: port of the first server
+        :param serverHost: host name the servers are reached on
+        :param tikaServerJar: URL of the Tika server jar
+        :param javaPath: java runtime used to run the servers
+        :param javaArgs: java runtime arguments, e.g. ``-Xmx2g``
+        :param classpath: Class path value to pass to the JVMs
+        :param config_path: Tika config file passed to every server
+        :param strategy: load balancing strategy of :attr:`pool`
+        '''
+        self.serverHost = serverHost
+        self.tikaServerJar = tikaServerJar
+        self.javaPath = javaPath
+        self.javaArgs = javaArgs
+        self.classpath = classpath
+        self.config_path = config_path
+        self.ports = [basePort + i for i in range(size)]
+        self.endpoints = ['http://%s:%d' % (serverHost, port) for port in self.ports]
+        self.pool = EndpointPool(self.endpoints, strategy)
+        self.processes = {}
+        self._jarPath = None
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._monitor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self, monitorInterval=None):
+        '''
+        Starts all servers and waits until they are ready.
+        :param monitorInterval: if given, check the servers every ``monitorInterval`` seconds
+                                from a background thread and restart the ones that died
+        :return: :attr:`pool`
+        '''
+        self._stopped.clear()
+        for port in self.ports:
+            if tika.checkPortIsOpen(self.serverHost, port):
+                raise TikaException('Port %d is already in use; cannot start a Tika server on it' % port)
+        self._jarPath = tika.prepareServerJar(self.tikaServerJar)
+
+        with self._lock:
+            for port in self.ports:
+                self.processes[port] = self._launch(port)
+            started = [tika.waitForServer(process, self.serverHost) if process else False
+                       for process in self.processes.values()]
+            if not all(started):
+                self.stop()
+                raise RuntimeError('Unable to start the Tika server fleet.')
+            tika.ManagedEndpoints.update(self.endpoints)
+
+        if monitorInterval:
+            self._monitor = threading.Thread(target=self._watch, args=(monitorInterval,),
+                                             name='tika-fleet-monitor', daemon=True)
+            self._monitor.start()
+        return self.pool
+
+    def _launch(self, port):
+        return tika.launchServer(self._jarPath, self.javaPath, self.javaArgs, port, self.classpath,
+                                 self.config_path, logFileName='tika-server-%d.log' % port)
+
+    def _watch(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.restartUnhealthy()
+            except Exception:
+                log.exception('Tika server fleet health check failed')
+
+    def isHealthy(self, port):
+        '''
+        :return: ``True`` if the server on ``port`` is running and accepting connections
+        '''
+        process = self.processes.get(port)
+        return bool(process) and process.poll() is None and tika.checkPortIsOpen(self.serverHost, port)
+
+    def checkHealth(self):
+        '''
+        :return: ``dict`` of endpoint URL to ``True`` if that server is healthy
+        '''
+        return {endpoint: self.isHealthy(port) for port, endpoint in zip(self.ports, self.endpoints)}
+
+    def restart(self, port):
+        '''
+        Restarts the server on ``port``. Calls are sent to the other servers meanwhile.
+        :return: ``True`` if the server came back up
+        '''
+        endpoint = self.endpoints[self.ports.index(port)]
+        with self._lock:
+            self.pool.eject(endpoint)
+            process = self.processes.get(port)
+            if process:
+                tika.stopServer(process)
+            log.info('Restarting Tika server on port %d' % port)
+            process = self.processes[port] = self._launch(port)
+            started = bool(process) and tika.waitForServer(process, self.serverHost)
+            if started:
+                self.pool.readmit(endpoint)
+            else:
+                log.error('Tika server on port %d did not come back up' % port)
+            return started
+
+    def restartUnhealthy(self):
+        '''
+        Restarts every server that died or stopped accepting connections.
+        :return: ``list`` of the restarted ports
+        '''
+        restarted = [port for port in self.ports if not self._stopped.is_set() and not self.isHealthy(port)]
+        for port in restarted:
+            self.restart(port)
+        return restarted
+
+    def stop(self):
+        '''
+        Stops the health checks and all the servers of the fleet.
+        '''
+        self._stopped.set()
+        if self._monitor and self._monitor is not threading.current_thread():
+            self._monitor.join()
+        self._monitor = None
+        with self._lock:
+            for process in self.processes.values():
+                if process:
+                    tika.stopServer(process)
+            self.processes.clear()
+            tika.ManagedEndpoints.difference_update(self.endpoints)
+            for endpoint in self.endpoints:
+                tika.resetServerState(endpoint)
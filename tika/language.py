@@ -14,24 +14,148 @@
 # limitations under the License.
 #
 
-from .tika import ServerEndpoint, callServer, detectLang1
+import re
 
+from . import tika
+from .tika import ServerEndpoint, _is_file_object, callServer, detectLang1, getRemoteFile, runBatch
 
-def from_file(filename, requestOptions={}):
+# number of evenly spaced pieces a sample is made of
+SAMPLE_CHUNKS = 8
+
+
+def _spans(length, size, chunks=SAMPLE_CHUNKS):
+    # (offset, length) of the pieces of a sample of size out of length
+    if length <= size:
+        return [(0, length)]
+    # a sample smaller than the number of pieces is made of fewer, one character long at least
+    chunks = max(min(chunks, size), 1)
+    chunk = size // chunks
+    return [((length - chunk) * i // max(chunks - 1, 1), chunk) for i in range(chunks)]
+
+
+def _joinPieces(pieces):
+    # cut (piece, cutStart, cutEnd) at whitespace, so no half words are sent; text without any is kept whole
+    trimmed = []
+    for piece, cutStart, cutEnd in pieces:
+        if cutStart:
+            match = re.search(r'\s', piece)
+            piece = piece[match.end():] if match else piece
+        if cutEnd:
+            match = re.search(r'\s\S*$', piece)
+            piece = piece[:match.start()] if match else piece
+        trimmed.append(piece)
+    return '\n'.join(trimmed)
+
+
+def sampleText(text, size, chunks=SAMPLE_CHUNKS):
+    '''
+    Bounded sample of a text, made of evenly spaced pieces, since language identification
+    converges after a few KB.
+    :param text: ``str``, or UTF-8 ``bytes``
+    :param size: number of characters to sample, give or take the line breaks joining the pieces
+    :param chunks: number of pieces the sample is made of
+    :return: ``str``
+    '''
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode('utf-8', 'ignore')
+    if len(text) <= size:
+        return text
+    return _joinPieces([(text[offset:offset + n], offset > 0, offset + n < len(text))
+                        for offset, n in _spans(len(text), size, chunks)])
+
+
+def _readSample(urlOrPath, size, chunks=SAMPLE_CHUNKS):
+    # sample of a UTF-8 text file, reading only the pieces sampled
+    if _is_file_object(urlOrPath) and urlOrPath.seekable():
+        f, position = urlOrPath, urlOrPath.tell()
+    elif _is_file_object(urlOrPath):
+        return sampleText(urlOrPath.read(), size, chunks)
+    else:
+        f, position = open(getRemoteFile(urlOrPath, tika.TikaFilesPath)[0], 'rb'), None
+    try:
+        # a file object is sampled from where the caller left it, like the server would read it
+        start = position or 0
+        length = f.seek(0, 2) - start
+        pieces = []
+        for offset, n in _spans(length, size, chunks):
+            f.seek(start + offset)
+            pieces.append((f.read(n).decode('utf-8', 'ignore'), offset > 0, offset + n < length))
+    finally:
+        if position is None:
+            f.close()
+        else:
+            f.seek(position)
+    return _joinPieces(pieces)
+
+
+def from_file(filename, requestOptions={}, serverEndpoint=ServerEndpoint, sample=None):
     '''
     Detects language of the file
     :param filename: path to file whose language needs to be detected
+    :param serverEndpoint: Tika server end point (optional)
+    :param sample: send an evenly spaced sample of this many bytes of the file instead of all of it;
+                   defaults to TIKA_LANGUAGE_SAMPLE, ``0`` sends the whole file
     :return:
     '''
-    jsonOutput = detectLang1('file', filename, requestOptions=requestOptions)
+    sample = tika.TikaLanguageSample if sample is None else sample
+    if sample:
+        return from_buffer(_readSample(filename, sample), requestOptions, serverEndpoint, sample=0)
+    jsonOutput = detectLang1('file', filename, serverEndpoint, requestOptions=requestOptions)
     return jsonOutput[1]
 
-def from_buffer(string, requestOptions={}):
+
+def from_files(filenames, requestOptions={}, serverEndpoint=ServerEndpoint, workers=None, ordered=False, sample=None):
+    '''
+    Detects the language of many files concurrently
+    :param filenames: iterable of paths, URLs or binary file objects
+    :param workers: number of requests in flight at once; defaults to TIKA_POOL_MAXSIZE
+    :param ordered: yield results in input order instead of completion order
+    :param sample: send only a sample of each file, see :func:`from_file`
+    :return: iterator of (filename, language, error) tuples
+    '''
+    return runBatch(lambda filename: from_file(filename, requestOptions, serverEndpoint, sample),
+                    filenames, workers, ordered)
+
+
+def from_buffer(string, requestOptions={}, serverEndpoint=ServerEndpoint, sample=None):
     '''
     Detects language of content in the buffer
     :param string: buffered data
+    :param serverEndpoint: Tika server end point (optional)
+    :param sample: send an evenly spaced sample of this many characters instead of all of them;
+                   defaults to TIKA_LANGUAGE_SAMPLE, ``0`` sends the whole buffer
     :return:
     '''
-    status, response = callServer('put', ServerEndpoint, '/language/string', string,
+    sample = tika.TikaLanguageSample if sample is None else sample
+    if sample and isinstance(string, (str, bytes, bytearray)):
+        string = sampleText(string, sample)
+    status, response = callServer('put', serverEndpoint, '/language/string', string,
                                   {'Accept': 'text/plain'}, False, requestOptions=requestOptions)
     return response
+
+
+def from_buffers(strings, requestOptions={}, serverEndpoint=ServerEndpoint, workers=None, ordered=False, sample=None):
+    '''
+    Detects the language of many strings, e.g. thousands of titles or messages, concurrently
+    over the pooled connection
+    :param strings: iterable of strings; consumed lazily
+    :param workers: number of requests in flight at once; defaults to TIKA_POOL_MAXSIZE
+    :param ordered: yield results in input order instead of completion order
+    :param sample: send only a sample of long strings, see :func:`from_buffer`
+    :return: iterator of (string, language, error) tuples
+    '''
+    return runBatch(lambda string: from_buffer(string, requestOptions, serverEndpoint, sample),
+                    strings, workers, ordered)
+
+
+def from_parsed(parsed, requestOptions={}, serverEndpoint=ServerEndpoint, sample=None):
+    '''
+    Detects language of text already extracted by :mod:`tika.parser`, so the document is
+    not sent, and parsed, a second time
+    :param parsed: result of ``parser.from_file`` or ``parser.from_buffer``, also with ``per_document=True``
+    :param sample: send only a sample of the content, see :func:`from_buffer`
+    :return:
+    '''
+    documents = parsed if isinstance(parsed, list) else [parsed]
+    content = '\n'.join((document.get('content') or '').strip() for document in documents)
+    return from_buffer(content, requestOptions, serverEndpoint, sample)
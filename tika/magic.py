@@ -0,0 +1,190 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+An in-process classifier answering the MIME type of content whose leading bytes
+and name leave no doubt, such as a PDF, a PNG or plain text, so ``detector`` calls
+for obvious types skip the round trip to ``/detect/stream``. Anything ambiguous,
+e.g. a ZIP file that may be a DOCX, is still sent to the server.
+
+Setting ``TIKA_LOCAL_DETECT`` turns it on for all ``detector`` calls.
+
+**Example usage**::
+
+    from tika import detector
+    from tika.magic import getClassifier
+
+    detector.from_file('/path/to/file.pdf', classifier=True)
+    print(getClassifier().counts.snapshot())  # {'local': 1}
+'''
+
+import codecs
+import json
+import mmap
+import os
+import re
+import threading
+
+from . import tika
+from .resilience import Counters
+from .tika import ServerEndpoint, getConfig
+
+# leading bytes read to classify content
+HEAD_SIZE = 4096
+
+# (MIME type, (offset, bytes) pairs that must all match, extensions, answered for content without a name).
+# Types that Tika refines by looking into a container, like the many kinds of ZIP or OLE2 files, are
+# only answered when the name says so, if at all.
+SIGNATURES = [
+    ('application/pdf', ((0, b'%PDF-'),), ('.pdf',), True),
+    ('image/png', ((0, b'\x89PNG\r\n\x1a\n'),), ('.png',), True),
+    ('image/jpeg', ((0, b'\xff\xd8\xff'),), ('.jpg', '.jpeg', '.jpe', '.jfif'), True),
+    ('image/gif', ((0, b'GIF87a'),), ('.gif',), True),
+    ('image/gif', ((0, b'GIF89a'),), ('.gif',), True),
+    ('image/tiff', ((0, b'II*\x00'),), ('.tif', '.tiff'), True),
+    ('image/tiff', ((0, b'MM\x00*'),), ('.tif', '.tiff'), True),
+    ('image/webp', ((0, b'RIFF'), (8, b'WEBP')), ('.webp',), True),
+    ('audio/vnd.wave', ((0, b'RIFF'), (8, b'WAVE')), ('.wav',), True),
+    ('application/gzip', ((0, b'\x1f\x8b\x08'),), ('.gz',), True),
+    ('application/x-bzip2', ((0, b'BZh'), (4, b'1AY&SY')), ('.bz2',), True),
+    ('application/x-7z-compressed', ((0, b'7z\xbc\xaf\x27\x1c'),), ('.7z',), True),
+    ('application/x-tar', ((257, b'ustar'),), ('.tar',), True),
+    ('application/rtf', ((0, b'{\\rtf'),), ('.rtf',), True),
+    ('application/postscript', ((0, b'%!PS'),), ('.ps',), True),
+    ('application/zip', ((0, b'PK\x03\x04'),), ('.zip',), False),
+]
+
+# control characters never found in plain text
+CONTROL = frozenset(range(32)) - {9, 10, 12, 13} | {127}
+# text Tika's magic tells apart from plain text: markup, JSON, scripts, mail and calendar headers
+TEXT_MAGIC = re.compile(rb'\s*(?:[<{\[@%#\\]|From |BEGIN:|WEBVTT|[\w-]+:[ \t])')
+
+
+def looksLikeText(head):
+    '''
+    :param head: leading bytes of the content
+    :return: ``True`` if they are UTF-8 text Tika calls ``text/plain`` whatever follows
+    '''
+    if not head or CONTROL.intersection(head) or TEXT_MAGIC.match(head):
+        return False
+    try:
+        # the head may end within a character
+        codecs.getincrementaldecoder('utf-8')().decode(head)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def bufferHead(buffer, size=HEAD_SIZE):
+    '''
+    Leading bytes of a buffer handed to ``detector.from_buffer``.
+    :return: ``bytes``, or ``None`` if they cannot be read without consuming it, e.g. from an iterator
+    '''
+    if isinstance(buffer, str):
+        return buffer[:size].encode('utf-8')
+    if isinstance(buffer, (bytes, bytearray, memoryview, mmap.mmap)):
+        return bytes(buffer[:size])
+    if tika._is_file_object(buffer) and buffer.seekable():
+        return tika.readPrefix(buffer, size)[1]
+    return None
+
+
+class MagicClassifier:
+    '''
+    Classifies content by its leading bytes and name. A type is only answered when the
+    magic bytes and the extension, if any, agree; text only without a name or as ``.txt``,
+    since Tika tells many kinds of text apart by their name.
+    '''
+
+    def __init__(self, mimeTypes=None):
+        '''
+        :param mimeTypes: ``dict`` returned by the ``/mime-types`` service; signatures of types the
+                          server does not know are dropped and aliases mapped to the server's name.
+                          If ``None``, every signature is kept.
+        '''
+        canonical = None
+        if mimeTypes is not None:
+            canonical = {}
+            for name, details in mimeTypes.items():
+                canonical[name] = name
+                for alias in details.get('alias', ()):
+                    canonical.setdefault(alias, name)
+        self.signatures = []
+        for mime, marks, extensions, anonymous in SIGNATURES:
+            mime = mime if canonical is None else canonical.get(mime)
+            if mime:
+                self.signatures.append((mime, marks, extensions, anonymous))
+        self.text = 'text/plain' if canonical is None else canonical.get('text/plain')
+        self.counts = Counters()
+
+    @classmethod
+    def fromServer(cls, serverEndpoint=ServerEndpoint, requestOptions={}):
+        '''
+        Builds a classifier from the mime types known to a Tika server.
+        '''
+        status, response = getConfig('mime-types', serverEndpoint, requestOptions=requestOptions)
+        return cls(json.loads(response))
+
+    def _classify(self, head, filename):
+        extension = None
+        if filename:
+            extension = os.path.splitext(os.path.basename(os.fsdecode(filename)))[1].lower()
+        for mime, marks, extensions, anonymous in self.signatures:
+            if all(head[offset:offset + len(mark)] == mark for offset, mark in marks):
+                if extension in extensions or (not extension and anonymous):
+                    return mime
+                return None
+        if self.text and extension in (None, '.txt') and looksLikeText(head):
+            return self.text
+        return None
+
+    def classify(self, head, filename=None):
+        '''
+        :param head: leading bytes of the content, at least :data:`HEAD_SIZE` of them unless it is shorter
+        :param filename: name of the content, if known
+        :return: MIME type, or ``None`` if the server should be asked
+        '''
+        mime = self._classify(head, filename)
+        self.counts.incr('local' if mime else 'fallback')
+        return mime
+
+
+_classifier = None
+_classifierLock = threading.Lock()
+
+
+def getClassifier(serverEndpoint=ServerEndpoint, requestOptions={}):
+    '''
+    :return: the classifier shared by ``detector`` calls, built from the mime types of the first server asked
+    '''
+    global _classifier
+    with _classifierLock:
+        if _classifier is None:
+            _classifier = MagicClassifier.fromServer(serverEndpoint, requestOptions)
+        return _classifier
+
+
+def resolveClassifier(classifier, serverEndpoint=ServerEndpoint, requestOptions={}):
+    '''
+    :param classifier: a :class:`MagicClassifier`, ``True`` for the shared one, ``False`` for none,
+                       or ``None`` to follow TIKA_LOCAL_DETECT
+    :return: :class:`MagicClassifier` or ``None``
+    '''
+    if classifier is None:
+        classifier = tika.TikaLocalDetect
+    if classifier is True:
+        return getClassifier(serverEndpoint, requestOptions)
+    return classifier or None
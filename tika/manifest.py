@@ -0,0 +1,144 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Manifest of the files already parsed by ``tika.py parse``, so a re-run only parses
+new and modified files and removes the output of deleted ones.
+
+**Example usage**::
+
+    tika.py --manifest corpus.manifest.json -o out parse all /data/corpus
+'''
+
+import hashlib
+import json
+import os
+import threading
+
+VERSION = 1
+
+
+def fileDigest(path, chunkSize=1024 * 1024):
+    '''
+    :return: hex SHA-256 of the file at ``path``
+    '''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunkSize), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseManifest:
+    '''
+    Path, size, modification time, content hash and output location of every parsed file,
+    kept in a JSON file. A file whose size and modification time did not change is taken
+    as unchanged; if only its modification time changed, its content hash decides.
+    '''
+
+    def __init__(self, path):
+        '''
+        :param path: manifest file; created on :meth:`save` if it does not exist
+        '''
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == VERSION:
+                self.entries = manifest['files']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def isUnchanged(self, path, option, output):
+        '''
+        :param path: input file
+        :param option: parse option the output has to have been made with
+        :param output: where the output of ``path`` is expected
+        :return: ``True`` if ``path`` was parsed with ``option`` into ``output`` and has not changed since
+        '''
+        path = os.path.abspath(path)
+        entry = self.entries.get(path)
+        if entry is None or entry['option'] != option or entry['output'] != os.path.abspath(output):
+            return False
+        if not os.path.exists(entry['output']):
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime']:
+            return True
+        # touched but maybe not modified, e.g. copied over by a sync job
+        if fileDigest(path) != entry['sha256']:
+            return False
+        with self._lock:
+            entry['mtime'] = stat.st_mtime_ns
+        return True
+
+    def record(self, path, option, output, stat=None, digest=None):
+        '''
+        Remembers that ``path`` was parsed with ``option`` into ``output``.
+        :param stat: ``os.stat`` of ``path`` taken before it was parsed (optional)
+        :param digest: SHA-256 of ``path`` (optional)
+        '''
+        path = os.path.abspath(path)
+        stat = stat or os.stat(path)
+        entry = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'sha256': digest or fileDigest(path),
+            'option': option,
+            'output': os.path.abspath(output),
+        }
+        with self._lock:
+            self.entries[path] = entry
+
+    def removeDeleted(self, roots, seen):
+        '''
+        Forgets the files below ``roots`` that were not seen by the current run and deletes their
+        output, unless a file still in the manifest has the same output.
+        :param roots: files and directories the current run was given, including deleted ones
+        :param seen: absolute paths of the files found by the current run
+        :return: ``list`` of the forgotten input paths
+        '''
+        roots = [os.path.abspath(root) for root in roots]
+        prefixes = tuple(root.rstrip(os.sep) + os.sep for root in roots)
+        with self._lock:
+            deleted = [path for path in self.entries
+                       if path not in seen and (path in roots or path.startswith(prefixes))]
+            outputs = set(self.entries.pop(path)['output'] for path in deleted)
+            # with an output directory, inputs of the same name in other directories share an output
+            outputs.difference_update(entry['output'] for entry in self.entries.values())
+            for output in outputs:
+                if os.path.exists(output):
+                    os.unlink(output)
+        return deleted
+
+    def save(self):
+        '''
+        Writes the manifest atomically, so an interrupted run leaves the previous one intact.
+        '''
+        with self._lock:
+            manifest = {'version': VERSION, 'files': dict(self.entries)}
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmpPath, self.path)
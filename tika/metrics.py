@@ -0,0 +1,416 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Metrics and tracing of the calls made to Tika Server.
+
+Every call is recorded per service path in ``tika.tika.TikaMetrics``: requests, bytes
+sent and received, latency histograms, status codes, retries and cache hits. Call hooks
+are handed a :class:`CallRecord` after every call, and span hooks a :class:`Span` for
+each step of it (``open``, ``request``, ``response``, ``decode``), to feed a metrics
+or tracing system of your choice. :func:`timings` collects the time of each step for
+the calls of the current thread, e.g. for ``parser.from_file(..., timings=True)``.
+
+**Example usage**::
+
+    import tika.tika
+    from tika import metrics, parser
+
+    metrics.addSpanHook(lambda span: print(span.name, span.duration, span.attributes))
+    parser.from_file('/path/to/file')
+    print(tika.tika.TikaMetrics.snapshot()['/rmeta/text']['latency'])
+    print(tika.tika.TikaMetrics.prometheus())
+'''
+
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# the logger of tika.tika, which imports this module
+log = logging.getLogger('tika.tika')
+
+# upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, float('inf'))
+
+_callHooks = []
+_spanHooks = []
+# phase durations being collected by timings() in the current thread
+_local = threading.local()
+
+
+def addCallHook(hook):
+    '''
+    :param hook: callable taking the :class:`CallRecord` of every finished call
+    '''
+    _callHooks.append(hook)
+
+
+def removeCallHook(hook):
+    _callHooks.remove(hook)
+
+
+def addSpanHook(hook):
+    '''
+    :param hook: callable taking every finished :class:`Span`
+    '''
+    _spanHooks.append(hook)
+
+
+def removeSpanHook(hook):
+    _spanHooks.remove(hook)
+
+
+def _runHooks(hooks, value):
+    # a failing hook must not fail the call it observes
+    for hook in list(hooks):
+        try:
+            hook(value)
+        except Exception:
+            log.exception('Tika metrics hook %r failed', hook)
+
+
+def serviceName(service):
+    '''
+    :param service: service path of a call, e.g. ``/rmeta/text`` or ``/meta/Content-Type``
+    :return: name of the service, e.g. ``rmeta`` or ``meta``, so label values stay few
+    '''
+    return service.split('?', 1)[0].strip('/').split('/', 1)[0] or '/'
+
+
+class CallRecord:
+    '''
+    What happened during one ``callServer`` call.
+    '''
+    __slots__ = ('verb', 'service', 'endpoint', 'status', 'bytesSent', 'bytesReceived', 'seconds',
+                 'serverSeconds', 'retries', 'cacheHit', 'error', '_start')
+
+    def __init__(self, verb, service):
+        self.verb = verb
+        self.service = service
+        self.endpoint = None
+        self.status = None
+        # None when not known, e.g. for request bodies given as iterators or streamed responses
+        self.bytesSent = None
+        self.bytesReceived = None
+        self.seconds = None
+        # until the response headers arrived: upload and server time
+        self.serverSeconds = None
+        self.retries = 0
+        self.cacheHit = False
+        self.error = None
+        self._start = time.perf_counter()
+
+    def __repr__(self):
+        return 'CallRecord(%r, %r, status=%r, seconds=%r)' % (self.verb, self.service, self.status, self.seconds)
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+        _runHooks(_callHooks, self)
+
+
+class Span:
+    '''
+    One timed step of a call.
+    '''
+    __slots__ = ('name', 'start', 'end', 'attributes', 'error')
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+    def __repr__(self):
+        return 'Span(%r, duration=%r)' % (self.name, self.duration)
+
+
+@contextmanager
+def span(name, **attributes):
+    '''
+    Times the enclosed block as a :class:`Span` handed to the span hooks; does nothing if there are none.
+    :param name: name of the step, e.g. ``'decode'``
+    :param attributes: details of the step; more can be added to the yielded ``dict``
+    '''
+    collected = getattr(_local, 'timings', None)
+    if not _spanHooks and collected is None:
+        yield attributes
+        return
+    current = Span(name, attributes)
+    try:
+        yield attributes
+    except BaseException as e:
+        current.error = e
+        raise
+    finally:
+        current.end = time.perf_counter()
+        if collected is not None:
+            collected[name] = collected.get(name, 0.0) + current.duration
+        _runHooks(_spanHooks, current)
+
+
+def traced(name):
+    '''
+    Decorator timing every call of a function as a span named ``name``.
+    '''
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _spanHooks and getattr(_local, 'timings', None) is None:
+                return fn(*args, **kwargs)
+            with span(name, function=fn.__qualname__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def timings():
+    '''
+    Collects how long each phase of the calls made by the current thread within the block took.
+    :return: ``dict`` of phase name (``open``, ``request``, ``response``, ``decode``, ...) to seconds,
+             measured with the monotonic ``time.perf_counter``, plus ``total`` for the whole block;
+             filled in once the block is left
+    '''
+    collected = {}
+    previous = getattr(_local, 'timings', None)
+    _local.timings = collected
+    start = time.perf_counter()
+    try:
+        yield collected
+    finally:
+        collected['total'] = time.perf_counter() - start
+        _local.timings = previous
+        if previous is not None:
+            for name, seconds in collected.items():
+                if name != 'total':
+                    previous[name] = previous.get(name, 0.0) + seconds
+
+
+class Profile:
+    '''
+    Aggregates the phase timings of many documents, e.g. of a directory run.
+    '''
+
+    def __init__(self):
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, timings):
+        '''
+        :param timings: ``dict`` of phase name to seconds, as collected by :func:`timings`
+        '''
+        with self._lock:
+            for name, seconds in timings.items():
+                self.phases.setdefault(name, []).append(seconds)
+
+    def summary(self):
+        '''
+        :return: ``dict`` of phase name to its count, total, mean, median, 95th percentile and maximum, in seconds
+        '''
+        with self._lock:
+            phases = {name: sorted(values) for name, values in self.phases.items()}
+        return {name: {'count': len(values), 'total': sum(values), 'mean': sum(values) / len(values),
+                       'p50': values[(len(values) - 1) // 2], 'p95': values[int(0.95 * (len(values) - 1))],
+                       'max': values[-1]}
+                for name, values in phases.items()}
+
+    def table(self):
+        '''
+        :return: the summary as a text table, phases in the order a call goes through them
+        '''
+        summary = self.summary()
+        order = ['open', 'request', 'response', 'decode', 'write', 'total']
+        names = [name for name in order if name in summary] + sorted(set(summary) - set(order))
+        grandTotal = summary.get('total', {}).get('total') or sum(s['total'] for s in summary.values()) or 1.0
+        lines = ['%-10s %8s %10s %6s %9s %9s %9s %9s' % ('phase', 'count', 'total (s)', 'share', 'mean (ms)',
+                                                         'p50 (ms)', 'p95 (ms)', 'max (ms)')]
+        for name in names:
+            stats = summary[name]
+            lines.append('%-10s %8d %10.2f %5.1f%% %9.1f %9.1f %9.1f %9.1f'
+                         % (name, stats['count'], stats['total'], 100 * stats['total'] / grandTotal,
+                            1000 * stats['mean'], 1000 * stats['p50'], 1000 * stats['p95'], 1000 * stats['max']))
+        return '\n'.join(lines)
+
+
+class Histogram:
+    '''
+    Cumulative histogram in the style of Prometheus.
+    '''
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def snapshot(self):
+        return {'buckets': dict(zip(self.buckets, self.counts)), 'sum': self.sum, 'count': self.count}
+
+
+class ServiceMetrics:
+    '''
+    Totals of the calls made to one service path.
+    '''
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.cacheHits = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.statuses = {}
+        self.latency = Histogram()
+        self.serverLatency = Histogram()
+
+    def record(self, call):
+        self.requests += 1
+        self.retries += call.retries
+        if call.cacheHit:
+            self.cacheHits += 1
+        if call.error is not None:
+            self.errors += 1
+        if call.status is not None:
+            self.statuses[call.status] = self.statuses.get(call.status, 0) + 1
+        self.bytesSent += call.bytesSent or 0
+        self.bytesReceived += call.bytesReceived or 0
+        self.latency.observe(call.seconds)
+        if call.serverSeconds is not None:
+            self.serverLatency.observe(call.serverSeconds)
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'cacheHits': self.cacheHits,
+            'bytesSent': self.bytesSent,
+            'bytesReceived': self.bytesReceived,
+            'statuses': dict(self.statuses),
+            'latency': self.latency.snapshot(),
+            'serverLatency': self.serverLatency.snapshot(),
+        }
+
+
+class ClientMetrics:
+    '''
+    Thread-safe metrics of the calls made to Tika Server, per service path.
+    '''
+
+    def __init__(self):
+        self.services = {}
+        self._lock = threading.Lock()
+
+    def record(self, call):
+        '''
+        :param call: :class:`CallRecord` of a finished call
+        '''
+        with self._lock:
+            metrics = self.services.get(call.service)
+            if metrics is None:
+                metrics = self.services[call.service] = ServiceMetrics()
+            metrics.record(call)
+
+    def snapshot(self):
+        '''
+        :return: ``dict`` of service path to its totals
+        '''
+        with self._lock:
+            return {service: metrics.snapshot() for service, metrics in self.services.items()}
+
+    def reset(self):
+        with self._lock:
+            self.services.clear()
+
+    def prometheus(self, prefix='tika_client'):
+        '''
+        :return: the metrics in the Prometheus text exposition format, e.g. to serve on ``/metrics``,
+                 labelled by service name (see :func:`serviceName`) rather than path
+        '''
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append('# HELP %s_%s %s' % (prefix, name, description))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            for labels, value in samples:
+                lines.append('%s_%s{%s} %s' % (prefix, name, _labels(labels), _number(value)))
+
+        snapshot = {}
+        for path, totals in self.snapshot().items():
+            name = serviceName(path)
+            snapshot[name] = _merge(snapshot[name], totals) if name in snapshot else totals
+        services = sorted(snapshot)
+        for name, key, description in (('requests_total', 'requests', 'Calls made to Tika Server'),
+                                ('errors_total', 'errors', 'Calls that raised an exception'),
+                                ('retries_total', 'retries', 'Calls retried after a failure'),
+                                ('cache_hits_total', 'cacheHits', 'Calls answered from the result cache'),
+                                ('sent_bytes_total', 'bytesSent', 'Bytes of documents sent'),
+                                ('received_bytes_total', 'bytesReceived', 'Bytes of responses received')):
+            metric(name, 'counter', description, [((('service', s),), snapshot[s][key]) for s in services])
+        metric('responses_total', 'counter', 'Responses by status code',
+               [((('service', s), ('status', status)), count)
+                for s in services for status, count in sorted(snapshot[s]['statuses'].items())])
+        for name, key, description in (('latency_seconds', 'latency', 'Duration of calls'),
+                                ('server_latency_seconds', 'serverLatency', 'Time until the response headers arrived')):
+            lines.append('# HELP %s_%s %s' % (prefix, name, description))
+            lines.append('# TYPE %s_%s histogram' % (prefix, name))
+            for s in services:
+                histogram = snapshot[s][key]
+                for bound, count in histogram['buckets'].items():
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append('%s_%s_bucket{%s} %d' % (prefix, name, _labels((('service', s), ('le', le))), count))
+                lines.append('%s_%s_sum{%s} %s' % (prefix, name, _labels((('service', s),)), _number(histogram['sum'])))
+                lines.append('%s_%s_count{%s} %d' % (prefix, name, _labels((('service', s),)), histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    # label values escaped as the exposition format wants
+    return ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                    for name, value in labels)
+
+
+def _merge(totals, other):
+    # totals of two service paths, as returned by ServiceMetrics.snapshot
+    merged = {key: totals[key] + other[key] for key in ('requests', 'errors', 'retries', 'cacheHits', 'bytesSent',
+                                                         'bytesReceived')}
+    merged['statuses'] = dict(totals['statuses'])
+    for status, count in other['statuses'].items():
+        merged['statuses'][status] = merged['statuses'].get(status, 0) + count
+    for key in ('latency', 'serverLatency'):
+        merged[key] = {'buckets': {bound: count + other[key]['buckets'][bound]
+                                   for bound, count in totals[key]['buckets'].items()},
+                       'sum': totals[key]['sum'] + other[key]['sum'],
+                       'count': totals[key]['count'] + other[key]['count']}
+    return merged
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
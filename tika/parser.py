@@ -14,12 +14,22 @@
 # limitations under the License.
 #
 
+import codecs
 import json
+import re
 
-from .tika import ServerEndpoint, callServer, parse1
+from . import metrics
+from .metrics import traced
+from .tika import ServerEndpoint, TikaException, callServer, parse1, runBatch
 
+# bytes read at a time from streamed responses
+CHUNK_SIZE = 64 * 1024
 
-def from_file(filename, serverEndpoint=ServerEndpoint, service='all', xmlContent=False, headers=None, config_path=None, requestOptions={}, raw_response=False):
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+def from_file(filename, serverEndpoint=ServerEndpoint, service='all', xmlContent=False, headers=None, config_path=None, requestOptions={}, raw_response=False,
+              stream=False, per_document=False, timings=False):
     '''
     Parses a file for metadata and content
     :param filename: path to file which needs to be parsed or binary file using open(path,'rb')
@@ -32,9 +42,29 @@ def from_file(filename, serverEndpoint=ServerEndpoint, service='all', xmlContent
                     Default is 'False', which results in text content.
     :param headers: Request headers to be sent to the tika reset server, should
                     be a dictionary. This is optional
+    :param stream: Whether or not to decode the response incrementally, see _parseStream.
+                   Only for the 'all' service.
+    :param per_document: Whether or not to return the embedded documents separately
+                   instead of merging their content and metadata. Only for the 'all' service.
+    :param timings: Whether or not to add a 'timings' key, see tika.metrics.timings, telling how many
+                   seconds went to opening or downloading the file, the request (upload and server time),
+                   reading the response and decoding it. Not with stream or raw_response.
     :return: dictionary having 'metadata' and 'content' keys.
             'content' has a str value and metadata has a dict type value.
+            With per_document=True, a list of such dictionaries, one per embedded document,
+            and with stream=True, an iterator of them.
     '''
+    if timings:
+        if stream or raw_response:
+            raise TikaException('timings is not supported with stream or raw_response')
+        return _withTimings(lambda: from_file(filename, serverEndpoint, service, xmlContent, headers, config_path,
+                                              requestOptions, per_document=per_document))
+    if stream:
+        if service != 'all':
+            raise TikaException('stream=True is only supported for the all service')
+        return _parseStream(parse1(service, filename, serverEndpoint,
+                                   services={'all': '/rmeta/xml' if xmlContent else '/rmeta/text'},
+                                   headers=headers, config_path=config_path, requestOptions=requestOptions, stream=True))
     if not xmlContent:
         output = parse1(service, filename, serverEndpoint, headers=headers, config_path=config_path, requestOptions=requestOptions)
     else:
@@ -43,34 +73,77 @@ def from_file(filename, serverEndpoint=ServerEndpoint, service='all', xmlContent
     if raw_response:
         return output
     else:
-        return _parse(output, service)
+        return _parse(output, service, per_document)
+
+
+def from_files(filenames, serverEndpoint=ServerEndpoint, service='all', xmlContent=False, headers=None, config_path=None, requestOptions={}, workers=None, ordered=False,
+               timings=False):
+    '''
+    Parses many files concurrently, see from_file
+    :param filenames: iterable of paths, URLs or binary file objects
+    :param workers: number of requests in flight at once; defaults to TIKA_POOL_MAXSIZE
+    :param ordered: yield results in input order instead of completion order
+    :return: iterator of (filename, parsed, error) tuples; error is the exception raised
+            for that file, in which case parsed is None
+    '''
+    def parse(filename):
+        return from_file(filename, serverEndpoint, service, xmlContent, dict(headers or {}), config_path, requestOptions,
+                         timings=timings)
 
+    return runBatch(parse, filenames, workers, ordered)
 
-def from_buffer(string, serverEndpoint=ServerEndpoint, xmlContent=False, headers=None, config_path=None, requestOptions={}, raw_response=False):
+
+def from_buffer(string, serverEndpoint=ServerEndpoint, xmlContent=False, headers=None, config_path=None, requestOptions={}, raw_response=False,
+                stream=False, per_document=False, timings=False):
     '''
     Parses the content from buffer
-    :param string: Buffer value
+    :param string: Buffer value. Large content can be given as a binary file object,
+                   ``mmap`` or iterator of ``bytes``, and is then streamed to the server
     :param serverEndpoint: Server endpoint. This is optional
     :param xmlContent: Whether or not XML content be requested.
                     Default is 'False', which results in text content.
     :param headers: Request headers to be sent to the tika reset server, should
                     be a dictionary. This is optional
+    :param stream: Whether or not to decode the response incrementally, see _parseStream
+    :param per_document: Whether or not to return the embedded documents separately, see from_file
+    :param timings: Whether or not to add a 'timings' key, see from_file
     :return:
     '''
+    if timings:
+        if stream or raw_response:
+            raise TikaException('timings is not supported with stream or raw_response')
+        return _withTimings(lambda: from_buffer(string, serverEndpoint, xmlContent, headers, config_path,
+                                                requestOptions, per_document=per_document))
     headers = headers or {}
     headers.update({'Accept': 'application/json'})
 
     if not xmlContent:
-        status, response = callServer('put', serverEndpoint, '/rmeta/text', string, headers, False, config_path=config_path, requestOptions=requestOptions)
+        status, response = callServer('put', serverEndpoint, '/rmeta/text', string, headers, False, config_path=config_path, requestOptions=requestOptions,
+                                      stream=stream)
     else:
-        status, response = callServer('put', serverEndpoint, '/rmeta/xml', string, headers, False, config_path=config_path, requestOptions=requestOptions)
+        status, response = callServer('put', serverEndpoint, '/rmeta/xml', string, headers, False, config_path=config_path, requestOptions=requestOptions,
+                                      stream=stream)
 
+    if stream:
+        return _parseStream((status, response))
     if raw_response:
         return (status, response)
     else:
-        return _parse((status,response))
+        return _parse((status,response), per_document=per_document)
+
+def _withTimings(parse):
+    '''
+    Runs ``parse`` collecting the time spent in each phase, and adds them to its result
+    under 'timings', or to every document of it with per_document.
+    '''
+    with metrics.timings() as phases:
+        parsed = parse()
+    for document in (parsed if isinstance(parsed, list) else [parsed]):
+        document['timings'] = phases
+    return parsed
 
-def _parse(output, service='all'):
+@traced('decode')
+def _parse(output, service='all', per_document=False):
     '''
     Parses response from Tika REST API server
     :param output: output from Tika Server
@@ -78,15 +151,18 @@ def _parse(output, service='all'):
                     Default is 'all', which results in recursive text content+metadata.
                     'meta' returns only metadata
                     'text' returns only content
-    :return: a dictionary having 'metadata' and 'content' values
+    :param per_document: for the 'all' service, return one dictionary per embedded document
+                    instead of merging them
+    :return: a dictionary having 'metadata' and 'content' values, or a list of them
     '''
     parsed={'metadata': None, 'content': None}
+    per_document = per_document and service == 'all'
     if not output:
-        return parsed
+        return [] if per_document else parsed
 
     parsed["status"] = output[0]
     if output[1] is None or output[1] == "":
-        return parsed
+        return [] if per_document else parsed
 
     if service == "text":
         parsed["content"] = output[1]
@@ -100,24 +176,113 @@ def _parse(output, service='all'):
             parsed["metadata"][key] = realJson[key]
         return parsed
 
-    content = ""
-    for js in realJson:
-        if "X-TIKA:content" in js:
-            content += js["X-TIKA:content"]
-
-    if content == "":
-        content = None
-
-    parsed["content"] = content
+    if per_document:
+        return [_document(parsed["status"], js) for js in realJson]
 
+    # a single pass over all embedded documents: content is joined once, and the values
+    # of a key repeated across documents are collected into a list
+    contents = []
+    grouped = {}
     for js in realJson:
-        for n in js:
-            if n != "X-TIKA:content":
-                if n in parsed["metadata"]:
-                    if not isinstance(parsed["metadata"][n], list):
-                        parsed["metadata"][n] = [parsed["metadata"][n]]
-                    parsed["metadata"][n].append(js[n])
+        for n, value in js.items():
+            if n == "X-TIKA:content":
+                contents.append(value)
+            else:
+                values = grouped.get(n)
+                if values is None:
+                    grouped[n] = [value]
                 else:
-                    parsed["metadata"][n] = js[n]
+                    values.append(value)
+
+    parsed["content"] = "".join(contents) or None
+
+    metadata = parsed["metadata"]
+    for n, values in grouped.items():
+        if len(values) == 1:
+            metadata[n] = values[0]
+        elif isinstance(values[0], list):
+            metadata[n] = values[0] + values[1:]
+        else:
+            metadata[n] = values
 
     return parsed
+
+
+def _document(status, js):
+    '''
+    :param js: the decoded record of the document, reused as its metadata
+    :return: dictionary having 'status', 'metadata' and 'content' keys for one embedded document
+    '''
+    content = js.pop("X-TIKA:content", None)
+    return {'status': status, 'metadata': js, 'content': content}
+
+
+def _parseStream(output):
+    '''
+    Decodes a streamed /rmeta response one embedded document at a time, so memory use is
+    bounded by the largest embedded document rather than by the whole response.
+    The response is closed once the iterator is exhausted or closed.
+    :param output: (status, requests.Response) as returned by callServer with stream=True
+    :return: iterator of dictionaries having 'status', 'metadata' and 'content' keys,
+            container document first
+    '''
+    status, response = output
+    try:
+        if status != 200:
+            raise TikaException('Tika server returned status: %d' % status)
+        for document in _iterJsonArray(response.iter_content(CHUNK_SIZE)):
+            yield _document(status, document)
+    finally:
+        response.close()
+
+
+def _iterJsonArray(chunks):
+    '''
+    Decodes a JSON array arriving as chunks of UTF-8 bytes, yielding each item as soon as
+    it is complete. An incomplete item is only decoded again once the buffer has doubled,
+    so large items are not decoded over and over.
+    :param chunks: iterable of bytes
+    :return: iterator of the decoded items
+    '''
+    decoder = json.JSONDecoder()
+    textDecoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    started = False
+    retryAt = 0
+    chunks = iter(chunks)
+    while True:
+        chunk = next(chunks, None)
+        done = chunk is None
+        buffer += textDecoder.decode(chunk or b'', final=done)
+        if len(buffer) < retryAt and not done:
+            continue
+
+        position = 0
+        while True:
+            position = _whitespace.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise json.JSONDecodeError('Expecting an array', buffer, position)
+                started = True
+                position += 1
+            elif buffer[position] == ']':
+                return
+            elif buffer[position] == ',':
+                position += 1
+            else:
+                try:
+                    item, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if done:
+                        raise
+                    break
+                yield item
+        buffer = buffer[position:]
+        retryAt = 2 * len(buffer)
+
+        if done:
+            if started:
+                raise json.JSONDecodeError('Unterminated array', buffer, len(buffer))
+            return
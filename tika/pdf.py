@@ -14,29 +14,91 @@
 # limitations under the License.
 #
 
-from io import StringIO
-
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 
 from tika import parser
+from tika.tika import ServerEndpoint
+
+# characters of XHTML fed to the page parser at a time
+CHUNK_SIZE = 64 * 1024
+
+_lineBreaks = ('p', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+
+def text_from_pdf_pages(filename, serverEndpoint=ServerEndpoint, headers=None, requestOptions={}):
+    '''
+    Extracts the text of each page of a PDF
+    :param filename: path, URL or binary file object of the PDF
+    :param serverEndpoint: Tika server end point (optional)
+    :return: ``list`` of the text of each page
+    '''
+    return list(iter_pdf_pages(filename, serverEndpoint, headers, requestOptions))
+
+
+def iter_pdf_pages(filename, serverEndpoint=ServerEndpoint, headers=None, requestOptions={}):
+    '''
+    Extracts the text of each page of a PDF, including the PDFs embedded in it, from a
+    single XHTML parse of the file. Pages are yielded as soon as their markup has been read.
+    :param filename: path, URL or binary file object of the PDF
+    :param serverEndpoint: Tika server end point (optional)
+    :return: iterator of the text of each page
+    '''
+    for document in parser.from_file(filename, serverEndpoint, xmlContent=True, headers=headers,
+                                     requestOptions=requestOptions, stream=True):
+        xhtml = document['content'] or ''
+        pages = _PageTextParser()
+        for offset in range(0, len(xhtml), CHUNK_SIZE):
+            pages.feed(xhtml[offset:offset + CHUNK_SIZE])
+            yield from pages.popPages()
+        pages.close()
+        yield from pages.popPages()
+
+
+class _PageTextParser(HTMLParser):
+    '''
+    Collects the text of every ``<div class="page">`` of Tika's XHTML output.
+    '''
 
+    def __init__(self):
+        super().__init__()
+        self.pages = []
+        self._text = None
+        self._depth = 0
 
-def text_from_pdf_pages(filename):
-    pages_txt = []
+    def handle_starttag(self, tag, attrs):
+        if self._text is None:
+            if tag == 'div' and 'page' in (dict(attrs).get('class') or '').split():
+                self._text = []
+                self._depth = 1
+        elif tag == 'div':
+            self._depth += 1
+        elif tag == 'br':
+            self._text.append('\n')
 
-    # Read PDF file
-    data = parser.from_file(filename, xmlContent=True)
-    xhtml_data = BeautifulSoup(data['content'], features="html.parser")
-    for i, content in enumerate(xhtml_data.find_all('div', attrs={'class': 'page'})):
-        # Parse PDF data using TIKA (xml/html)
-        # It's faster and safer to create a new buffer than truncating it
-        # https://stackoverflow.com/questions/4330812/how-do-i-clear-a-stringio-object
-        _buffer = StringIO()
-        _buffer.write(str(content))
-        parsed_content = parser.from_buffer(_buffer.getvalue())
+    def handle_endtag(self, tag):
+        if self._text is None:
+            return
+        if tag == 'div':
+            self._depth -= 1
+            if not self._depth:
+                self.pages.append(''.join(self._text).strip())
+                self._text = None
+                return
+        if tag in _lineBreaks and self._text and not self._text[-1].endswith('\n'):
+            self._text.append('\n')
 
-        # Add pages
-        text = parsed_content['content'].strip()
-        pages_txt.append(text)
+    def handle_data(self, data):
+        if self._text is None:
+            return
+        if self._text and self._text[-1].endswith('\n'):
+            # Tika already puts a newline after block elements
+            data = data.lstrip('\n')
+        if data:
+            self._text.append(data)
 
-    return pages_txt
+    def popPages(self):
+        '''
+        :return: the pages completed since the last call
+        '''
+        pages, self.pages = self.pages, []
+        return pages
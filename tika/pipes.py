@@ -0,0 +1,205 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Bulk parsing through the ``/async`` endpoint of Tika Server, for documents on a disk
+the server can read itself: only fetch keys are sent, and the server writes its results
+through an emitter, so documents never travel through Python.
+
+The server needs a tika-config declaring a file system fetcher and a file system
+emitter, e.g. ``fsf`` with ``basePath`` ``/data/corpus`` and ``fse`` with ``basePath``
+``/data/parsed``; see the Tika Server documentation on tika-pipes.
+
+**Example usage**::
+
+    from tika import pipes
+
+    for path, parsed, error in pipes.from_paths(['/data/corpus/a.pdf', '/data/corpus/b.docx'],
+                                                fetchBase='/data/corpus', emitDir='/data/parsed'):
+        print(path, parsed['metadata']['Content-Type'])
+'''
+
+import json
+import os
+import time
+
+from . import parser
+from .tika import ServerEndpoint, TikaException, callServer, log
+
+FETCHER = 'fsf'
+EMITTER = 'fse'
+
+# polls a result may stay the same size without being valid JSON before it is taken as broken
+UNREADABLE_POLLS = 3
+
+
+def fetch_emit_tuple(fetchKey, fetcher=FETCHER, emitter=EMITTER, emitKey=None, id=None, handler='text',
+                     onParseException='emit'):
+    '''
+    Builds one ``/async`` request entry
+    :param fetchKey: key of the document for the fetcher, e.g. a path relative to its base path
+    :param fetcher: name of the fetcher in the server's tika-config
+    :param emitter: name of the emitter in the server's tika-config
+    :param emitKey: key the result is emitted under; defaults to ``fetchKey``
+    :param id: id of the entry; defaults to ``fetchKey``
+    :param handler: content handler, ``text``, ``xml`` or ``html``
+    :param onParseException: ``emit`` or ``skip`` documents that failed to parse
+    :return: ``dict`` ready to be JSON encoded
+    '''
+    return {
+        'id': id or fetchKey,
+        'fetcher': fetcher,
+        'fetchKey': fetchKey,
+        'emitter': emitter,
+        'emitKey': emitKey or fetchKey,
+        'handlerConfig': {'type': handler},
+        'onParseException': onParseException,
+    }
+
+
+def submit(tuples, serverEndpoint=ServerEndpoint, batchSize=100, throttleWait=1.0, maxThrottleWait=30.0,
+           requestOptions={}):
+    '''
+    Sends fetch-emit tuples to the ``/async`` endpoint in batches, waiting and retrying
+    while the server reports its queue as full.
+    :param tuples: iterable of ``dict`` built with fetch_emit_tuple
+    :param serverEndpoint: Tika server end point (optional)
+    :param batchSize: tuples per request
+    :param throttleWait: seconds to wait the first time the server is throttling, doubling up to ``maxThrottleWait``
+    :return: ``list`` of the submitted tuples
+    '''
+    submitted = []
+    batch = []
+    for entry in tuples:
+        batch.append(entry)
+        if len(batch) >= batchSize:
+            _submitBatch(batch, serverEndpoint, throttleWait, maxThrottleWait, requestOptions)
+            submitted.extend(batch)
+            batch = []
+    if batch:
+        _submitBatch(batch, serverEndpoint, throttleWait, maxThrottleWait, requestOptions)
+        submitted.extend(batch)
+    return submitted
+
+
+def _submitBatch(batch, serverEndpoint, throttleWait, maxThrottleWait, requestOptions):
+    headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+    body = json.dumps(batch)
+    wait = throttleWait
+    while True:
+        status, response = callServer('post', serverEndpoint, '/async', body, headers, False,
+                                      requestOptions=requestOptions, throttleStatus=503)
+        try:
+            answer = json.loads(response) if response else {}
+        except ValueError:
+            answer = {}
+        if status == 503 or answer.get('status') == 'throttled':
+            log.info('Tika server async queue is full; retrying in %.1fs' % wait)
+            time.sleep(wait)
+            wait = min(wait * 2, maxThrottleWait)
+            continue
+        if status != 200:
+            raise TikaException('Tika server rejected the async batch with status %d: %s' % (status, response))
+        return answer
+
+
+def collect(emitDir, emitKeys, timeout=None, pollInterval=0.5, extension='json'):
+    '''
+    Waits for the results written by a file system emitter and parses them as they appear.
+    A result that is still not valid JSON after its size stopped changing for UNREADABLE_POLLS
+    polls, e.g. one truncated when the server died, is handed out as an error.
+    :param emitDir: base path of the emitter, as seen from this machine
+    :param emitKeys: emit keys of the submitted documents
+    :param timeout: seconds to wait for all results; forever by default
+    :param pollInterval: seconds between checks for new results
+    :param extension: file extension the emitter appends to the emit keys
+    :return: iterator of (emitKey, parsed, error) tuples in completion order, parsed having the
+             same shape as the result of parser.from_file
+    '''
+    pending = list(emitKeys)
+    # emit key of a result that could not be parsed: (its size, polls it kept that size)
+    unreadable = {}
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while pending:
+        emitted = _listFiles(emitDir)
+        stillPending = []
+        for emitKey in pending:
+            path = os.path.join(emitDir, emitKey + '.' + extension)
+            if os.path.normpath(path) not in emitted:
+                stillPending.append(emitKey)
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    parsed = parser._parse((200, f.read()))
+            except FileNotFoundError:
+                stillPending.append(emitKey)
+                continue
+            except ValueError as e:
+                # still being written, unless it stopped growing
+                size = os.path.getsize(path)
+                previousSize, polls = unreadable.get(emitKey, (None, 0))
+                polls = polls + 1 if size == previousSize else 1
+                if polls < UNREADABLE_POLLS:
+                    unreadable[emitKey] = (size, polls)
+                    stillPending.append(emitKey)
+                    continue
+                yield emitKey, None, TikaException('Unreadable async result %s: %s' % (path, e))
+                continue
+            yield emitKey, parsed, None
+        pending = stillPending
+        if not pending:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TikaException('Timed out waiting for %d async results, e.g. %s' % (len(pending), pending[0]))
+        time.sleep(pollInterval)
+
+
+def _listFiles(directory):
+    # one listing per poll instead of a stat per pending key; emit keys may hold subdirectories
+    found = set()
+    for root, dirs, files in os.walk(directory):
+        found.update(os.path.normpath(os.path.join(root, name)) for name in files)
+    return found
+
+
+def from_paths(paths, fetchBase, emitDir, serverEndpoint=ServerEndpoint, fetcher=FETCHER, emitter=EMITTER,
+               handler='text', batchSize=100, timeout=None, requestOptions={}):
+    '''
+    Parses files the server can read itself: submits their fetch keys, then collects the results
+    :param paths: paths of the files, below ``fetchBase``
+    :param fetchBase: base path of the server's fetcher, as seen from this machine
+    :param emitDir: base path of the server's emitter, as seen from this machine
+    :param timeout: seconds to wait for all results; forever by default
+    :return: iterator of (path, parsed, error) tuples like parser.from_files, in completion order
+    '''
+    keys = {}
+    for path in paths:
+        fetchKey = os.path.relpath(os.path.abspath(path), os.path.abspath(fetchBase))
+        if fetchKey == os.pardir or fetchKey.startswith(os.pardir + os.sep):
+            raise TikaException('%s is not below the fetcher base path %s' % (path, fetchBase))
+        keys[fetchKey.replace(os.sep, '/')] = path
+
+    submitted = submit((fetch_emit_tuple(key, fetcher, emitter, handler=handler) for key in keys),
+                       serverEndpoint, batchSize, requestOptions=requestOptions)
+    emitted = set()
+    try:
+        for emitKey, parsed, error in collect(emitDir, [entry['emitKey'] for entry in submitted], timeout):
+            emitted.add(emitKey)
+            yield keys[emitKey], parsed, error
+    except TikaException as e:
+        for emitKey in keys:
+            if emitKey not in emitted:
+                yield keys[emitKey], None, e
@@ -0,0 +1,150 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Building blocks of the retry logic of ``callServer``: jittered backoff, a circuit
+breaker per Tika server and counters of what happened.
+
+**Example usage**::
+
+    import tika.tika
+    from tika import parser
+
+    parser.from_file('/path/to/file')
+    print(tika.tika.TikaCounters.snapshot())  # {'requests': 1, ...}
+'''
+
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def jitteredBackoff(retry, base, cap):
+    '''
+    "Full jitter" backoff: a random wait up to an exponentially growing bound, so
+    clients that failed together do not come back together.
+    :param retry: number of the retry, starting at 0
+    :param base: bound of the first wait, in seconds
+    :param cap: upper bound of any wait, in seconds
+    :return: seconds to wait
+    '''
+    return random.uniform(0, min(cap, base * 2 ** retry))
+
+
+class Counters:
+    '''
+    Thread-safe named counters.
+    '''
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def __getitem__(self, name):
+        with self._lock:
+            return self._counts.get(name, 0)
+
+    def snapshot(self):
+        '''
+        :return: ``dict`` of counter name to value
+        '''
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+class CircuitBreaker:
+    '''
+    Stops calls to a server that keeps failing, e.g. while it restarts after running
+    out of memory, instead of letting every document wait for its own connection error.
+
+    After ``failureThreshold`` consecutive failures the circuit opens and calls are
+    refused for ``resetTimeout`` seconds. Then a single call is let through as a probe:
+    its success closes the circuit, its failure opens it again. A probe that never
+    reports back is replaced by a new one after another ``resetTimeout``.
+    '''
+
+    def __init__(self, failureThreshold=5, resetTimeout=30.0):
+        '''
+        :param failureThreshold: consecutive failures opening the circuit; ``0`` disables the breaker
+        :param resetTimeout: seconds the circuit stays open before a probe is let through
+        '''
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._changedAt = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'CircuitBreaker(state=%r, failures=%d)' % (self.state, self.failures)
+
+    def allow(self):
+        '''
+        :return: ``True`` if a call may be made now
+        '''
+        if not self.failureThreshold:
+            return True
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if now < self._changedAt + self.resetTimeout:
+                return False
+            self.state = HALF_OPEN
+            self._changedAt = now
+            return True
+
+    def retryAfter(self):
+        '''
+        :return: seconds until the next call will be let through; ``0`` if calls are let through now
+        '''
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            return max(0.0, self._changedAt + self.resetTimeout - time.monotonic())
+
+    def recordSuccess(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def recordFailure(self):
+        '''
+        :return: ``True`` if this failure opened the circuit
+        '''
+        if not self.failureThreshold:
+            return False
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failureThreshold):
+                self.state = OPEN
+                self._changedAt = time.monotonic()
+                self.trips += 1
+                return True
+            return False
@@ -58,7 +58,7 @@ or:
 '''
 
 USAGE = """
-tika.py [-v] [-e] [-o <outputDir>] [--server <TikaServerEndpoint>] [--install <UrlToTikaServerJar>] [--port <portNumber>] <command> <option> <urlOrPathToFile>
+tika.py [-v] [-e] [-o <outputDir>] [--server <TikaServerEndpoint>] [--install <UrlToTikaServerJar>] [--port <portNumber>] [--workers <N>] [--manifest <file>] [--profile] <command> <option> <urlOrPathToFile>
 
 tika.py parse all test.pdf test2.pdf                   (write output JSON metadata files for test1.pdf_meta.json and test2.pdf_meta.json)
 tika.py detect type test.pdf                           (returns mime-type as text/plain)
@@ -92,6 +92,11 @@ Switches:
   --csv, -c    = report detect output in comma-delimited format
   --server <TikaServerEndpoint>  = use a remote Tika Server at this endpoint, otherwise use local server
   --install <UrlToTikaServerJar> = download and exec Tika Server (JAR file), starting server on default port 9998
+  --workers <N>                  = parse up to N files at the same time (parse command only)
+  --manifest <file>              = only parse files added or changed since the last run with this manifest,
+                                   and remove the output of deleted ones (parse command only)
+  --profile                      = print how long opening, uploading and parsing, reading the response
+                                   and writing the output took, over all files (parse command only)
 
 Example usage as python client:
 -- from tika import runCommand, parse1
@@ -116,20 +121,34 @@ try:
         return build_header(os.path.basename(fn)).decode('ascii')
 except ImportError:
     def make_content_disposition_header(fn):
-        return 'attachment; filename=%s' % os.path.basename(fn)
+        return 'attachment; filename=%s' % os.fsdecode(os.path.basename(fn))
 
 import ctypes
 import hashlib
 import io
 import logging
+import mmap
 import platform
 import signal
 import socket
 import tempfile
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from os import walk
-from subprocess import STDOUT, Popen
+from subprocess import STDOUT, Popen, TimeoutExpired
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from .cache import cacheKey, contentDigest, fromEnv as cacheFromEnv, renameResource
+from .endpoints import EndpointPool, livePools
+from .manifest import ParseManifest, fileDigest
+from . import metrics
+from .metrics import CallRecord, ClientMetrics, span
+from .resilience import CircuitBreaker, Counters, jitteredBackoff
 
 log_path = os.getenv('TIKA_LOG_PATH', tempfile.gettempdir())
 log_file = os.path.join(log_path, os.getenv('TIKA_LOG_FILE', 'tika.log'))
@@ -164,6 +183,10 @@ ServerHost = "localhost"
 Port = "9998"
 ServerEndpoint = os.getenv(
     'TIKA_SERVER_ENDPOINT', 'http://' + ServerHost + ':' + Port)
+TikaBalanceStrategy = os.getenv('TIKA_BALANCE_STRATEGY', 'round-robin')
+ServerEndpoints = [e.strip() for e in os.getenv('TIKA_SERVER_ENDPOINTS', '').split(',') if e.strip()]
+if ServerEndpoints:
+    ServerEndpoint = EndpointPool(ServerEndpoints, TikaBalanceStrategy)
 Translator = os.getenv(
     'TIKA_TRANSLATOR',
     "org.apache.tika.language.translate.Lingo24Translator")
@@ -171,8 +194,34 @@ TikaClientOnly = os.getenv('TIKA_CLIENT_ONLY', False)
 TikaServerClasspath = os.getenv('TIKA_SERVER_CLASSPATH', '')
 TikaStartupSleep = float(os.getenv('TIKA_STARTUP_SLEEP', 5))
 TikaStartupMaxRetry = int(os.getenv('TIKA_STARTUP_MAX_RETRY', 3))
+TikaStartupTimeout = float(os.getenv('TIKA_STARTUP_TIMEOUT', TikaStartupSleep * TikaStartupMaxRetry))
+TikaStartupPoll = float(os.getenv('TIKA_STARTUP_POLL', 0.1))
 TikaJava = os.getenv("TIKA_JAVA", "java")
 TikaJavaArgs = os.getenv("TIKA_JAVA_ARGS", '')
+TikaPoolConnections = int(os.getenv('TIKA_POOL_CONNECTIONS', 10))
+TikaPoolMaxSize = int(os.getenv('TIKA_POOL_MAXSIZE', 10))
+TikaKeepAlive = os.getenv('TIKA_KEEP_ALIVE', 'true').lower() not in ('0', 'false', 'no')
+TikaConnectRetries = int(os.getenv('TIKA_CONNECT_RETRIES', 0))
+TikaRetryBackoff = float(os.getenv('TIKA_RETRY_BACKOFF', 0.5))
+TikaServerCheckTTL = float(os.getenv('TIKA_SERVER_CHECK_TTL', 300))
+TikaProgressInterval = float(os.getenv('TIKA_PROGRESS_INTERVAL', 10))
+TikaUploadChunkSize = int(os.getenv('TIKA_UPLOAD_CHUNK_SIZE', 64 * 1024))
+# opt-in cache of results keyed by document content, see tika.cache
+TikaResultCache = cacheFromEnv(os.getenv('TIKA_CACHE'))
+TikaTimeout = float(os.getenv('TIKA_TIMEOUT', 60))
+TikaConnectTimeout = float(os.getenv('TIKA_CONNECT_TIMEOUT', 10))
+TikaTimeoutPerMB = float(os.getenv('TIKA_TIMEOUT_PER_MB', 0))
+TikaRetries = int(os.getenv('TIKA_RETRIES', 0))
+TikaRetryMaxBackoff = float(os.getenv('TIKA_RETRY_MAX_BACKOFF', 10))
+TikaBreakerThreshold = int(os.getenv('TIKA_BREAKER_THRESHOLD', 5))
+TikaBreakerReset = float(os.getenv('TIKA_BREAKER_RESET', 30))
+TikaWatchdogInterval = float(os.getenv('TIKA_WATCHDOG_INTERVAL', 0))
+TikaRecycleDocuments = int(os.getenv('TIKA_RECYCLE_DOCUMENTS', 0))
+TikaRecycleRss = float(os.getenv('TIKA_RECYCLE_RSS', 0))
+TikaRecycleLatency = float(os.getenv('TIKA_RECYCLE_LATENCY', 0))
+TikaDetectPrefix = int(os.getenv('TIKA_DETECT_PREFIX', 0))
+TikaLanguageSample = int(os.getenv('TIKA_LANGUAGE_SAMPLE', 0))
+TikaLocalDetect = os.getenv('TIKA_LOCAL_DETECT', 'false').lower() not in ('0', 'false', 'no')
 
 Verbose = 0
 EncodeUtf8 = 0
@@ -180,17 +229,77 @@ csvOutput = 0
 
 # will be used later on to kill the process and free up ram
 TikaServerProcess = False
+# cold start latency, in seconds, of the last server started: until it answered, and until the first call succeeded
+TikaServerReadyTime = None
+TikaFirstCallTime = None
+# every server process started by the current execution instance, including fleets
+TikaServerProcesses = []
+# endpoints whose servers are looked after by a ServerFleet, so they are never auto-started
+ManagedEndpoints = set()
+# ServerWatchdog looking after TikaServerProcess, started with it if TIKA_WATCHDOG_INTERVAL is set
+TikaWatchdog = None
+
+# pooled HTTP session shared by all calls to Tika Server, created on first use
+TikaSession = None
+_sessionLock = threading.Lock()
+
+# endpoints already confirmed by checkTikaServer: (scheme, host, port) -> (endpoint, expiry time)
+_serverState = {}
+_serverStateLock = threading.Lock()
+
+# endpoint pools for calls given a plain URL or a list of URLs, keyed by tuple of URLs
+_endpointPools = {}
+_endpointPoolsLock = threading.Lock()
+
+# endpoints being drained and restarted: endpoint URL -> Event set once calls may go on
+_pausedEndpoints = {}
+
+# circuit breakers of the servers called so far, keyed by endpoint URL
+_circuitBreakers = {}
+_circuitBreakersLock = threading.Lock()
+
+# requests sent, retries, timeouts, connection errors and circuit breaker activity of callServer
+TikaCounters = Counters()
+# per service metrics of every callServer call, see tika.metrics; None turns them off
+TikaMetrics = ClientMetrics()
+
+# statuses telling that the server, not the document, is the problem
+UnavailableStatuses = (502, 503, 504)
+# verbs whose calls can be sent again after a failure without doing their work twice
+IdempotentVerbs = ('get', 'put', 'head', 'options', 'delete')
 
 class TikaException(Exception):
     pass
 
+class CircuitOpenError(TikaException):
+    '''
+    Raised without calling the server while its circuit breaker is open.
+    '''
+    pass
+
+def parseServiceTimeouts(value):
+    '''
+    Parses TIKA_SERVICE_TIMEOUTS, e.g. ``/detect=10,/rmeta=300``.
+    :return: ``dict`` of service path prefix to read timeout in seconds
+    '''
+    timeouts = {}
+    for entry in value.split(','):
+        if '=' not in entry:
+            continue
+        service, seconds = entry.split('=', 1)
+        timeouts['/' + service.strip().lstrip('/')] = float(seconds)
+    return timeouts
+
+# read timeouts of services which answer much faster than a full parse
+TikaServiceTimeouts = parseServiceTimeouts(os.getenv('TIKA_SERVICE_TIMEOUTS', '/detect=15,/version=10'))
+
 def echo2(*s): sys.stderr.write(str('tika.py: %s\n') % str(' ').join(map(str, s)))
 def warn(*s):  echo2('Warn:', *s)
 def die(*s):   warn('Error:',  *s); echo2(USAGE); sys.exit()
 
 def runCommand(cmd, option, urlOrPaths, port, outDir=None,
                serverHost=ServerHost, tikaServerJar=TikaServerJar,
-               verbose=Verbose, encode=EncodeUtf8):
+               verbose=Verbose, encode=EncodeUtf8, workers=1, manifestPath=None, profile=False):
     '''
     Run the Tika command by calling the Tika server and return results in JSON format (or plain text).
     :param cmd: a command from set ``{'parse', 'detect', 'language', 'translate', 'config'}``
@@ -202,6 +311,9 @@ def runCommand(cmd, option, urlOrPaths, port, outDir=None,
     :param tikaServerJar:
     :param verbose:
     :param encode:
+    :param workers: number of files parsed concurrently by the ``parse`` command
+    :param manifestPath: manifest file making the ``parse`` command incremental
+    :param profile: print a table of the time spent in each phase of the ``parse`` command to stderr
     :return: response for the command, usually a ``dict``
     '''
     # import pdb; pdb.set_trace()
@@ -210,7 +322,12 @@ def runCommand(cmd, option, urlOrPaths, port, outDir=None,
         raise TikaException('No URLs/paths specified.')
     serverEndpoint = 'http://' + serverHost + ':' + port
     if cmd == 'parse':
-        return parseAndSave(option, urlOrPaths, outDir, serverEndpoint, verbose, tikaServerJar)
+        phases = metrics.Profile() if profile else None
+        metaPaths = parseAndSave(option, urlOrPaths, outDir, serverEndpoint, verbose, tikaServerJar, workers=workers,
+                                 manifestPath=manifestPath, profile=phases)
+        if phases is not None:
+            sys.stderr.write(phases.table() + '\n')
+        return metaPaths
     elif cmd == "detect":
         return detectType(option, urlOrPaths, serverEndpoint, verbose, tikaServerJar)
     elif cmd == "language":
@@ -233,24 +350,74 @@ def getPaths(urlOrPaths):
     :param urlOrPaths: the url or path to be scanned
     :return: ``list`` of paths
     '''
+    return list(iterPaths(urlOrPaths))
+
+def iterPaths(urlOrPaths):
+    '''
+    Lazy version of getPaths: yields paths while directories are being walked.
+    :param urlOrPaths: the url or path to be scanned
+    :return: iterator of paths
+    '''
     if isinstance(urlOrPaths, str):
         urlOrPaths = [urlOrPaths]  # do not recursively walk over letters of a single path which can include "/"
-    paths = []
     for eachUrlOrPaths in urlOrPaths:
         if os.path.isdir(eachUrlOrPaths):
             for root, directories, filenames in walk(eachUrlOrPaths):
                 for filename in filenames:
-                    paths.append(os.path.join(root,filename))
+                    yield os.path.join(root,filename)
         else:
-            paths.append(eachUrlOrPaths)
-    return paths
+            yield eachUrlOrPaths
+
+def runBatch(fn, items, workers=None, ordered=False):
+    '''
+    Calls ``fn`` on each item from a pool of worker threads, which share the pooled session
+    so several requests are in flight to Tika Server at once. Items are consumed lazily and
+    only a bounded number of them is pending at any time. A failing item does not abort the batch.
+    :param fn: function called with a single item
+    :param items: iterable of items, e.g. paths or URLs
+    :param workers: number of worker threads; defaults to TIKA_POOL_MAXSIZE
+    :param ordered: yield results in input order instead of completion order
+    :return: iterator of ``(item, result, error)`` tuples, ``error`` being the exception raised for that item or ``None``
+    '''
+    workers = workers or TikaPoolMaxSize
+    items = iter(items)
+
+    def call(item):
+        try:
+            return (item, fn(item), None)
+        except Exception as e:
+            return (item, None, e)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(call, item))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = [future for future in pending if future in finished]
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                for item in items:
+                    pending.append(executor.submit(call, item))
+                    break
+                yield future.result()
 
 def parseAndSave(option, urlOrPaths, outDir=None, serverEndpoint=ServerEndpoint, verbose=Verbose, tikaServerJar=TikaServerJar,
                  responseMimeType='application/json', metaExtension='_meta.json',
-                 services={'meta': '/meta', 'text': '/tika', 'all': '/rmeta'}):
+                 services={'meta': '/meta', 'text': '/tika', 'all': '/rmeta'}, workers=1, manifestPath=None, profile=None):
     '''
     Parse the objects and write extracted metadata and/or text in JSON format to matching
-    filename with an extension of '_meta.json'.
+    filename with an extension of '_meta.json'. Directories are walked lazily and up to
+    ``workers`` files are read, parsed and written at the same time. Files which fail
+    to parse are logged and skipped.
+    With a manifest, local files unchanged since the run that recorded them are skipped,
+    and the output of files deleted since then is removed.
     :param option:
     :param urlOrPaths:
     :param outDir:
@@ -260,20 +427,78 @@ def parseAndSave(option, urlOrPaths, outDir=None, serverEndpoint=ServerEndpoint,
     :param responseMimeType:
     :param metaExtension:
     :param services:
-    :return:
+    :param workers: number of files processed concurrently
+    :param manifestPath: manifest file for incremental runs, see tika.manifest (optional)
+    :param profile: ``tika.metrics.Profile`` the phase timings of every file are added to (optional)
+    :return: ``list`` of written metadata file paths, in completion order
     '''
-    metaPaths = []
-    paths = getPaths(urlOrPaths)
-    for path in paths:
+    manifest = ParseManifest(manifestPath) if manifestPath else None
+    seen = set()
+    skipped = 0
+
+    def metaPathOf(path):
         if outDir is None:
-            metaPath = path + metaExtension
+            return path + metaExtension
+        return os.path.join(outDir, os.path.split(path)[1] + metaExtension)
+
+    def changedPaths():
+        nonlocal skipped
+        for path in iterPaths(urlOrPaths):
+            if manifest is not None and os.path.isfile(path):
+                seen.add(os.path.abspath(path))
+                if manifest.isUnchanged(path, option, metaPathOf(path)):
+                    skipped += 1
+                    continue
+            yield path
+
+    def parseOne(path):
+        if profile is None:
+            return parseAndWrite(path)
+        with metrics.timings() as phases:
+            metaPath = parseAndWrite(path)
+        profile.add(phases)
+        return metaPath
+
+    def parseAndWrite(path):
+        metaPath = metaPathOf(path)
+        tracked = manifest is not None and os.path.isfile(path)
+        if tracked:
+            stat, digest = os.stat(path), fileDigest(path)
+        response = parse1(option, path, serverEndpoint, verbose, tikaServerJar, responseMimeType, services)[1]
+        log.info('Writing %s' % metaPath)
+        with span('write', path=metaPath), open(metaPath, 'w', encoding='utf-8') as f:
+            f.write(response + u"\n")
+        if tracked:
+            manifest.record(path, option, metaPath, stat, digest)
+        return metaPath
+
+    metaPaths = []
+    failed = 0
+    start = lastReport = time.monotonic()
+    for path, metaPath, error in runBatch(parseOne, changedPaths(), workers):
+        if error is None:
+            metaPaths.append(metaPath)
         else:
-            metaPath = os.path.join(outDir, os.path.split(path)[1] + metaExtension)
-            log.info('Writing %s' % metaPath)
-            with open(metaPath, 'w', encoding='utf-8') as f:
-                f.write(parse1(option, path, serverEndpoint, verbose, tikaServerJar, \
-                                    responseMimeType, services)[1] + u"\n")
-        metaPaths.append(metaPath)
+            failed += 1
+            log.error('Failed to parse %s: %s' % (path, error))
+        now = time.monotonic()
+        if now - lastReport >= TikaProgressInterval:
+            lastReport = now
+            log.info('Progress: %d parsed, %d failed, %d unchanged, %.1f files/s'
+                     % (len(metaPaths), failed, skipped, (len(metaPaths) + failed) / (now - start)))
+            if manifest is not None:
+                manifest.save()
+
+    if manifest is not None:
+        roots = [urlOrPaths] if isinstance(urlOrPaths, str) else urlOrPaths
+        # a root deleted since the last run still owns its outputs; URLs are never in the manifest
+        deleted = manifest.removeDeleted([root for root in roots if urlparse(root).scheme not in ('http', 'https')], seen)
+        manifest.save()
+        log.info('Skipped %d unchanged files; removed the output of %d deleted files' % (skipped, len(deleted)))
+
+    elapsed = time.monotonic() - start
+    log.info('Parsed %d files (%d failed) in %.1fs: %.1f files/s with %d workers'
+             % (len(metaPaths), failed, elapsed, (len(metaPaths) + failed) / elapsed if elapsed else 0, workers))
     return metaPaths
 
 
@@ -296,7 +521,8 @@ def parse(option, urlOrPaths, serverEndpoint=ServerEndpoint, verbose=Verbose, ti
 
 def parse1(option, urlOrPath, serverEndpoint=ServerEndpoint, verbose=Verbose, tikaServerJar=TikaServerJar,
           responseMimeType='application/json',
-          services={'meta': '/meta', 'text': '/tika', 'all': '/rmeta/text'}, rawResponse=False, headers=None, config_path=None, requestOptions={}):
+          services={'meta': '/meta', 'text': '/tika', 'all': '/rmeta/text'}, rawResponse=False, headers=None, config_path=None, requestOptions={},
+          stream=False):
     '''
     Parse the object and return extracted metadata and/or text in JSON format.
     :param option:
@@ -308,11 +534,15 @@ def parse1(option, urlOrPath, serverEndpoint=ServerEndpoint, verbose=Verbose, ti
     :param services:
     :param rawResponse:
     :param headers:
+    :param stream: see callServer
     :return:
     '''
     headers = headers or {}
 
-    path, file_type = getRemoteFile(urlOrPath, TikaFilesPath)
+    with span('open') as attributes:
+        path, file_type = getRemoteFile(urlOrPath, TikaFilesPath)
+        attributes['path'] = path
+        f = urlOrPath if _is_file_object(urlOrPath) else open(path, 'rb')
     headers.update({'Accept': responseMimeType, 'Content-Disposition': make_content_disposition_header(path.encode('utf-8') if type(path) is str else path)})
 
     if option not in services:
@@ -320,10 +550,10 @@ def parse1(option, urlOrPath, serverEndpoint=ServerEndpoint, verbose=Verbose, ti
     service = services.get(option, services['all'])
     if service == '/tika': responseMimeType = 'text/plain'
     headers.update({'Accept': responseMimeType, 'Content-Disposition': make_content_disposition_header(path.encode('utf-8') if type(path) is str else path)})
-    with urlOrPath if _is_file_object(urlOrPath) else open(path, 'rb') as f:
+    with f:
         status, response = callServer('put', serverEndpoint, service, f,
                                       headers, verbose, tikaServerJar, config_path=config_path,
-                                      rawResponse=rawResponse, requestOptions=requestOptions)
+                                      rawResponse=rawResponse, requestOptions=requestOptions, stream=stream)
 
     if file_type == 'remote': os.unlink(path)
     return (status, response)
@@ -365,8 +595,9 @@ def detectLang1(option, urlOrPath, serverEndpoint=ServerEndpoint, verbose=Verbos
         log.exception('Language option must be one of %s ' % bytes(services.keys()))
         raise TikaException('Language option must be one of %s ' % bytes(services.keys()))
     service = services[option]
-    status, response = callServer('put', serverEndpoint, service, open(path, 'rb'),
-            {'Accept': responseMimeType}, verbose, tikaServerJar, requestOptions=requestOptions)
+    with open(path, 'rb') as f:
+        status, response = callServer('put', serverEndpoint, service, f,
+                {'Accept': responseMimeType}, verbose, tikaServerJar, requestOptions=requestOptions)
     return (status, response)
 
 def doTranslate(option, urlOrPaths, serverEndpoint=ServerEndpoint, verbose=Verbose, tikaServerJar=TikaServerJar,
@@ -419,9 +650,10 @@ def doTranslate1(option, urlOrPath, serverEndpoint=ServerEndpoint, verbose=Verbo
         service = services["all"] + "/" + Translator + "/" + srcLang + "/" + destLang
     else:
         service = services["all"] + "/" + Translator + "/" + destLang
-    status, response = callServer('put', serverEndpoint, service, open(path, 'rb'),
-                                  {'Accept' : responseMimeType},
-                                  verbose, tikaServerJar, requestOptions=requestOptions)
+    with open(path, 'rb') as f:
+        status, response = callServer('put', serverEndpoint, service, f,
+                                      {'Accept' : responseMimeType},
+                                      verbose, tikaServerJar, requestOptions=requestOptions)
     return (status, response)
 
 def detectType(option, urlOrPaths, serverEndpoint=ServerEndpoint, verbose=Verbose, tikaServerJar=TikaServerJar,
@@ -444,7 +676,7 @@ def detectType(option, urlOrPaths, serverEndpoint=ServerEndpoint, verbose=Verbos
 
 def detectType1(option, urlOrPath, serverEndpoint=ServerEndpoint, verbose=Verbose, tikaServerJar=TikaServerJar,
                responseMimeType='text/plain',
-               services={'type': '/detect/stream'}, config_path=None, requestOptions={}):
+               services={'type': '/detect/stream'}, config_path=None, requestOptions={}, prefix=None):
     '''
     Detect the MIME/media type of the stream and return it in text/plain.
     :param option:
@@ -454,19 +686,30 @@ def detectType1(option, urlOrPath, serverEndpoint=ServerEndpoint, verbose=Verbos
     :param tikaServerJar:
     :param responseMimeType:
     :param services:
+    :param prefix: number of leading bytes to send instead of the whole file; MIME magic needs
+                   no more than that plus the file name. Defaults to TIKA_DETECT_PREFIX, ``0`` sends it all
     :return:
     '''
-    path, mode = getRemoteFile(urlOrPath, TikaFilesPath)
     if option not in services:
         log.exception('Detect option must be one of %s' % bytes(services.keys()))
         raise TikaException('Detect option must be one of %s' % bytes(services.keys()))
     service = services[option]
-    status, response = callServer('put', serverEndpoint, service, open(path, 'rb'),
-            {
-                'Accept': responseMimeType,
-                'Content-Disposition': make_content_disposition_header(path.encode('utf-8') if type(path) is str else path)
-            },
-            verbose, tikaServerJar, config_path=config_path, requestOptions=requestOptions)
+    prefix = TikaDetectPrefix if prefix is None else prefix
+    if prefix:
+        path, data = readPrefix(urlOrPath, prefix)
+    else:
+        path, mode = getRemoteFile(urlOrPath, TikaFilesPath)
+    headers = {
+        'Accept': responseMimeType,
+        'Content-Disposition': make_content_disposition_header(path.encode('utf-8') if type(path) is str else path)
+    }
+    if prefix:
+        status, response = callServer('put', serverEndpoint, service, data, headers,
+                verbose, tikaServerJar, config_path=config_path, requestOptions=requestOptions)
+    else:
+        with open(path, 'rb') as f:
+            status, response = callServer('put', serverEndpoint, service, f, headers,
+                    verbose, tikaServerJar, config_path=config_path, requestOptions=requestOptions)
     if csvOutput == 1:
         return(status, urlOrPath.decode("UTF-8") + "," + response)
     else:
@@ -490,56 +733,372 @@ def getConfig(option, serverEndpoint=ServerEndpoint, verbose=Verbose, tikaServer
     status, response = callServer('get', serverEndpoint, service, None, {'Accept': responseMimeType}, verbose, tikaServerJar, requestOptions=requestOptions)
     return (status, response)
 
+def createSession(poolConnections=None, poolMaxSize=None, keepAlive=None, connectRetries=None, retryBackoff=None):
+    '''
+    Creates a ``requests.Session`` that keeps a pool of persistent connections to Tika Server.
+    Arguments left as ``None`` fall back to the TIKA_POOL_* / TIKA_KEEP_ALIVE / TIKA_CONNECT_RETRIES settings.
+    :param poolConnections: number of per-host connection pools to cache
+    :param poolMaxSize: maximum number of connections kept open to a single host
+    :param keepAlive: if ``False``, ask the server to close the connection after every call
+    :param connectRetries: how many times a failed connection attempt is retried
+    :param retryBackoff: backoff factor, in seconds, between connection retries
+    :return: configured ``requests.Session``
+    '''
+    poolConnections = TikaPoolConnections if poolConnections is None else poolConnections
+    poolMaxSize = TikaPoolMaxSize if poolMaxSize is None else poolMaxSize
+    keepAlive = TikaKeepAlive if keepAlive is None else keepAlive
+    connectRetries = TikaConnectRetries if connectRetries is None else connectRetries
+    retryBackoff = TikaRetryBackoff if retryBackoff is None else retryBackoff
+
+    # only connection failures are retried here: the request body may be a stream
+    # which has been consumed by the time a read error or an error status shows up
+    retry = Retry(total=connectRetries, connect=connectRetries, read=0, status=0, other=0,
+                  backoff_factor=retryBackoff, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=poolConnections, pool_maxsize=poolMaxSize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not keepAlive:
+        session.headers['Connection'] = 'close'
+    return session
+
+def getSession():
+    '''
+    Returns the pooled session shared by all calls to Tika Server, creating it on first use.
+    :return: ``requests.Session``
+    '''
+    global TikaSession
+    if TikaSession is None:
+        with _sessionLock:
+            if TikaSession is None:
+                TikaSession = createSession()
+    return TikaSession
+
+def closeSession():
+    '''
+    Closes the shared session and its pooled connections. A new one is created on the next call.
+    '''
+    global TikaSession
+    with _sessionLock:
+        if TikaSession is not None:
+            TikaSession.close()
+            TikaSession = None
+
+def _sessionVerbs(session):
+    def verb(method):
+        return lambda url, data=None, **kwargs: session.request(method, url, data=data, **kwargs)
+    return {'get': verb('GET'), 'put': verb('PUT'), 'post': verb('POST')}
+
+def getEndpointPool(serverEndpoint):
+    '''
+    Returns the EndpointPool used for calls to the given endpoint(s). Pools for plain
+    URLs and lists of URLs are created once and reused, so server health is remembered.
+    :param serverEndpoint: endpoint URL, list of endpoint URLs or ``EndpointPool``
+    :return: ``EndpointPool``
+    '''
+    if isinstance(serverEndpoint, EndpointPool):
+        return serverEndpoint
+    key = (serverEndpoint,) if isinstance(serverEndpoint, str) else tuple(serverEndpoint)
+    pool = _endpointPools.get(key)
+    if pool is None:
+        with _endpointPoolsLock:
+            pool = _endpointPools.setdefault(key, EndpointPool(list(key), TikaBalanceStrategy))
+    return pool
+
+def getCircuitBreaker(serverEndpoint):
+    '''
+    Returns the circuit breaker guarding calls to a server, creating it on first use.
+    :param serverEndpoint: endpoint URL
+    :return: ``CircuitBreaker``
+    '''
+    key = serverEndpoint.rstrip('/')
+    breaker = _circuitBreakers.get(key)
+    if breaker is None:
+        with _circuitBreakersLock:
+            breaker = _circuitBreakers.setdefault(key, CircuitBreaker(TikaBreakerThreshold, TikaBreakerReset))
+    return breaker
+
+def pauseEndpoint(serverEndpoint, timeout=None):
+    '''
+    Holds back new calls to a server, e.g. while it is restarted. The server is taken out
+    of rotation; calls that have no other server to go to wait until :func:`resumeEndpoint`,
+    and fail with TikaException if that takes longer than ``timeout`` seconds.
+    :param serverEndpoint: endpoint URL
+    :param timeout: seconds a held back call waits at most; defaults to the read timeout of the call
+    '''
+    url = serverEndpoint.rstrip('/')
+    gate = _pausedEndpoints.setdefault(url, threading.Event())
+    gate.timeout = timeout
+    for pool in livePools():
+        if any(e.url == url for e in pool.endpoints):
+            pool.eject(url)
+
+def resumeEndpoint(serverEndpoint):
+    '''
+    Lets calls held back by :func:`pauseEndpoint` go on.
+    :param serverEndpoint: endpoint URL
+    '''
+    url = serverEndpoint.rstrip('/')
+    for pool in livePools():
+        if any(e.url == url for e in pool.endpoints):
+            pool.readmit(url)
+    gate = _pausedEndpoints.pop(url, None)
+    if gate is not None:
+        gate.set()
+
+def requestTimeout(service, size=None):
+    '''
+    Timeout of a call: the read timeout of the service (TIKA_SERVICE_TIMEOUTS, else TIKA_TIMEOUT)
+    plus TIKA_TIMEOUT_PER_MB seconds for every MiB of the request body.
+    :param service: service path, e.g. ``/rmeta/text``
+    :param size: size of the request body in bytes, if known
+    :return: (connect timeout, read timeout) tuple, in seconds
+    '''
+    readTimeout = TikaTimeout
+    prefixes = [prefix for prefix in TikaServiceTimeouts if service.startswith(prefix)]
+    if prefixes:
+        readTimeout = TikaServiceTimeouts[max(prefixes, key=len)]
+    if size and TikaTimeoutPerMB:
+        readTimeout += TikaTimeoutPerMB * size / (1024 * 1024)
+    return (min(TikaConnectTimeout, readTimeout), readTimeout)
+
+def _bodySize(data):
+    '''
+    :return: bytes left to send of a request body, or ``None`` if it cannot be told without reading it
+    '''
+    if data is None:
+        return 0
+    try:
+        return requests.utils.super_len(data) or None
+    except Exception:
+        return None
+
+def _recordFirstCall():
+    global TikaFirstCallTime
+    TikaFirstCallTime = time.monotonic() - TikaServerProcess.launchedAt
+    log.info("First Tika server call answered %.2fs after the server was launched" % TikaFirstCallTime)
+
+def _rewind(data):
+    '''
+    Prepares a request body to be sent again.
+    :return: a callable restoring ``data`` to where it started, or ``None`` if it can only be sent once
+    '''
+    if data is None or isinstance(data, (str, bytes, bytearray, memoryview)):
+        return lambda: None
+    if hasattr(data, 'seek') and hasattr(data, 'tell'):
+        try:
+            position = data.tell()
+            return lambda: data.seek(position)
+        except (OSError, ValueError):
+            return None
+    return None
+
+def _iterChunks(data, chunkSize=None):
+    '''
+    Yields a buffer or a file object one chunk at a time.
+    :param data: ``memoryview`` or object having a ``read`` method, e.g. a file or ``mmap``
+    :param chunkSize: bytes per chunk; defaults to TIKA_UPLOAD_CHUNK_SIZE
+    '''
+    chunkSize = chunkSize or TikaUploadChunkSize
+    if isinstance(data, memoryview):
+        for offset in range(0, data.nbytes, chunkSize):
+            yield data[offset:offset + chunkSize].tobytes()
+        return
+    while True:
+        chunk = data.read(chunkSize)
+        if not chunk:
+            break
+        yield chunk
+
+def _streamBody(data):
+    '''
+    Makes sure a request body is sent without loading it into memory first.
+    Files are streamed by requests itself, with a Content-Length; memory views, ``mmap``
+    objects and, on Windows, file objects are turned into chunk generators, which
+    requests sends with chunked transfer encoding, like any other iterator of bytes.
+    '''
+    if isinstance(data, (memoryview, mmap.mmap)) or (Windows and _is_file_object(data)):
+        return _iterChunks(data)
+    return data
+
 def callServer(verb, serverEndpoint, service, data, headers, verbose=Verbose, tikaServerJar=TikaServerJar,
-               httpVerbs={'get': requests.get, 'put': requests.put, 'post': requests.post}, classpath=None,
-               rawResponse=False,config_path=None, requestOptions={}):
+               httpVerbs=None, classpath=None,
+               rawResponse=False,config_path=None, requestOptions={}, session=None, stream=False, throttleStatus=None,
+               retry=None):
     '''
     Call the Tika Server, do some error checking, and return the response.
+    If the server can't be reached or answers 502/503/504, the call is retried on
+    another server of the endpoint pool, and then TIKA_RETRIES more times after a
+    jittered backoff, as long as the request body can be re-read. Calls with other than
+    idempotent verbs are only retried when they never reached a server, see ``retry``. A server failing
+    repeatedly is not called at all for a while; CircuitOpenError is raised instead.
+    The timeout depends on the service and the size of the request body, see requestTimeout.
+    If TikaResultCache is set, a document sent before with the same service, headers
+    and config is answered from the cache without calling the server.
     :param verb:
-    :param serverEndpoint:
+    :param serverEndpoint: endpoint URL, list of endpoint URLs or ``EndpointPool``
     :param service:
-    :param data:
+    :param data: ``str``, ``bytes``, binary file object, ``mmap``, ``memoryview`` or iterator of ``bytes``;
+                 everything but ``str`` and ``bytes`` is streamed to the server
     :param headers:
     :param verbose:
     :param tikaServerJar:
-    :param httpVerbs:
+    :param httpVerbs: mapping of verb to request function; defaults to the methods of ``session``
     :param classpath:
-    :return:
+    :param session: ``requests.Session`` to send the request with; defaults to the shared pooled session
+    :param stream: return the ``requests.Response`` instead of its body, before the body is read,
+                   so it can be consumed with ``iter_content``; the caller has to close it
+    :param throttleStatus: status the service answers when it is busy rather than failing, e.g. 503 from
+                           ``/async``; it is returned to the caller, which waits and tries again, without
+                           retrying, taking the server out of rotation or counting towards the circuit breaker
+    :param retry: whether a failed call may be sent again, to another server; defaults to ``True`` for
+                  idempotent verbs (GET, PUT, ...) only, since e.g. a POST to ``/async`` the server already
+                  accepted would be queued twice
+    :return: tuple having (status, response)
     '''
-    parsedUrl = urlparse(serverEndpoint)
-    serverHost = parsedUrl.hostname
-    scheme = parsedUrl.scheme
+    call = CallRecord(verb, service)
+    try:
+        return _callServer(call, verb, serverEndpoint, service, data, headers, verbose, tikaServerJar, httpVerbs,
+                           classpath, rawResponse, config_path, requestOptions, session, stream, throttleStatus, retry)
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        call.finish()
+        if TikaMetrics is not None:
+            TikaMetrics.record(call)
 
-    port = parsedUrl.port
+def _callServer(call, verb, serverEndpoint, service, data, headers, verbose, tikaServerJar, httpVerbs, classpath,
+                rawResponse, config_path, requestOptions, session, stream, throttleStatus, retry):
+    pool = getEndpointPool(serverEndpoint)
     if classpath is None:
         classpath = TikaServerClasspath
 
-    global TikaClientOnly
-    if not TikaClientOnly:
-        serverEndpoint = checkTikaServer(scheme, serverHost, port, tikaServerJar, classpath, config_path)
-
-    serviceUrl  = serverEndpoint + service
+    if httpVerbs is None:
+        httpVerbs = _sessionVerbs(session or getSession())
     if verb not in httpVerbs:
         log.exception('Tika Server call must be one of %s' % bytes(httpVerbs.keys()))
         raise TikaException('Tika Server call must be one of %s' % bytes(httpVerbs.keys()))
     verbFn = httpVerbs[verb]
 
-    if Windows and hasattr(data, "read"):
-        data = data.read()
-
     encodedData = data
     if type(data) is str:
         encodedData = data.encode('utf-8')
 
+    call.bytesSent = _bodySize(encodedData)
     requestOptionsDefault = {
-        'timeout': 60,
+        'timeout': requestTimeout(service, call.bytesSent),
         'headers': headers,
         'verify': False
     }
     effectiveRequestOptions = requestOptionsDefault.copy()
     effectiveRequestOptions.update(requestOptions)
-
-    resp = verbFn(serviceUrl, encodedData, **effectiveRequestOptions)
+    if stream:
+        effectiveRequestOptions['stream'] = True
+
+    resultCache = TikaResultCache
+    key = None
+    if resultCache is not None and verb == 'put' and not stream:
+        digest = contentDigest(encodedData)
+        if digest:
+            # headers from requestOptions replace the default ones, so key on what is sent
+            sentHeaders = effectiveRequestOptions['headers']
+            key = cacheKey(digest, service, sentHeaders, config_path, TikaVersion, rawResponse)
+            cached = resultCache.get(key)
+            if cached is not None:
+                call.cacheHit = True
+                call.status = cached[0]
+                return renameResource(cached, sentHeaders)
+
+    rewind = _rewind(encodedData)
+    if retry is None:
+        retry = verb in IdempotentVerbs
+    # a call refused by a circuit breaker was not sent, so any call may go on to another server
+    attempts = len(pool) + TikaRetries if rewind else 1
+    tried = []
+    refused = set()
+    pausedUntil = None
+    for attempt in range(attempts):
+        if attempt:
+            rewind()
+        if attempt >= len(pool):
+            # every server has had its chance; wait before asking them again
+            time.sleep(jitteredBackoff(attempt - len(pool), TikaRetryBackoff, TikaRetryMaxBackoff))
+        endpoint = pool.acquire(exclude=tried)
+        gate = _pausedEndpoints.get(endpoint.url)
+        while gate is not None:
+            # the server is being restarted and there is no other one to go to
+            pool.release(endpoint)
+            if pausedUntil is None:
+                pausedUntil = time.monotonic() + (gate.timeout or _readTimeout(effectiveRequestOptions) or TikaTimeout)
+            if not gate.wait(max(pausedUntil - time.monotonic(), 0)):
+                raise TikaException('Tika server %s is being restarted and did not come back in time' % endpoint.url)
+            endpoint = pool.acquire(exclude=tried)
+            gate = _pausedEndpoints.get(endpoint.url)
+        tried.append(endpoint)
+        serverEndpoint = endpoint.url
+        breaker = getCircuitBreaker(serverEndpoint)
+        if not breaker.allow():
+            pool.release(endpoint)
+            TikaCounters.incr('circuitRefused')
+            refused.add(endpoint)
+            if len(refused) == len(pool) or attempt + 1 == attempts:
+                raise CircuitOpenError('Tika server %s is failing; not calling it for another %.1fs'
+                                       % (serverEndpoint, breaker.retryAfter()))
+            continue
+        TikaCounters.incr('requests')
+        call.endpoint = serverEndpoint
+        try:
+            if not TikaClientOnly:
+                parsedUrl = urlparse(serverEndpoint)
+                serverEndpoint = checkTikaServerCached(parsedUrl.scheme, parsedUrl.hostname, parsedUrl.port,
+                                                       tikaServerJar, classpath, config_path)
+            # upload and server time, until the response headers arrived
+            with span('request', service=service, endpoint=serverEndpoint, attempt=attempt):
+                resp = verbFn(serverEndpoint + service, _streamBody(encodedData), **effectiveRequestOptions)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if _isReadTimeout(e):
+                # the server is up but stuck on this document: trying again would hold the caller as long again
+                pool.release(endpoint)
+                TikaCounters.incr('timeouts')
+                if isinstance(e, requests.ReadTimeout):
+                    raise
+                raise requests.ReadTimeout(e, request=e.request) from e
+            pool.release(endpoint, failed=True)
+            TikaCounters.incr('connectionErrors')
+            _recordFailure(breaker, serverEndpoint)
+            # the server may have gone away; probe it again on the next call
+            resetServerState(serverEndpoint)
+            if attempt + 1 == attempts or not (retry or _isConnectFailure(e)):
+                raise
+            TikaCounters.incr('retries')
+            call.retries += 1
+            log.warning('Tika server %s failed (%s); retrying', serverEndpoint, e)
+            continue
+        except BaseException:
+            pool.release(endpoint)
+            raise
+
+        throttled = resp.status_code == throttleStatus
+        unavailable = resp.status_code in UnavailableStatuses and not throttled
+        pool.release(endpoint, failed=unavailable, answered=True)
+        if throttled:
+            TikaCounters.incr('throttled')
+        if unavailable:
+            TikaCounters.incr('unavailable')
+            _recordFailure(breaker, serverEndpoint)
+        else:
+            breaker.recordSuccess()
+        if TikaServerProcess and TikaFirstCallTime is None and resp.status_code == 200:
+            _recordFirstCall()
+        if unavailable and retry and attempt + 1 < attempts:
+            TikaCounters.incr('retries')
+            call.retries += 1
+            log.warning('Tika server %s returned status %d; retrying', serverEndpoint, resp.status_code)
+            resp.close()
+            continue
+        break
 
     if verbose:
         print(sys.stderr, "Request headers: ", headers)
@@ -547,12 +1106,49 @@ def callServer(verb, serverEndpoint, service, data, headers, verbose=Verbose, ti
     if resp.status_code != 200:
         log.warning('Tika server returned status: %d', resp.status_code)
 
+    call.status = resp.status_code
+    call.serverSeconds = resp.elapsed.total_seconds()
     resp.encoding = "utf-8"
-    if rawResponse:
-        return (resp.status_code, resp.content)
-    else:
-        return (resp.status_code, resp.text)
+    if stream:
+        contentLength = resp.headers.get('Content-Length')
+        call.bytesReceived = int(contentLength) if contentLength and contentLength.isdigit() else None
+        return (resp.status_code, resp)
+    with span('response', service=service):
+        content = resp.content
+    call.bytesReceived = len(content)
+    result = (resp.status_code, content if rawResponse else resp.text)
+    if key and resp.status_code == 200:
+        resultCache.set(key, result)
+    return result
+
+
+def _readTimeout(requestOptions):
+    timeout = requestOptions.get('timeout')
+    return timeout[-1] if isinstance(timeout, tuple) else timeout
+
+def _isReadTimeout(error):
+    '''
+    :return: ``True`` if the server took too long to answer; with a retrying session
+             requests reports that as a ``ConnectionError`` caused by a ``ReadTimeoutError``
+    '''
+    if isinstance(error, requests.ReadTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, ReadTimeoutError)
+
+def _isConnectFailure(error):
+    '''
+    :return: ``True`` if no connection to the server could be made, so the request never reached it
+    '''
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
 
+def _recordFailure(breaker, serverEndpoint):
+    if breaker.recordFailure():
+        TikaCounters.incr('circuitOpened')
+        log.warning('Tika server %s keeps failing; refusing calls to it for %.1fs', serverEndpoint, breaker.resetTimeout)
 
 def checkTikaServer(scheme="http", serverHost=ServerHost, port=Port, tikaServerJar=TikaServerJar, classpath=None, config_path=None):
     '''
@@ -569,26 +1165,77 @@ def checkTikaServer(scheme="http", serverHost=ServerHost, port=Port, tikaServerJ
     if port is None:
         port = '443' if scheme == 'https' else '80'
 
-    urlp = urlparse(tikaServerJar)
     serverEndpoint = '%s://%s:%s' % (scheme, serverHost, port)
-    jarPath = os.path.join(TikaJarPath, 'tika-server.jar')
     if 'localhost' in serverEndpoint or '127.0.0.1' in serverEndpoint:
         alreadyRunning = checkPortIsOpen(serverHost, port)
 
         if not alreadyRunning:
-            if not os.path.isfile(jarPath) and urlp.scheme != '':
-                getRemoteJar(tikaServerJar, jarPath)
-
-            if not checkJarSig(tikaServerJar, jarPath):
-                os.remove(jarPath)
-                tikaServerJar = getRemoteJar(tikaServerJar, jarPath)
-
+            if TikaServerProcess and str(TikaServerProcess.port) == str(port):
+                # the server started before stopped answering; don't leave it running next to a new one
+                stopServer(TikaServerProcess)
+            jarPath = prepareServerJar(tikaServerJar)
             status = startServer(jarPath, TikaJava, TikaJavaArgs, serverHost, port, classpath, config_path)
             if not status:
                 log.error("Failed to receive startup confirmation from startServer.")
                 raise RuntimeError("Unable to start Tika server.")
+            if TikaWatchdogInterval:
+                _startWatchdog(serverHost, port, tikaServerJar, classpath, config_path)
+    return serverEndpoint
+
+def _startWatchdog(serverHost, port, tikaServerJar, classpath, config_path):
+    global TikaWatchdog
+    from .watchdog import ServerWatchdog
+    if TikaWatchdog is not None:
+        TikaWatchdog.stop()
+    TikaWatchdog = ServerWatchdog(port, serverHost, tikaServerJar, classpath, config_path).start()
+
+def prepareServerJar(tikaServerJar=TikaServerJar):
+    '''
+    Makes sure the Tika server jar is available locally and its checksum matches, downloading it if needed.
+    :param tikaServerJar: URL of the Tika server jar
+    :return: path of the local jar
+    '''
+    urlp = urlparse(tikaServerJar)
+    jarPath = os.path.join(TikaJarPath, 'tika-server.jar')
+    if not os.path.isfile(jarPath) and urlp.scheme != '':
+        getRemoteJar(tikaServerJar, jarPath)
+
+    if not checkJarSig(tikaServerJar, jarPath):
+        os.remove(jarPath)
+        getRemoteJar(tikaServerJar, jarPath)
+    return jarPath
+
+def checkTikaServerCached(scheme="http", serverHost=ServerHost, port=Port, tikaServerJar=TikaServerJar, classpath=None, config_path=None):
+    '''
+    Same as checkTikaServer, but remembers a successful check for TIKA_SERVER_CHECK_TTL seconds
+    so the DNS lookup and port probe are not repeated for every call.
+    :return: the server endpoint
+    '''
+    if '%s://%s:%s' % (scheme, serverHost, port) in ManagedEndpoints:
+        return '%s://%s:%s' % (scheme, serverHost, port)
+    key = (scheme, serverHost, port)
+    state = _serverState.get(key)
+    if state and state[1] > time.monotonic():
+        return state[0]
+    # checks run one at a time so concurrent callers don't start the server twice
+    with _serverStateLock:
+        state = _serverState.get(key)
+        if state and state[1] > time.monotonic():
+            return state[0]
+        serverEndpoint = checkTikaServer(scheme, serverHost, port, tikaServerJar, classpath, config_path)
+        _serverState[key] = (serverEndpoint, time.monotonic() + TikaServerCheckTTL)
     return serverEndpoint
 
+def resetServerState(serverEndpoint=None):
+    '''
+    Forgets cached server checks so the next call probes the server again.
+    :param serverEndpoint: only forget this endpoint; forget all of them if ``None``
+    '''
+    with _serverStateLock:
+        for key, (endpoint, expiry) in list(_serverState.items()):
+            if serverEndpoint is None or endpoint == serverEndpoint:
+                del _serverState[key]
+
 def checkJarSig(tikaServerJar, jarPath):
     '''
     Checks the signature of Jar
@@ -618,6 +1265,24 @@ def startServer(tikaServerJar, java_path = TikaJava, java_args = TikaJavaArgs, s
     :param classpath: Class path value to pass to JVM
     :return: None
     '''
+    global TikaServerProcess, TikaFirstCallTime
+    process = launchServer(tikaServerJar, java_path, java_args, port, classpath, config_path)
+    if not process:
+        return False
+    TikaServerProcess = process
+    TikaFirstCallTime = None
+    return waitForServer(process, serverHost)
+
+def launchServer(tikaServerJar, java_path=TikaJava, java_args=TikaJavaArgs, port=Port, classpath=None, config_path=None,
+                 logFileName='tika-server.log'):
+    '''
+    Launches a Tika Server JVM in the background without waiting for it to be ready.
+    :param tikaServerJar: path to tika server jar
+    :param port: the host port to be used for binding the service
+    :param classpath: Class path value to pass to JVM
+    :param logFileName: name of the server log file, created in TIKA_LOG_PATH
+    :return: the ``Popen`` process, with the log path as its ``logPath`` attribute, or ``None`` on failure
+    '''
     if classpath is None:
         classpath = TikaServerClasspath
 
@@ -634,78 +1299,132 @@ def startServer(tikaServerJar, java_path = TikaJava, java_args = TikaJavaArgs, s
     else:
         classpath = tikaServerJar
 
-    # setup command string
+    # setup command string; Popen returns at once, so the JVM is not backgrounded with '&'
+    # which keeps the process object tied to the JVM itself
     cmd_string = ""
     if not config_path:
-        cmd_string = '%s %s -cp "%s" org.apache.tika.server.core.TikaServerCli --port %s --host %s &' \
+        cmd_string = '%s %s -cp "%s" org.apache.tika.server.core.TikaServerCli --port %s --host %s' \
                      % (java_path, java_args, classpath, port, host)
     else:
-        cmd_string = '%s %s -cp "%s" org.apache.tika.server.core.TikaServerCli --port %s --host %s --config %s &' \
+        cmd_string = '%s %s -cp "%s" org.apache.tika.server.core.TikaServerCli --port %s --host %s --config %s' \
                      % (java_path, java_args, classpath, port, host, config_path)
 
     # Check that we can write to log path
     try:
-        tika_log_file_path = os.path.join(TikaServerLogFilePath, 'tika-server.log')
+        tika_log_file_path = os.path.join(TikaServerLogFilePath, logFileName)
+        if os.path.isfile(tika_log_file_path) and os.path.getsize(tika_log_file_path):
+            # keep the log of the previous server, e.g. to see why it crashed
+            os.replace(tika_log_file_path, tika_log_file_path + '.1')
         logFile = open(tika_log_file_path, 'w')
     except PermissionError as e:
-        log.error("Unable to create tika-server.log at %s due to permission error." % (TikaServerLogFilePath))
-        return False
+        log.error("Unable to create %s at %s due to permission error." % (logFileName, TikaServerLogFilePath))
+        return None
 
     # Check that specified java binary is available on path
     try:
         _ = Popen(java_path, stdout=open(os.devnull, "w"), stderr=open(os.devnull, "w"))
     except FileNotFoundError as e:
         log.error("Unable to run java; is it installed?")
-        return False
+        return None
 
     # Run java with jar args
-    global TikaServerProcess
     # Patch for Windows support
     if Windows:
-        TikaServerProcess = Popen(cmd_string, stdout=logFile, stderr=STDOUT, shell=True, start_new_session=True)
+        process = Popen(cmd_string, stdout=logFile, stderr=STDOUT, shell=True, start_new_session=True)
     else:
-        TikaServerProcess = Popen(cmd_string, stdout=logFile, stderr=STDOUT, shell=True, preexec_fn=os.setsid)
-
-    # Check logs and retry as configured
-    try_count = 0
+        process = Popen(cmd_string, stdout=logFile, stderr=STDOUT, shell=True, preexec_fn=os.setsid)
+    process.logPath = tika_log_file_path
+    process.port = port
+    process.launchedAt = time.monotonic()
+    process.readyAfter = None
+    TikaServerProcesses.append(process)
+    return process
+
+def waitForServer(process, serverHost=ServerHost):
+    '''
+    Waits until a launched Tika Server answers on its port. The server is polled for ``/version``
+    with exponential backoff, from TIKA_STARTUP_POLL seconds up to TIKA_STARTUP_SLEEP seconds
+    between checks, and the new lines of its log are scanned for the startup message meanwhile.
+    Gives up after TIKA_STARTUP_TIMEOUT seconds or as soon as the process exits.
+    :param process: ``Popen`` object returned by launchServer
+    :param serverHost: host the server is reached on
+    :return: ``True`` if the server started
+    '''
+    global TikaServerReadyTime
+    versionUrl = 'http://%s:%s/version' % (serverHost, process.port)
+    deadline = process.launchedAt + TikaStartupTimeout
+    interval = TikaStartupPoll
     is_started = False
-    while try_count < TikaStartupMaxRetry:
-        with open(tika_log_file_path, "r") as tika_log_file_tmp:
-            # check for INFO string to confirm listening endpoint
-            if "Started Apache Tika server" in tika_log_file_tmp.read():
+    with open(process.logPath, "r") as tika_log_file:
+        while True:
+            # check for INFO string to confirm listening endpoint, reading only what was added since last time
+            if "Started Apache Tika server" in tika_log_file.read():
                 is_started = True
                 break
-            else:
-                log.warning("Failed to see startup log message; retrying...")
-        time.sleep(TikaStartupSleep)
-        try_count += 1
+            try:
+                if requests.get(versionUrl, timeout=max(interval, 1)).status_code == 200:
+                    is_started = True
+                    break
+            except requests.RequestException:
+                pass
+            if process.poll() is not None:
+                log.error("Tika server exited with status %s while starting; see %s" % (process.returncode, process.logPath))
+                return False
+            if time.monotonic() + interval > deadline:
+                break
+            time.sleep(interval)
+            interval = min(interval * 2, TikaStartupSleep)
 
     if not is_started:
-        log.error("Tika startup log message not received after %d tries." % (TikaStartupMaxRetry))
+        log.error("Tika server did not become ready within %.1fs." % (TikaStartupTimeout))
         return False
-    else:
-        return True
+    process.readyAfter = time.monotonic() - process.launchedAt
+    TikaServerReadyTime = process.readyAfter
+    log.info("Tika server on port %s ready after %.2fs" % (process.port, process.readyAfter))
+    return True
 
-def killServer():
+def stopServer(process, timeout=10):
     '''
-    Kills the tika server started by the current execution instance
+    Kills a Tika server process started by the current execution instance, with the processes it started.
+    :param process: ``Popen`` object returned by launchServer
+    :param timeout: seconds to wait for a clean shutdown before the process is killed outright
     '''
-    if(TikaServerProcess):
-        try:
-            os.killpg(os.getpgid(TikaServerProcess.pid), signal.SIGTERM)
-        except:
-            log.error("Failed to kill the current server session")
-        time.sleep(1)
+    if process.poll() is not None:
+        if process in TikaServerProcesses:
+            TikaServerProcesses.remove(process)
+        return
+    try:
         # patch to support subprocess killing for windows
         if Windows:
-            os.kill(TikaServerProcess.pid, signal.SIGTERM)
-            time.sleep(1)
+            os.kill(process.pid, signal.SIGTERM)
         else:
-            try:
-                os.killpg(os.getpgid(TikaServerProcess.pid), signal.SIGTERM)
-            except:
-                log.error("Failed to kill the current server session")
-            time.sleep(1)
+            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+        process.wait(timeout)
+    except TimeoutExpired:
+        log.warning("Tika server %d did not stop after %ds; killing it" % (process.pid, timeout))
+        if Windows:
+            process.kill()
+        else:
+            os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+        process.wait()
+    except OSError:
+        log.error("Failed to kill the current server session")
+    if process in TikaServerProcesses:
+        TikaServerProcesses.remove(process)
+
+def killServer():
+    '''
+    Kills the tika servers started by the current execution instance
+    '''
+    global TikaServerProcess, TikaWatchdog
+    if TikaWatchdog is not None:
+        TikaWatchdog.stop()
+        TikaWatchdog = None
+    resetServerState()
+    if TikaServerProcesses:
+        for process in list(TikaServerProcesses):
+            stopServer(process)
+        TikaServerProcess = False
     else:
         log.error("Server not running, or was already running before")
 
@@ -801,6 +1520,32 @@ def getRemoteFile(urlOrPath, destPath):
         _urlretrieve(urlOrPath, destPath)
         return (destPath, 'remote')
 
+def readPrefix(urlOrPath, size):
+    '''
+    Reads the leading bytes of a file, URL or binary file object, without fetching the rest.
+    A file object is left at the position it was read from, if it can seek.
+    :param urlOrPath: resource locator, generally URL or path, or a binary file object
+    :param size: number of bytes to read
+    :return: tuple having (name, bytes)
+    '''
+    if _is_file_object(urlOrPath):
+        position = urlOrPath.tell() if urlOrPath.seekable() else None
+        data = urlOrPath.read(size)
+        if position is not None:
+            urlOrPath.seek(position)
+        return (getattr(urlOrPath, 'name', ''), data)
+
+    urlp = urlparse(urlOrPath)
+    if urlp.scheme in ('http', 'https'):
+        # servers ignoring the range send the whole file, of which no more than size bytes are read
+        with getSession().get(urlOrPath, headers={'user-agent': 'tika-python', 'Range': 'bytes=0-%d' % (size - 1)},
+                              stream=True, timeout=(TikaConnectTimeout, TikaTimeout)) as resp:
+            resp.raise_for_status()
+            return (toFilename(urlOrPath), resp.raw.read(size, decode_content=True))
+    path = os.path.abspath(urlOrPath) if urlp.scheme == '' else urlOrPath
+    with open(path, 'rb') as f:
+        return (path, f.read(size))
+
 def getRemoteJar(urlOrPath, destPath):
     '''
     Fetches URL to local path or just return absolute path.
@@ -860,7 +1605,8 @@ def main(argv=None):
         raise TikaException('Bad args')
     try:
         opts, argv = getopt.getopt(argv[1:], 'hi:s:o:p:v:e:c',
-          ['help', 'install=', 'server=', 'output=', 'port=', 'verbose', 'encode', 'csv'])
+          ['help', 'install=', 'server=', 'output=', 'port=', 'verbose', 'encode', 'csv', 'workers=', 'manifest=',
+           'profile'])
     except getopt.GetoptError as opt_error:
         msg, bad_opt = opt_error
         log.exception("%s error: Bad option: %s, %s" % (argv[0], bad_opt, msg))
@@ -870,6 +1616,9 @@ def main(argv=None):
     serverHost = ServerHost
     outDir = '.'
     port = Port
+    workers = 1
+    manifestPath = None
+    profile = False
     for opt, val in opts:
         if opt   in ('-h', '--help'):    echo2(USAGE); sys.exit()
         elif opt in ('--install'):       tikaServerJar = val
@@ -879,6 +1628,9 @@ def main(argv=None):
         elif opt in ('-v', '--verbose'): Verbose = 1
         elif opt in ('-e', '--encode'): EncodeUtf8 = 1
         elif opt in ('-c', '--csv'): csvOutput = 1
+        elif opt in ('--workers'):       workers = int(val)
+        elif opt in ('--manifest'):      manifestPath = val
+        elif opt in ('--profile'):       profile = True
         else:
             raise TikaException(USAGE)
 
@@ -888,7 +1640,8 @@ def main(argv=None):
         paths = argv[2:]
     except:
         paths = None
-    return runCommand(cmd, option, paths, port, outDir, serverHost=serverHost, tikaServerJar=tikaServerJar, verbose=Verbose, encode=EncodeUtf8)
+    return runCommand(cmd, option, paths, port, outDir, serverHost=serverHost, tikaServerJar=tikaServerJar, verbose=Verbose, encode=EncodeUtf8, workers=workers,
+                      manifestPath=manifestPath, profile=profile)
 
 
 if __name__ == '__main__':
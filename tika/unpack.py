@@ -15,48 +15,293 @@
 #
 
 import csv
+import mmap
+import os
+import shutil
 import tarfile
+import tempfile
+from collections.abc import Mapping
 from contextlib import closing
 from io import BytesIO, TextIOWrapper
 
-from .tika import ServerEndpoint, callServer, parse1
+from .metrics import traced
+from .tika import ServerEndpoint, TikaException, callServer, parse1
 
 _text_wrapper = TextIOWrapper
 
+_services = {'meta': '/meta', 'text': '/tika', 'all': '/rmeta/xml', 'unpack': '/unpack/all'}
 
-def from_file(filename, serverEndpoint=ServerEndpoint, requestOptions={}):
+# bytes copied at a time from streamed responses
+CHUNK_SIZE = 1024 * 1024
+
+
+def from_file(filename, serverEndpoint=ServerEndpoint, requestOptions={}, outputDir=None, lazy=False):
     '''
     Parse from file
     :param filename: file
     :param serverEndpoint: Tika server end point (optional)
-    :return:
+    :param outputDir: directory to write the attachments to while the response is read,
+                      instead of keeping them in memory (optional), see _parseStream
+    :param lazy: keep the response in a memory-mapped temporary file and only read the
+                 attachments that are accessed (optional), see UnpackResult
+    :return: dictionary having 'content', 'metadata' and 'attachments' keys, or an empty one if the
+             server had nothing to unpack; with ``lazy`` always an UnpackResult, so it can be closed
     '''
+    if outputDir is not None or lazy:
+        output = parse1('unpack', filename, serverEndpoint, responseMimeType='application/x-tar',
+                        services=_services, requestOptions=requestOptions, stream=True)
+        return _parseLazy(output) if lazy else _parseStream(output, outputDir)
     tarOutput = parse1('unpack', filename, serverEndpoint,
                        responseMimeType='application/x-tar',
-                       services={'meta': '/meta', 'text': '/tika',
-                                 'all': '/rmeta/xml', 'unpack': '/unpack/all'},
+                       services=_services,
                        rawResponse=True, requestOptions=requestOptions)
     return _parse(tarOutput)
 
 
-def from_buffer(string, serverEndpoint=ServerEndpoint, headers=None, requestOptions={}):
+def from_buffer(string, serverEndpoint=ServerEndpoint, headers=None, requestOptions={}, outputDir=None, lazy=False):
     '''
     Parse from buffered content
-    :param string:  buffered content
+    :param string:  buffered content; a binary file object, ``mmap`` or iterator of ``bytes``
+                    is streamed to the server
     :param serverEndpoint: Tika server URL (Optional)
+    :param outputDir: directory to write the attachments to, see from_file (Optional)
+    :param lazy: only read the attachments that are accessed, see from_file (Optional)
     :return: parsed content
     '''
 
     headers = headers or {}
     headers.update({'Accept': 'application/x-tar'})
 
+    stream = outputDir is not None or lazy
     status, response = callServer('put', serverEndpoint, '/unpack/all', string,
                                   headers, False,
-                                  rawResponse=True, requestOptions=requestOptions)
-
+                                  rawResponse=not stream, requestOptions=requestOptions,
+                                  stream=stream)
+    if lazy:
+        return _parseLazy((status, response))
+    if outputDir is not None:
+        return _parseStream((status, response), outputDir)
     return _parse((status, response))
 
 
+class UnpackResult(dict):
+    '''
+    Unpack result having 'content', 'metadata' and 'attachments' keys, whose attachments
+    are read from a memory-mapped temporary copy of the server response only when accessed.
+    Close it, or use it as a context manager, to release the temporary file.
+    '''
+
+    def __init__(self, content, metadata, attachments):
+        super().__init__(content=content, metadata=metadata, attachments=attachments)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self['attachments'].close()
+
+
+class LazyAttachments(Mapping):
+    '''
+    Read-only mapping of attachment name to ``bytes``, backed by the members of a
+    memory-mapped tar file: only the attachments looked up are read.
+    '''
+
+    def __init__(self, tarFile, members):
+        '''
+        :param tarFile: binary file object holding the tar, closed by :meth:`close`
+        :param members: ``dict`` of attachment name to (data offset, size) in ``tarFile``
+        '''
+        self._file = tarFile
+        self._members = members
+        self._mmap = mmap.mmap(tarFile.fileno(), 0, access=mmap.ACCESS_READ) if members else None
+
+    def __getitem__(self, name):
+        return bytes(self.view(name))
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __repr__(self):
+        return 'LazyAttachments(%r)' % list(self._members)
+
+    def size(self, name):
+        '''
+        :return: size in bytes of the attachment ``name``, without reading it
+        '''
+        return self._members[name][1]
+
+    def view(self, name):
+        '''
+        :return: ``memoryview`` of the attachment ``name`` in the mapped response, without copying it;
+                 release it before closing the result
+        '''
+        offset, size = self._members[name]
+        return memoryview(self._mmap)[offset:offset + size]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+def iter_attachments(filename, serverEndpoint=ServerEndpoint, requestOptions={}):
+    '''
+    Extracts the attachments of a file one at a time, as the server response is read
+    :param filename: file
+    :param serverEndpoint: Tika server end point (optional)
+    :return: iterator of (name, binary file object) tuples; each file object can only be
+             read until the next attachment is requested
+    '''
+    output = parse1('unpack', filename, serverEndpoint, responseMimeType='application/x-tar',
+                    services=_services, requestOptions=requestOptions, stream=True)
+    for member, memberFile, encoding in _iterMembers(output):
+        if member.name not in ('__METADATA__', '__TEXT__'):
+            yield member.name, memberFile
+
+
+def _iterMembers(output):
+    '''
+    Reads a streamed /unpack response with tarfile in stream mode, one member at a time.
+    :param output: (status, requests.Response) as returned by callServer with stream=True
+    :return: iterator of (TarInfo, binary file object, encoding of the archive) tuples for the regular
+             files of the archive
+    '''
+    status, response = output
+    try:
+        if status != 200 and status != 204:
+            raise TikaException('Tika server returned status: %d' % status)
+        if status == 204 or response.headers.get('Content-Length') == '0':
+            return
+        response.raw.decode_content = True
+        with tarfile.open(fileobj=response.raw, mode='r|') as tarFile:
+            for member in tarFile:
+                if member.isfile():
+                    yield member, tarFile.extractfile(member), tarFile.encoding
+    finally:
+        response.close()
+
+
+@traced('decode')
+def _parseStream(output, outputDir):
+    '''
+    Unpacks a streamed /unpack response, writing the attachments to ``outputDir`` as they
+    arrive, so memory use does not depend on their number or size.
+    :param output: (status, requests.Response) as returned by callServer with stream=True
+    :param outputDir: directory the attachments are written to, created if needed
+    :return: dictionary having 'content', 'metadata' and 'attachments' keys, 'attachments'
+             mapping the name of each attachment to its size in bytes
+    '''
+    parsed = {}
+    metadata = {}
+    content = ""
+    attachments = {}
+    empty = True
+    for member, memberFile, encoding in _iterMembers(output):
+        empty = False
+        # members of a tar read in stream mode are not seekable, which TextIOWrapper needs
+        if member.name == "__METADATA__":
+            metadata = _readMetadata(BytesIO(memberFile.read()), encoding)
+        elif member.name == "__TEXT__":
+            with closing(_text_wrapper(BytesIO(memberFile.read()), encoding='utf8')) as content_file:
+                content = content_file.read()
+        else:
+            path = _outputPath(outputDir, member.name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(memberFile, f)
+            attachments[member.name] = member.size
+
+    if empty:
+        return parsed
+    parsed["content"] = content
+    parsed["metadata"] = metadata
+    parsed["attachments"] = attachments
+    return parsed
+
+
+@traced('decode')
+def _parseLazy(output):
+    '''
+    Copies a streamed /unpack response to a temporary file and indexes its members, reading
+    only the metadata and text.
+    :param output: (status, requests.Response) as returned by callServer with stream=True
+    :return: UnpackResult; unlike the ``{}`` of _parse and _parseStream, an empty response gives
+             empty content, metadata and attachments, so the caller can close every result the same way
+    '''
+    status, response = output
+    spool = tempfile.TemporaryFile()
+    try:
+        try:
+            if status != 200 and status != 204:
+                raise TikaException('Tika server returned status: %d' % status)
+            response.raw.decode_content = True
+            shutil.copyfileobj(response.raw, spool, CHUNK_SIZE)
+        finally:
+            response.close()
+        if not spool.tell():
+            return UnpackResult("", {}, LazyAttachments(spool, {}))
+
+        spool.seek(0)
+        metadata = {}
+        content = ""
+        attachments = {}
+        with tarfile.open(fileobj=spool, mode='r:') as tarFile:
+            for member in tarFile:
+                if not member.isfile():
+                    continue
+                if member.name == "__METADATA__":
+                    metadata = _readMetadata(tarFile.extractfile(member), tarFile.encoding)
+                elif member.name == "__TEXT__":
+                    with closing(_text_wrapper(tarFile.extractfile(member), encoding='utf8')) as content_file:
+                        content = content_file.read()
+                else:
+                    attachments[member.name] = (member.offset_data, member.size)
+    except BaseException:
+        spool.close()
+        raise
+    return UnpackResult(content, metadata, LazyAttachments(spool, attachments))
+
+
+def _outputPath(outputDir, name):
+    '''
+    :return: where the attachment ``name`` is written in ``outputDir``, refusing names leaving it
+    '''
+    root = os.path.abspath(outputDir)
+    path = os.path.abspath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise TikaException('Refusing to write attachment %r outside of %s' % (name, outputDir))
+    return path
+
+
+def _readMetadata(metadataFile, encoding):
+    metadata = {}
+    with closing(_text_wrapper(metadataFile, encoding=encoding)) as metadataFile:
+        metadataReader = csv.reader(_truncate_nulls(metadataFile))
+        for metadataLine in metadataReader:
+            # each metadata line comes as a key-value pair, with list values
+            # returned as extra values in the line - convert single values
+            # to non-list values to be consistent with parser metadata
+            assert len(metadataLine) >= 2
+
+            if len(metadataLine) > 2:
+                metadata[metadataLine[0]] = metadataLine[1:]
+            else:
+                metadata[metadataLine[0]] = metadataLine[1]
+    return metadata
+
+
+@traced('decode')
 def _parse(tarOutput):
     parsed = {}
     if not tarOutput:
@@ -75,18 +320,7 @@ def _parse(tarOutput):
 
         metadataMember = tarFile.getmember("__METADATA__")
         if not metadataMember.issym() and metadataMember.isfile():
-            with closing(_text_wrapper(tarFile.extractfile(metadataMember), encoding=tarFile.encoding)) as metadataFile:
-                metadataReader = csv.reader(_truncate_nulls(metadataFile))
-                for metadataLine in metadataReader:
-                    # each metadata line comes as a key-value pair, with list values
-                    # returned as extra values in the line - convert single values
-                    # to non-list values to be consistent with parser metadata
-                    assert len(metadataLine) >= 2
-
-                    if len(metadataLine) > 2:
-                        metadata[metadataLine[0]] = metadataLine[1:]
-                    else:
-                        metadata[metadataLine[0]] = metadataLine[1]
+            metadata = _readMetadata(tarFile.extractfile(metadataMember), tarFile.encoding)
 
 
         # get the content
@@ -0,0 +1,261 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Looks after the Tika server started by this process: restarts it when it dies, and
+recycles it after a number of documents, above a memory threshold or when it stops
+answering promptly, so parse latency stays stable over long runs.
+
+Setting ``TIKA_WATCHDOG_INTERVAL`` starts a watchdog with the server automatically.
+
+**Example usage**::
+
+    from tika import parser
+    from tika.watchdog import ServerWatchdog
+
+    with ServerWatchdog(maxDocuments=10000, maxRss=4 * 1024 ** 3):
+        for path, parsed, error in parser.from_files(paths):
+            ...
+'''
+
+import os
+import threading
+import time
+
+import requests
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from . import tika
+from .endpoints import livePools
+from .tika import log
+
+EXITED = 'exited'
+DOCUMENTS = 'documents'
+MEMORY = 'memory'
+LATENCY = 'latency'
+
+
+def processRss(process):
+    '''
+    Resident memory of a server process and the processes it started, e.g. the JVM
+    behind the shell running it. Uses psutil if it is installed, else ``/proc``.
+    :param process: ``Popen`` object returned by launchServer
+    :return: bytes, or ``None`` if it cannot be told on this platform
+    '''
+    if psutil is not None:
+        try:
+            parent = psutil.Process(process.pid)
+            return sum(p.memory_info().rss for p in [parent] + parent.children(recursive=True))
+        except psutil.Error:
+            return None
+    if not os.path.isdir('/proc'):
+        return None
+    # launchServer puts the server in a session of its own, so its pid is the process group id
+    pageSize = os.sysconf('SC_PAGE_SIZE')
+    rss = 0
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat' % pid, 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # the command name may hold spaces; the fields after it don't
+        fields = stat[stat.rindex(b')') + 2:].split()
+        if int(fields[2]) == process.pid:
+            rss += int(fields[21]) * pageSize
+    return rss
+
+
+class ServerWatchdog:
+    '''
+    Checks the Tika server started by :func:`tika.tika.startServer` on ``port`` every
+    ``interval`` seconds from a background thread, and restarts it when:
+
+    * it exited,
+    * it served ``maxDocuments`` calls since it was started,
+    * its resident memory exceeds ``maxRss`` bytes, or
+    * it took longer than ``maxLatency`` seconds to answer ``/version`` on
+      ``slowChecks`` consecutive checks.
+
+    Except after a crash, the server is drained first: new calls wait, and the
+    calls in flight get up to ``drainTimeout`` seconds to finish.
+    '''
+
+    def __init__(self, port=tika.Port, serverHost=tika.ServerHost, tikaServerJar=tika.TikaServerJar, classpath=None,
+                 config_path=None, interval=None, maxDocuments=None, maxRss=None, maxLatency=None, slowChecks=3,
+                 drainTimeout=60.0):
+        '''
+        :param port: port of the server
+        :param serverHost: host name the server is reached on
+        :param tikaServerJar: URL of the Tika server jar, to start the server again
+        :param classpath: Class path value to pass to the JVM
+        :param config_path: Tika config file passed to the server
+        :param interval: seconds between checks; defaults to TIKA_WATCHDOG_INTERVAL, or 5
+        :param maxDocuments: calls after which the server is recycled; defaults to TIKA_RECYCLE_DOCUMENTS
+        :param maxRss: resident memory in bytes above which the server is recycled;
+                       defaults to TIKA_RECYCLE_RSS (MiB)
+        :param maxLatency: seconds ``/version`` may take to answer; defaults to TIKA_RECYCLE_LATENCY
+        :param slowChecks: consecutive slow or failed ``/version`` checks after which the server is recycled
+        :param drainTimeout: seconds the calls in flight get to finish before the server is stopped
+        '''
+        self.port = str(port)
+        self.serverHost = serverHost
+        self.endpoint = 'http://%s:%s' % (serverHost, port)
+        self.tikaServerJar = tikaServerJar
+        self.classpath = classpath
+        self.config_path = config_path
+        self.interval = interval or tika.TikaWatchdogInterval or 5.0
+        self.maxDocuments = tika.TikaRecycleDocuments if maxDocuments is None else maxDocuments
+        self.maxRss = tika.TikaRecycleRss * 1024 * 1024 if maxRss is None else maxRss
+        self.maxLatency = tika.TikaRecycleLatency if maxLatency is None else maxLatency
+        self.slowChecks = slowChecks
+        self.drainTimeout = drainTimeout
+        self.restarts = {}
+        self._slow = 0
+        self._served = self._answered()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        '''
+        Starts checking the server from a background thread.
+        '''
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name='tika-watchdog', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        '''
+        Stops the checks; the server keeps running.
+        '''
+        self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                reason = self.check()
+                if reason and not self._stopped.is_set():
+                    self.recycle(reason)
+            except Exception:
+                log.exception('Tika server watchdog check failed')
+
+    def _process(self):
+        process = tika.TikaServerProcess
+        if process and str(process.port) == self.port:
+            return process
+        return None
+
+    def _endpoints(self):
+        # every pool calls to the server may have gone through, including TIKA_SERVER_ENDPOINTS and hand-built ones
+        return [e for pool in livePools() for e in pool.endpoints if e.url == self.endpoint]
+
+    def _answered(self):
+        # calls held back while paused or refused by an open circuit never reached the server
+        return sum(e.answered for e in self._endpoints())
+
+    def documents(self):
+        '''
+        :return: calls the server answered since it was (re)started
+        '''
+        return max(self._answered() - self._served, 0)
+
+    def check(self):
+        '''
+        Checks the server once.
+        :return: why it should be restarted, ``'exited'``, ``'documents'``, ``'memory'`` or
+                 ``'latency'``; ``None`` if it is fine or was not started by this process
+        '''
+        process = self._process()
+        if process is None:
+            return None
+        if process.poll() is not None:
+            return EXITED
+        if self.maxDocuments and self.documents() >= self.maxDocuments:
+            return DOCUMENTS
+        if self.maxRss:
+            rss = processRss(process)
+            if rss is not None and rss > self.maxRss:
+                return MEMORY
+        if self.maxLatency:
+            start = time.monotonic()
+            try:
+                ok = requests.get(self.endpoint + '/version', timeout=self.maxLatency).status_code == 200
+            except requests.RequestException:
+                ok = False
+            self._slow = 0 if ok and time.monotonic() - start <= self.maxLatency else self._slow + 1
+            if self._slow >= self.slowChecks:
+                return LATENCY
+        return None
+
+    def drain(self):
+        '''
+        Waits until no call is in flight on the server, or for ``drainTimeout`` seconds.
+        :return: ``True`` if the server was drained
+        '''
+        deadline = time.monotonic() + self.drainTimeout
+        while any(e.outstanding for e in self._endpoints()):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def recycle(self, reason):
+        '''
+        Drains and restarts the server. Calls made meanwhile wait for it to come back.
+        :param reason: what the restart is recorded under in :attr:`restarts`
+        :return: ``True`` if the server came back up
+        '''
+        log.warning('Recycling Tika server on port %s (%s)', self.port, reason)
+        # calls held back give up if the server is not back after draining and starting it
+        tika.pauseEndpoint(self.endpoint, self.drainTimeout + tika.TikaStartupTimeout)
+        try:
+            if reason != EXITED and not self.drain():
+                log.warning('Tika server on port %s still busy after %.0fs; stopping it anyway', self.port,
+                            self.drainTimeout)
+            process = self._process()
+            if process:
+                tika.stopServer(process)
+            tika.resetServerState(self.endpoint)
+            jarPath = tika.prepareServerJar(self.tikaServerJar)
+            started = tika.startServer(jarPath, tika.TikaJava, tika.TikaJavaArgs, self.serverHost, self.port,
+                                       self.classpath, self.config_path)
+        finally:
+            tika.resumeEndpoint(self.endpoint)
+        self.restarts[reason] = self.restarts.get(reason, 0) + 1
+        self._slow = 0
+        self._served = self._answered()
+        if started:
+            tika.getCircuitBreaker(self.endpoint).recordSuccess()
+        else:
+            log.error('Tika server on port %s did not come back up', self.port)
+        return started